@@ -7,6 +7,10 @@ import os
 from typing import Optional, Dict, Any
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
+from langchain_core.caches import BaseCache
+
+from agent.llm_cache import get_llm_cache
+from agent.scripted_model import ScriptedChatModel
 
 
 class AIProviderConfig:
@@ -19,6 +23,7 @@ class AIProviderConfig:
     ANTHROPIC = "anthropic"
     GITHUB_COPILOT = "github_copilot"
     GOOGLE_GEMINI = "google_gemini"
+    SCRIPTED = "scripted"  # Local scripted responses, no API (benchmarks and load tests)
     
     # Default base URLs for different providers
     DEFAULT_URLS = {
@@ -28,6 +33,7 @@ class AIProviderConfig:
         ANTHROPIC: "https://api.anthropic.com",
         GITHUB_COPILOT: "https://api.githubcopilot.com/v1",
         GOOGLE_GEMINI: "https://generativelanguage.googleapis.com/v1",
+        SCRIPTED: None,
     }
     
     @staticmethod
@@ -71,17 +77,21 @@ def create_ai_model(
     openai_api_key: Optional[str] = None,
     max_retries: int = 3,
     timeout: int = 30,
+    cache: Optional[BaseCache] = None,
     **kwargs
 ) -> Any:
     """
     Create AI model instance based on provider
     
     Args:
-        basemodel: Base model name (e.g., "openai/gpt-4", "ollama/llama2", "deepseek/deepseek-chat")
+        basemodel: Base model name (e.g., "openai/gpt-4", "ollama/llama2", "deepseek/deepseek-chat",
+                   "scripted/buy_and_hold")
         openai_base_url: Optional base URL override
         openai_api_key: Optional API key override
         max_retries: Maximum retry attempts
         timeout: Request timeout in seconds
+        cache: Response cache for model calls; defaults to the LLM cache configured by
+               LLM_CACHE_MODE / LLM_CACHE_DIR (none in passthrough mode)
         **kwargs: Additional provider-specific parameters
         
     Returns:
@@ -93,6 +103,17 @@ def create_ai_model(
     provider = AIProviderConfig.get_provider_from_model(basemodel)
     model_name = AIProviderConfig.get_model_name(basemodel)
     
+    # Record/replay cache keyed by the full request
+    if cache is None:
+        cache = get_llm_cache()
+    if cache is not None:
+        kwargs["cache"] = cache
+    
+    # Scripted responses: no endpoint or API key involved
+    if provider == AIProviderConfig.SCRIPTED:
+        print(f"✅ Creating AI model: {provider}/{model_name}")
+        return ScriptedChatModel.from_script(model_name, **kwargs)
+    
     # Get base URL - priority: parameter > env var > default
     if openai_base_url is None:
         env_var = f"{provider.upper()}_API_BASE"
@@ -182,6 +203,10 @@ def validate_provider_config(provider: str) -> Dict[str, Any]:
         "warnings": [],
     }
     
+    # Scripted models run locally without endpoint or API key
+    if provider == AIProviderConfig.SCRIPTED:
+        return results
+    
     # Check base URL
     env_var = f"{provider.upper()}_API_BASE"
     base_url = os.getenv(env_var) or os.getenv("OPENAI_API_BASE")
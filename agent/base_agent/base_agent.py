@@ -4,15 +4,16 @@ Encapsulates core functionality including MCP tool management, AI agent creation
 """
 
 import os
-import json
 import asyncio
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, TypedDict
 from pathlib import Path
 
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_openai import ChatOpenAI
 from langchain.agents import create_agent
+from langchain.agents.middleware import ModelRequest, dynamic_prompt
 from dotenv import load_dotenv
 
 # Import project tools
@@ -20,14 +21,38 @@ import sys
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, project_root)
 
-from tools.general_tools import extract_conversation, extract_tool_messages, get_config_value, write_config_value
+from tools.general_tools import (
+    extract_conversation,
+    extract_tool_messages,
+    get_config_value,
+    write_config_value,
+    set_runtime_env_path,
+    RUNTIME_ENV_HEADER,
+)
+from tools.position_store import PositionStore
+from tools.metrics import get_metrics
 from prompts.agent_prompt import get_agent_system_prompt, STOP_SIGNAL
 from agent.ai_providers import create_ai_model, AIProviderConfig
+from agent.llm_cache import LLMCacheMiss
+from agent.conversation_context import ConversationContext
+from agent.session_log import SessionLogWriter
+from agent.tool_concurrency import DEFAULT_UNTIMED_TOOLS, ToolConcurrencyMiddleware
 
 # Load environment variables
 load_dotenv()
 
 
+class SessionContext(TypedDict):
+    """Per-session runtime context passed to the shared agent graph"""
+    system_prompt: str
+
+
+@dynamic_prompt
+def session_system_prompt(request: ModelRequest) -> str:
+    """System prompt of the current trading session, taken from the invocation context"""
+    return request.runtime.context["system_prompt"]
+
+
 class BaseAgent:
     """
     Base class for trading agents
@@ -60,7 +85,13 @@ class BaseAgent:
         openai_base_url: Optional[str] = None,
         openai_api_key: Optional[str] = None,
         initial_cash: float = 10000.0,
-        init_date: str = "2025-10-13"
+        init_date: str = "2025-10-13",
+        runtime_env_path: Optional[str] = None,
+        context_token_budget: Optional[int] = 32000,
+        context_keep_recent: int = 2,
+        max_parallel_tools: Optional[int] = 8,
+        tool_timeout: Optional[float] = 60.0,
+        untimed_tools: Optional[List[str]] = None
     ):
         """
         Initialize BaseAgent
@@ -78,6 +109,19 @@ class BaseAgent:
             openai_api_key: OpenAI API key
             initial_cash: Initial cash amount
             init_date: Initialization date
+            runtime_env_path: Private runtime env file for this agent; when set, runtime
+                              state (SIGNATURE, TODAY_DATE, IF_TRADE) is isolated from
+                              other agents running in the same process
+            context_token_budget: Approximate token budget of the messages sent to the model
+                                  each step; older steps are elided or dropped beyond it
+                                  (None disables compaction)
+            context_keep_recent: Number of most recent steps that are never compacted
+            max_parallel_tools: Maximum tool calls of one model turn running concurrently
+                                (None for no limit)
+            tool_timeout: Seconds a single tool call may take before it returns an
+                          error result to the model (None for no limit)
+            untimed_tools: Tools exempt from tool_timeout, defaults to the order tools
+                           (buy_okx, sell_okx)
         """
         self.signature = signature
         self.basemodel = basemodel
@@ -87,9 +131,23 @@ class BaseAgent:
         self.base_delay = base_delay
         self.initial_cash = initial_cash
         self.init_date = init_date
+        self.runtime_env_path = os.path.abspath(runtime_env_path) if runtime_env_path else None
+        self.context_token_budget = context_token_budget
+        self.context_keep_recent = context_keep_recent
+        self.max_parallel_tools = max_parallel_tools
+        self.tool_timeout = tool_timeout
+        self.untimed_tools = list(DEFAULT_UNTIMED_TOOLS) if untimed_tools is None else untimed_tools
         
         # Set MCP configuration
         self.mcp_config = mcp_config or self._get_default_mcp_config()
+        if self.runtime_env_path:
+            # Tell the MCP servers which runtime env file belongs to this agent
+            self.mcp_config = {name: dict(cfg) for name, cfg in self.mcp_config.items()}
+            for server_config in self.mcp_config.values():
+                if server_config.get("transport") == "streamable_http":
+                    headers = dict(server_config.get("headers") or {})
+                    headers[RUNTIME_ENV_HEADER] = self.runtime_env_path
+                    server_config["headers"] = headers
         
         # Set log path
         self.base_log_path = log_path or "./data/agent_data"
@@ -109,10 +167,14 @@ class BaseAgent:
         self.tools: Optional[List] = None
         self.model: Optional[ChatOpenAI] = None
         self.agent: Optional[Any] = None
+        self.tool_servers: Dict[str, str] = {}
+        self.callbacks: List[Any] = []
+        self._log_writers: Dict[str, SessionLogWriter] = {}
         
         # Data paths
         self.data_path = os.path.join(self.base_log_path, self.signature)
         self.position_file = os.path.join(self.data_path, "position", "position.jsonl")
+        self.position_store = PositionStore(self.position_file)
         
     def _get_default_mcp_config(self) -> Dict[str, Dict[str, Any]]:
         """Get default MCP configuration for OKX crypto trading"""
@@ -133,19 +195,36 @@ class BaseAgent:
                 "transport": "streamable_http",
                 "url": f"http://localhost:{os.getenv('TRADE_OKX_HTTP_PORT', '8004')}/mcp",
             },
+            "news": {
+                "transport": "streamable_http",
+                "url": f"http://localhost:{os.getenv('NEWS_HTTP_PORT', '8006')}/mcp",
+            },
         }
     
+    def _bind_runtime_env(self) -> None:
+        """Route runtime config reads/writes of the current task to this agent's runtime env file"""
+        if self.runtime_env_path:
+            set_runtime_env_path(self.runtime_env_path)
+    
     async def initialize(self) -> None:
         """Initialize MCP client and AI model"""
         print(f"🚀 Initializing agent: {self.signature}")
+        self._bind_runtime_env()
         
         # Create MCP client
         self.client = MultiServerMCPClient(self.mcp_config)
         
-        # Get tools
-        self.tools = await self.client.get_tools()
+        # Get tools, remembering which server provides each one
+        server_names = list(self.mcp_config)
+        server_tools = await asyncio.gather(*(self.client.get_tools(server_name=name) for name in server_names))
+        self.tools = [tool for tools in server_tools for tool in tools]
+        self.tool_servers = {tool.name: name for name, tools in zip(server_names, server_tools) for tool in tools}
         print(f"✅ Loaded {len(self.tools)} MCP tools")
         
+        # LLM request and tool call timings (only when metrics are enabled)
+        handler = get_metrics().callback_handler(self.signature, self.basemodel, self.tool_servers)
+        self.callbacks = [handler] if handler is not None else []
+        
         # Create AI model using the new provider system
         try:
             self.model = create_ai_model(
@@ -161,11 +240,25 @@ class BaseAgent:
             print(f"   Model: {AIProviderConfig.get_model_name(self.basemodel)}")
             raise
         
-        # Note: agent will be created in run_trading_session() based on specific date
-        # because system_prompt needs the current date and price information
+        # Build the agent graph once; the system prompt depends on the date and
+        # is supplied per session through the runtime context. Tool calls of one
+        # model turn run concurrently, capped and time-limited per agent
+        self.agent = create_agent(
+            self.model,
+            tools=self.tools,
+            middleware=[
+                session_system_prompt,
+                ToolConcurrencyMiddleware(self.max_parallel_tools, self.tool_timeout, self.untimed_tools),
+            ],
+            context_schema=SessionContext,
+        )
         
         print(f"✅ Agent {self.signature} initialization completed")
     
+    def get_system_prompt(self, today_date: str) -> str:
+        """System prompt of one trading day (subclasses may build their own)"""
+        return get_agent_system_prompt(today_date, self.signature)
+    
     def _setup_logging(self, today_date: str) -> str:
         """Set up log file path"""
         log_path = os.path.join(self.base_log_path, self.signature, 'log', today_date)
@@ -174,23 +267,40 @@ class BaseAgent:
         return os.path.join(log_path, "log.jsonl")
     
     def _log_message(self, log_file: str, new_messages: List[Dict[str, str]]) -> None:
-        """Log messages to log file"""
+        """Log messages to log file (queued; written by a background thread)"""
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "signature": self.signature,
             "new_messages": new_messages
         }
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+        writer = self._log_writers.get(log_file)
+        if writer is None:
+            writer = self._log_writers[log_file] = SessionLogWriter(log_file)
+        writer.write(log_entry)
+    
+    async def _close_log(self, log_file: str) -> None:
+        """Flush and fsync the session log without blocking the event loop"""
+        writer = self._log_writers.pop(log_file, None)
+        if writer is not None:
+            try:
+                await writer.aclose()
+            except asyncio.CancelledError:
+                # Cancelled again while closing: finish synchronously rather than lose queued lines
+                writer.close()
+                raise
     
-    async def _ainvoke_with_retry(self, message: List[Dict[str, str]]) -> Any:
+    async def _ainvoke_with_retry(self, message: List[Dict[str, str]], context: SessionContext) -> Any:
         """Agent invocation with retry"""
         for attempt in range(1, self.max_retries + 1):
             try:
                 return await self.agent.ainvoke(
                     {"messages": message}, 
-                    {"recursion_limit": 100}
+                    {"recursion_limit": 100, "callbacks": self.callbacks},
+                    context=context
                 )
+            except LLMCacheMiss:
+                # Deterministic in replay mode; a retry would re-run the step's tool calls
+                raise
             except Exception as e:
                 if attempt == self.max_retries:
                     raise e
@@ -206,68 +316,93 @@ class BaseAgent:
             today_date: Trading date
         """
         print(f"📈 Starting trading session: {today_date}")
-        
-        # Set up logging
-        log_file = self._setup_logging(today_date)
-        
-        # Update system prompt
-        self.agent = create_agent(
-            self.model,
-            tools=self.tools,
-            system_prompt=get_agent_system_prompt(today_date, self.signature),
-        )
-        
-        # Initial user query
-        user_query = [{"role": "user", "content": f"Please analyze and update today's ({today_date}) positions."}]
-        message = user_query.copy()
-        
-        # Log initial message
-        self._log_message(log_file, user_query)
-        
-        # Trading loop
-        current_step = 0
-        while current_step < self.max_steps:
-            current_step += 1
-            print(f"🔄 Step {current_step}/{self.max_steps}")
+        metrics = get_metrics()
+        with metrics.timer("session", signature=self.signature, date=today_date) as session_event:
+            setup_start = time.perf_counter()
+            
+            # Set up logging
+            log_file = self._setup_logging(today_date)
+            
+            # Today's system prompt, passed to the shared agent graph on every call
+            system_prompt = self.get_system_prompt(today_date)
+            session_context: SessionContext = {"system_prompt": system_prompt}
+            
+            # Initial user query
+            user_query = [{"role": "user", "content": f"Please analyze and update today's ({today_date}) positions."}]
+            
+            # Message history, compacted to stay within the context token budget
+            context = ConversationContext(
+                token_budget=self.context_token_budget,
+                keep_recent_steps=self.context_keep_recent,
+                system_prompt=system_prompt,
+            )
+            context.start(user_query)
+            print(f"⏱️ Session setup took {(time.perf_counter() - setup_start) * 1000:.1f} ms")
             
             try:
-                # Call agent
-                response = await self._ainvoke_with_retry(message)
-                
-                # Extract agent response
-                agent_response = extract_conversation(response, "final")
-                
-                # Check stop signal
-                if STOP_SIGNAL in agent_response:
-                    print("✅ Received stop signal, trading session ended")
-                    print(agent_response)
-                    self._log_message(log_file, [{"role": "assistant", "content": agent_response}])
-                    break
+                # Log initial message
+                self._log_message(log_file, user_query)
                 
-                # Extract tool messages
-                tool_msgs = extract_tool_messages(response)
-                tool_response = '\n'.join([msg.content for msg in tool_msgs])
+                # Trading loop
+                current_step = 0
+                while current_step < self.max_steps:
+                    current_step += 1
+                    session_event["steps"] = current_step
+                    print(f"🔄 Step {current_step}/{self.max_steps}")
+                    
+                    try:
+                        # Call agent
+                        request_messages = context.messages()
+                        with metrics.timer("step", signature=self.signature, date=today_date, step=current_step):
+                            response = await self._ainvoke_with_retry(request_messages, session_context)
+                        
+                        # The response echoes the request: only messages past this cursor are new
+                        cursor = len(request_messages)
+                        
+                        # Extract agent response
+                        agent_response = extract_conversation(response, "final", start=cursor) or ""
+                        
+                        # Extract tool messages (tool names are logged for the log index)
+                        tool_msgs = extract_tool_messages(response, start=cursor)
+                        tool_names = [getattr(msg, "name", None) for msg in tool_msgs]
+                        
+                        # Check stop signal
+                        if STOP_SIGNAL in agent_response:
+                            print("✅ Received stop signal, trading session ended")
+                            print(agent_response)
+                            final_message = {"role": "assistant", "content": agent_response}
+                            if tool_names:
+                                final_message["tools"] = tool_names
+                            self._log_message(log_file, [final_message])
+                            break
+                        
+                        tool_response = '\n'.join([msg.content for msg in tool_msgs])
+                        
+                        # Prepare new messages
+                        new_messages = [
+                            {"role": "assistant", "content": agent_response},
+                            {"role": "user", "content": f'Tool results: {tool_response}', "tools": tool_names}
+                        ]
+                        
+                        # Add new messages (full text goes to the log, the context may compact it)
+                        context.observe_tool_results([msg.content for msg in tool_msgs])
+                        context.add_step(new_messages[0]["content"], new_messages[1]["content"])
+                        
+                        # Log messages
+                        self._log_message(log_file, new_messages[0])
+                        self._log_message(log_file, new_messages[1])
+                        
+                    except Exception as e:
+                        print(f"❌ Trading session error: {str(e)}")
+                        print(f"Error details: {e}")
+                        raise
                 
-                # Prepare new messages
-                new_messages = [
-                    {"role": "assistant", "content": agent_response},
-                    {"role": "user", "content": f'Tool results: {tool_response}'}
-                ]
-                
-                # Add new messages
-                message.extend(new_messages)
-                
-                # Log messages
-                self._log_message(log_file, new_messages[0])
-                self._log_message(log_file, new_messages[1])
-                
-            except Exception as e:
-                print(f"❌ Trading session error: {str(e)}")
-                print(f"Error details: {e}")
-                raise
-        
-        # Handle trading results
-        await self._handle_trading_result(today_date)
+            finally:
+                # Write out and fsync the session log, also when the session fails or is cancelled
+                await self._close_log(log_file)
+            
+            # Handle trading results
+            await self._handle_trading_result(today_date)
     
     async def _handle_trading_result(self, today_date: str) -> None:
         """Handle trading results"""
@@ -302,12 +437,11 @@ class BaseAgent:
         init_position = {symbol: 0 for symbol in self.stock_symbols}
         init_position['CASH'] = self.initial_cash
         
-        with open(self.position_file, "w") as f:  # Use "w" mode to ensure creating new file
-            f.write(json.dumps({
-                "date": self.init_date, 
-                "id": 0, 
-                "positions": init_position
-            }) + "\n")
+        self.position_store.append({
+            "date": self.init_date, 
+            "id": 0, 
+            "positions": init_position
+        })
         
         print(f"✅ Agent {self.signature} registration completed")
         print(f"📁 Position file: {self.position_file}")
@@ -332,18 +466,8 @@ class BaseAgent:
             self.register_agent()
             max_date = init_date
         else:
-            # Read existing position file, find latest date
-            with open(self.position_file, "r") as f:
-                for line in f:
-                    doc = json.loads(line)
-                    current_date = doc['date']
-                    if max_date is None:
-                        max_date = current_date
-                    else:
-                        current_date_obj = datetime.strptime(current_date, "%Y-%m-%d")
-                        max_date_obj = datetime.strptime(max_date, "%Y-%m-%d")
-                        if current_date_obj > max_date_obj:
-                            max_date = current_date
+            # Latest date comes from the position index, no file scan needed
+            max_date = self.position_store.max_date() or init_date
         
         # Check if new dates need to be processed
         max_date_obj = datetime.strptime(max_date, "%Y-%m-%d")
@@ -371,6 +495,10 @@ class BaseAgent:
                 await self.run_trading_session(today_date)
                 print(f"✅ {self.signature} - {today_date} run successful")
                 return
+            except LLMCacheMiss:
+                # Retrying would replay the cached steps, including their orders
+                print(f"💥 {self.signature} - {today_date} has no recorded LLM response, not retrying")
+                raise
             except Exception as e:
                 print(f"❌ Attempt {attempt} failed: {str(e)}")
                 if attempt == self.max_retries:
@@ -390,6 +518,7 @@ class BaseAgent:
             end_date: End date
         """
         print(f"📅 Running date range: {init_date} to {end_date}")
+        self._bind_runtime_env()
         
         # Get trading date list
         trading_dates = self.get_trading_dates(init_date, end_date)
@@ -422,20 +551,15 @@ class BaseAgent:
         if not os.path.exists(self.position_file):
             return {"error": "Position file does not exist"}
         
-        positions = []
-        with open(self.position_file, "r") as f:
-            for line in f:
-                positions.append(json.loads(line))
-        
-        if not positions:
+        latest_position = self.position_store.latest()
+        if latest_position is None:
             return {"error": "No position records"}
         
-        latest_position = positions[-1]
         return {
             "signature": self.signature,
             "latest_date": latest_position.get("date"),
             "positions": latest_position.get("positions", {}),
-            "total_records": len(positions)
+            "total_records": self.position_store.count()
         }
     
     def __str__(self) -> str:
@@ -0,0 +1,167 @@
+"""
+Conversation Context
+Token-budgeted message history for the trading loop
+
+Every step of a trading session adds the assistant's text and a "Tool results"
+message. Without a limit the prompt grows with every step, so this keeps the
+history under a token budget:
+
+1. The system prompt and the initial query are always sent. The latest positions
+   reported by a trade tool are pinned to the initial query.
+2. The last ``keep_recent_steps`` steps are always sent verbatim.
+3. Over budget, tool results of older steps are elided to a short preview
+   (oldest first), then older assistant messages, and finally the oldest steps
+   are dropped and replaced by a single notice.
+
+Token counts are estimated from the text (about 4 characters per token for
+Latin text, one token per CJK character) and cached per message.
+"""
+
+import re
+import json
+from typing import Any, Dict, List, Optional
+
+_CJK_RE = re.compile(r"[　-鿿가-힯＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class ConversationContext:
+    """Message history of one trading session, kept under a token budget"""
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        keep_recent_steps: int = 2,
+        system_prompt: str = "",
+        preview_chars: int = 300,
+    ):
+        """
+        Args:
+            token_budget: Maximum estimated tokens of system prompt plus messages, None for no limit
+            keep_recent_steps: Number of most recent steps always kept verbatim
+            system_prompt: System prompt of the session (counted against the budget)
+            preview_chars: Characters kept from an elided message
+        """
+        self.token_budget = token_budget
+        self.keep_recent_steps = max(1, keep_recent_steps)
+        self.preview_chars = preview_chars
+        self.system_tokens = estimate_tokens(system_prompt)
+        self._head: List[Dict[str, Any]] = []
+        self._steps: List[Dict[str, Any]] = []
+        self._dropped_steps = 0
+        self._positions: Optional[Dict[str, Any]] = None
+
+    # ------------------------------------------------------------------ input
+
+    def start(self, messages: List[Dict[str, str]]) -> None:
+        """Set the messages that open the session (the initial user query)"""
+        self._head = [self._entry(m["role"], m["content"]) for m in messages]
+        self._steps = []
+        self._dropped_steps = 0
+
+    def add_step(self, assistant_content: str, tool_results: str) -> None:
+        """Record one step: the assistant's text and the tool results sent back"""
+        self._steps.append({
+            "number": self._dropped_steps + len(self._steps) + 1,
+            "assistant": self._entry("assistant", assistant_content or ""),
+            "tools": self._entry("user", tool_results),
+        })
+        self._compact()
+
+    def observe_tool_results(self, contents: List[Any]) -> None:
+        """Pin the latest positions reported by trade tools (their "new_position" field)"""
+        for content in contents:
+            if not isinstance(content, str) or "new_position" not in content:
+                continue
+            try:
+                result = json.loads(content)
+            except ValueError:
+                continue
+            if isinstance(result, dict) and isinstance(result.get("new_position"), dict):
+                self._positions = result["new_position"]
+
+    @staticmethod
+    def _entry(role: str, content: str) -> Dict[str, Any]:
+        return {"role": role, "content": content, "tokens": estimate_tokens(content), "elided": False}
+
+    # ----------------------------------------------------------------- output
+
+    def _pinned_head(self) -> List[Dict[str, Any]]:
+        if not self._head or self._positions is None:
+            return self._head
+        first = dict(self._head[0])
+        pinned = f"\n\nLatest positions (after your most recent trade): {json.dumps(self._positions, ensure_ascii=False)}"
+        first["content"] = first["content"] + pinned
+        first["tokens"] = first["tokens"] + estimate_tokens(pinned)
+        return [first] + self._head[1:]
+
+    def _dropped_notice(self) -> Optional[Dict[str, Any]]:
+        if not self._dropped_steps:
+            return None
+        return self._entry(
+            "user",
+            f"[{self._dropped_steps} earlier step(s) omitted to fit the context budget. "
+            f"Call the tools again if you need their results.]",
+        )
+
+    def _entries(self) -> List[Dict[str, Any]]:
+        entries = list(self._pinned_head())
+        notice = self._dropped_notice()
+        if notice:
+            entries.append(notice)
+        for step in self._steps:
+            entries.append(step["assistant"])
+            entries.append(step["tools"])
+        return entries
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Messages to send to the agent"""
+        return [{"role": e["role"], "content": e["content"]} for e in self._entries()]
+
+    def token_count(self) -> int:
+        """Estimated tokens of the system prompt plus all messages that would be sent"""
+        return self.system_tokens + sum(e["tokens"] for e in self._entries())
+
+    # ------------------------------------------------------------- compaction
+
+    def _elide(self, entry: Dict[str, Any], label: str) -> None:
+        content = entry["content"]
+        preview = content[:self.preview_chars].rstrip()
+        entry["content"] = f"[{label}, {entry['tokens']} tokens elided] {preview}..."
+        entry["tokens"] = estimate_tokens(entry["content"])
+        entry["elided"] = True
+
+    def _compact(self) -> None:
+        if not self.token_budget or self.token_count() <= self.token_budget:
+            return
+        before = self.token_count()
+        old_steps = self._steps[:-self.keep_recent_steps]
+
+        # 1. Older tool results, then 2. older assistant messages, oldest first
+        for key, label in (("tools", "Earlier tool results"), ("assistant", "Earlier reasoning")):
+            for step in old_steps:
+                entry = step[key]
+                if not entry["elided"] and len(entry["content"]) > self.preview_chars:
+                    self._elide(entry, f"{label} (step {step['number']})")
+                    if self.token_count() <= self.token_budget:
+                        break
+            if self.token_count() <= self.token_budget:
+                break
+
+        # 3. Drop the oldest steps
+        while self.token_count() > self.token_budget and len(self._steps) > self.keep_recent_steps:
+            self._steps.pop(0)
+            self._dropped_steps += 1
+
+        after = self.token_count()
+        if after < before:
+            print(f"🗜️ Context compacted: ~{before} -> ~{after} tokens (budget {self.token_budget})")
+        if after > self.token_budget:
+            print(f"⚠️ The {self.keep_recent_steps} most recent step(s) alone exceed the context budget")
@@ -0,0 +1,189 @@
+"""
+LLM Cache
+Content-addressed record/replay cache for chat model calls
+
+Every model call is keyed by the SHA-256 of the full request: the serialized
+model configuration (provider, model name, endpoint, parameters), the bound
+tools and call options, and the message list including the system prompt.
+Per-response bookkeeping of earlier messages (ids, token usage, response
+metadata) is left out of the key, so a replayed conversation hashes the same
+as the recorded one. Responses are stored one JSON file per key under
+LLM_CACHE_DIR.
+
+Modes (LLM_CACHE_MODE):
+    passthrough  No caching, every call goes to the provider (default)
+    record       Serve cached responses, call the provider on a miss and store the result
+    replay       Serve cached responses only; a miss raises LLMCacheMiss, no network calls
+
+Recording a run once and replaying it (ideally with trading_mode "replay", so tool
+results are point-in-time as well) gives deterministic, free and fast re-runs.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PASSTHROUGH = "passthrough"
+RECORD = "record"
+REPLAY = "replay"
+CACHE_MODES = [PASSTHROUGH, RECORD, REPLAY]
+
+
+class LLMCacheMiss(RuntimeError):
+    """A request has no recorded response in replay mode"""
+
+
+# Message fields that differ between a live and a cached response of the same request
+_VOLATILE_FIELDS = ("id", "response_metadata", "usage_metadata")
+
+
+def _normalize_prompt(prompt: str) -> str:
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    if not isinstance(messages, list):
+        return prompt
+    for message in messages:
+        fields = message.get("kwargs") if isinstance(message, dict) else None
+        if isinstance(fields, dict):
+            for key in _VOLATILE_FIELDS:
+                fields.pop(key, None)
+    return json.dumps(messages, sort_keys=True, ensure_ascii=False)
+
+
+def request_key(prompt: str, llm_string: str) -> str:
+    """Content address of a model request"""
+    return hashlib.sha256(f"{llm_string}\n{_normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+class LLMCache(BaseCache):
+    """File-per-request LLM response store used as a langchain model cache"""
+
+    def __init__(self, cache_dir: str, mode: str = RECORD):
+        """
+        Args:
+            cache_dir: Directory of the content-addressed response files
+            mode: "record" (read-through) or "replay" (cache only)
+        """
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unsupported LLM cache mode: {mode} (expected {RECORD} or {REPLAY})")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Recorded generations of a request, None on a miss (raises in replay mode)"""
+        key = request_key(prompt, llm_string)
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                record = json.load(f)
+            generations = [
+                ChatGeneration(
+                    message=messages_from_dict([g["message"]])[0],
+                    generation_info=g.get("generation_info"),
+                )
+                for g in record["generations"]
+            ]
+        except FileNotFoundError:
+            generations = None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring unreadable LLM cache entry {key}: {e}")
+            generations = None
+
+        with self._lock:
+            if generations is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if generations is None and self.mode == REPLAY:
+            raise LLMCacheMiss(
+                f"No recorded LLM response for request {key} in {self.cache_dir}. "
+                f"Record it first with LLM_CACHE_MODE={RECORD}."
+            )
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Store the generations of a request (atomic write, last writer wins)"""
+        if not all(isinstance(g, ChatGeneration) for g in return_val):
+            return
+        key = request_key(prompt, llm_string)
+        path = self._path(key)
+        record = {
+            "key": key,
+            "created_at": datetime.now().isoformat(),
+            "generations": [
+                {"message": message_to_dict(g.message), "generation_info": g.generation_info}
+                for g in return_val
+            ],
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self.writes += 1
+
+    def clear(self, **kwargs: Any) -> None:
+        """Delete all recorded responses"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(shard_dir, name))
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this process"""
+        with self._lock:
+            return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "writes": self.writes}
+
+
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """
+    Process-wide LLM cache configured by LLM_CACHE_MODE and LLM_CACHE_DIR
+
+    Returns:
+        The cache, or None in passthrough mode
+    """
+    global _llm_cache
+    mode = os.getenv("LLM_CACHE_MODE", PASSTHROUGH).strip().lower()
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Invalid LLM_CACHE_MODE: {mode} (expected one of {', '.join(CACHE_MODES)})")
+    if mode == PASSTHROUGH:
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None or _llm_cache.mode != mode:
+            cache_dir = os.getenv("LLM_CACHE_DIR") or os.path.join(project_root, "data", "llm_cache")
+            _llm_cache = LLMCache(cache_dir, mode)
+            print(f"🗃️ LLM cache: {mode} ({cache_dir})")
+    return _llm_cache
@@ -0,0 +1,237 @@
+"""
+Scripted Chat Model
+Local stand-in for an LLM that plays back a fixed sequence of responses
+
+Used with the "scripted/" provider prefix to exercise the agent loop, the MCP
+tools and the ledger without a model provider, e.g. for benchmarks and load tests:
+
+    "basemodel": "scripted/buy_and_hold"          built-in script
+    "basemodel": "scripted/configs/my_script.json" script file
+
+A script is a list of model responses, played in order within one trading
+session. The turn to play is derived from the request itself (the steps and
+tool calls it already holds, including steps the agent omitted to fit its
+context budget), so every agent, every day and every retried session starts
+from the first turn. Once the script is exhausted the model answers with the stop signal.
+
+Script file format:
+    {
+      "latency": 0.05,                 # seconds per call, or [min, max] for uniform jitter
+      "turns": [
+        {"tool_calls": [{"name": "get_current_price_okx", "args": {"symbol": "BTC/USDT"}}]},
+        {"tool_calls": [{"name": "buy_okx", "args": {"symbol": "BTC/USDT", "amount": 0.001}}]},
+        {"content": "Bought BTC. {STOP_SIGNAL}"}
+      ]
+    }
+
+"{STOP_SIGNAL}" in a content string is replaced with the agent's stop signal.
+SCRIPTED_LATENCY overrides the latency of every script.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import Field
+
+from agent.conversation_context import estimate_tokens
+from prompts.agent_prompt import STOP_SIGNAL
+
+BUILTIN_SCRIPTS: Dict[str, Dict[str, Any]] = {
+    # Ends the session right away: measures the bare loop overhead
+    "stop": {
+        "turns": [
+            {"content": "No changes today. {STOP_SIGNAL}"},
+        ],
+    },
+    # Reads prices and news, keeps the positions
+    "observe": {
+        "turns": [
+            {"tool_calls": [
+                {"name": "get_multiple_prices_okx", "args": {"symbols": ["BTC/USDT", "ETH/USDT", "SOL/USDT"]}},
+                {"name": "search_news", "args": {"query": "bitcoin", "ticker": "BTC"}},
+            ]},
+            {"content": "Market reviewed, holding positions. {STOP_SIGNAL}"},
+        ],
+    },
+    # Buys a small amount of BTC every session
+    "buy_and_hold": {
+        "turns": [
+            {"tool_calls": [
+                {"name": "get_current_price_okx", "args": {"symbol": "BTC/USDT"}},
+                {"name": "get_current_price_okx", "args": {"symbol": "ETH/USDT"}},
+            ]},
+            {"tool_calls": [
+                {"name": "buy_okx", "args": {"symbol": "BTC/USDT", "amount": 0.001}},
+            ]},
+            {"content": "Bought 0.001 BTC. {STOP_SIGNAL}"},
+        ],
+    },
+}
+
+
+def load_script(name: str) -> Dict[str, Any]:
+    """
+    Resolve a script by built-in name or JSON file path
+
+    Args:
+        name: Built-in script name, or path of a script file (absolute or relative to the project root)
+
+    Returns:
+        Script dict with "turns" and optional "latency"
+
+    Raises:
+        ValueError: If the script does not exist or is malformed
+    """
+    if name in BUILTIN_SCRIPTS:
+        return BUILTIN_SCRIPTS[name]
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    candidates = [name] if os.path.isabs(name) else [name, os.path.join(project_root, name)]
+    for path in candidates:
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                script = json.load(f)
+            if isinstance(script, list):
+                script = {"turns": script}
+            if not isinstance(script.get("turns"), list):
+                raise ValueError(f"❌ Scripted model file {path} has no 'turns' list")
+            return script
+    raise ValueError(
+        f"❌ Unknown scripted model: {name}\n"
+        f"   Use a built-in script ({', '.join(BUILTIN_SCRIPTS)}) or the path of a JSON script file"
+    )
+
+
+# Notice ConversationContext puts in place of steps it dropped
+_DROPPED_STEPS = re.compile(r"\[(\d+) earlier step\(s\) omitted")
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that answers from a script instead of calling a provider"""
+
+    script_name: str = "stop"
+    turns: List[Dict[str, Any]] = Field(default_factory=list)
+    latency: Union[float, Tuple[float, float], List[float]] = 0.0
+    stop_signal: str = STOP_SIGNAL
+
+    @classmethod
+    def from_script(cls, name: str, latency: Optional[float] = None, **kwargs: Any) -> "ScriptedChatModel":
+        """
+        Create a model from a built-in script name or script file
+
+        Args:
+            name: Script name or path (see load_script)
+            latency: Seconds per call, overrides the script's latency
+        """
+        script = load_script(name)
+        if latency is None:
+            env_latency = os.getenv("SCRIPTED_LATENCY")
+            latency = float(env_latency) if env_latency else script.get("latency", 0.0)
+        return cls(script_name=name, turns=script["turns"], latency=latency, **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"script_name": self.script_name}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        """Scripts name their tools directly; the bound tools only go into the call options"""
+        names = [getattr(tool, "name", None) or getattr(tool, "__name__", str(tool)) for tool in tools]
+        return self.bind(tools=names, **kwargs)
+
+    # ---------------------------------------------------------------- playback
+
+    @staticmethod
+    def _session_key(messages: List[BaseMessage]) -> str:
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        opening = next((m.content for m in messages if isinstance(m, HumanMessage)), "")
+        # Only the first line: the agent appends its latest positions to the opening message
+        opening = opening.split("\n", 1)[0] if isinstance(opening, str) else json.dumps(opening)
+        return hashlib.sha256(f"{system}\n{opening}".encode("utf-8")).hexdigest()[:16]
+
+    def _step_end(self, index: int) -> int:
+        """Turn index after a whole agent step starting at ``index``: its tool-call turns and the closing reply"""
+        while index < len(self.turns) and self.turns[index].get("tool_calls"):
+            index += 1
+        return index + 1
+
+    def _turn_index(self, messages: List[BaseMessage]) -> int:
+        """
+        Turns already played in this session, derived from the request
+
+        Earlier steps appear as one assistant message each (or in a notice when
+        ConversationContext dropped them); AI messages with tool calls are turns of
+        the step in progress.
+        """
+        index = 0
+        for m in messages:
+            if isinstance(m, AIMessage):
+                index = index + 1 if m.tool_calls else self._step_end(index)
+            elif isinstance(m, HumanMessage) and isinstance(m.content, str):
+                dropped = _DROPPED_STEPS.match(m.content)
+                for _ in range(int(dropped.group(1)) if dropped else 0):
+                    index = self._step_end(index)
+        return index
+
+    def _next_turn(self, messages: List[BaseMessage]) -> Tuple[str, int, Optional[Dict[str, Any]]]:
+        key = self._session_key(messages)
+        index = self._turn_index(messages)
+        return key, index, self.turns[index] if index < len(self.turns) else None
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        key, index, turn = self._next_turn(messages)
+        if turn is None:
+            turn = {"content": "Script finished. {STOP_SIGNAL}"}
+
+        tool_calls = [
+            {"name": call["name"], "args": call.get("args", {}), "id": f"call_{key[:8]}_{index}_{i}", "type": "tool_call"}
+            for i, call in enumerate(turn.get("tool_calls", []))
+        ]
+        content = turn.get("content", "").replace("{STOP_SIGNAL}", self.stop_signal)
+        input_tokens = sum(estimate_tokens(m.content if isinstance(m.content, str) else json.dumps(m.content)) for m in messages)
+        output_tokens = estimate_tokens(content) + sum(estimate_tokens(json.dumps(c["args"])) for c in tool_calls)
+        message = AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            response_metadata={
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+                "model_name": f"scripted/{self.script_name}",
+            },
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _delay(self) -> float:
+        if isinstance(self.latency, (list, tuple)):
+            return random.uniform(self.latency[0], self.latency[1])
+        return float(self.latency or 0.0)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        delay = self._delay()
+        if delay > 0:
+            time.sleep(delay)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        delay = self._delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._respond(messages)
@@ -0,0 +1,120 @@
+"""
+Buffered session log writer
+
+The agent logs every step of a trading session to log.jsonl. Writing synchronously
+(open, append, close per message) puts disk I/O on the event loop that is waiting
+on LLM responses. SessionLogWriter instead hands entries to a background thread
+that keeps the file open, batches lines and flushes them when enough bytes are
+buffered or the flush interval has passed; closing the writer flushes the rest
+and fsyncs the file.
+"""
+
+import os
+import json
+import queue
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+_CLOSE = object()
+
+
+class SessionLogWriter:
+    """Appends JSON lines to one log file from a background thread"""
+
+    def __init__(self, path: str, flush_bytes: int = 64 * 1024, flush_interval: float = 1.0):
+        """
+        Args:
+            path: Log file (created if missing, appended to otherwise)
+            flush_bytes: Write the buffered lines once they reach this size
+            flush_interval: Write buffered lines at the latest after this many seconds
+        """
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.error: Optional[BaseException] = None
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"session-log:{os.path.basename(os.path.dirname(path))}",
+                                        daemon=True)
+        self._thread.start()
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        """
+        Queue one log entry (never blocks; serialization and I/O happen in the writer thread)
+
+        Args:
+            entry: JSON-serializable log entry; must not be modified afterwards
+        """
+        if self._closed:
+            raise RuntimeError(f"Session log {self.path} is closed")
+        self._queue.put(entry)
+
+    def close(self) -> None:
+        """Flush all queued entries, fsync and close the file (blocks until done)"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_CLOSE)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    async def aclose(self) -> None:
+        """close() without blocking the event loop"""
+        await asyncio.to_thread(self.close)
+
+    def _run(self) -> None:
+        try:
+            f = open(self.path, "a", encoding="utf-8")
+        except OSError as e:
+            self.error = e
+            print(f"❌ Cannot open session log {self.path}: {e}")
+            self._drain()
+            return
+
+        with f:
+            lines: List[str] = []
+            size = 0
+            deadline = None
+            while True:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is not None and item is not _CLOSE:
+                    line = json.dumps(item, ensure_ascii=False, default=str) + "\n"
+                    lines.append(line)
+                    size += len(line)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+
+                if lines and (item is None or item is _CLOSE or size >= self.flush_bytes):
+                    if not self._flush(f, lines):
+                        self._drain()
+                        return
+                    lines, size, deadline = [], 0, None
+
+                if item is _CLOSE:
+                    try:
+                        os.fsync(f.fileno())
+                    except OSError as e:
+                        self.error = e
+                    return
+
+    def _flush(self, f, lines: List[str]) -> bool:
+        try:
+            f.write("".join(lines))
+            f.flush()
+            return True
+        except OSError as e:
+            self.error = e
+            print(f"❌ Failed to write session log {self.path}: {e}")
+            return False
+
+    def _drain(self) -> None:
+        # Keep consuming after a failure so close() does not hang
+        while self._queue.get() is not _CLOSE:
+            pass
@@ -0,0 +1,72 @@
+"""
+Tool Concurrency
+Concurrency cap and timeout for the tool calls of an agent
+
+When the model requests several tools in one turn (e.g. prices for five symbols
+plus a news search), the agent graph dispatches them concurrently and adds the
+results in the order of the calls. This middleware bounds how many run at once
+per agent, and turns a tool that exceeds its time budget into an error result
+the model can react to, so one hung MCP server cannot stall the whole step.
+
+Order tools are exempt from the timeout: cancelling the call on our side does not
+cancel the order on the exchange, and a "timed out" result invites the model to
+place the same order again.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Iterable, Optional, Union
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.tools.tool_node import ToolCallRequest
+from langchain_core.messages import ToolMessage
+from langgraph.types import Command
+
+# Tools with side effects that must not be abandoned half way
+DEFAULT_UNTIMED_TOOLS = ("buy_okx", "sell_okx")
+
+
+class ToolConcurrencyMiddleware(AgentMiddleware):
+    """Limits concurrent tool calls of one agent and applies a per-call timeout"""
+
+    def __init__(self, max_parallel: Optional[int] = 8, timeout: Optional[float] = 60.0,
+                 untimed_tools: Iterable[str] = DEFAULT_UNTIMED_TOOLS):
+        """
+        Args:
+            max_parallel: Maximum tool calls of this agent running at once, None for no limit
+            timeout: Seconds a single tool call may take, None for no limit
+            untimed_tools: Tools that are never timed out (non-idempotent order tools)
+        """
+        super().__init__()
+        self.max_parallel = max_parallel
+        self.timeout = timeout
+        self.untimed_tools = frozenset(untimed_tools)
+        self._semaphore = asyncio.Semaphore(max_parallel) if max_parallel else None
+
+    async def _run(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[Union[ToolMessage, Command]]],
+    ) -> Union[ToolMessage, Command]:
+        if not self.timeout or request.tool_call["name"] in self.untimed_tools:
+            return await handler(request)
+        try:
+            return await asyncio.wait_for(handler(request), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            name = request.tool_call["name"]
+            print(f"⚠️ Tool {name} timed out after {self.timeout}s")
+            return ToolMessage(
+                content=f"❌ Tool {name} timed out after {self.timeout}s",
+                tool_call_id=request.tool_call["id"],
+                name=name,
+                status="error",
+            )
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[Union[ToolMessage, Command]]],
+    ) -> Union[ToolMessage, Command]:
+        if self._semaphore is None:
+            return await self._run(request, handler)
+        async with self._semaphore:
+            return await self._run(request, handler)
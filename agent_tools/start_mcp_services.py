@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 MCP Service Startup Script (Python Version)
-Start all four MCP services: Math, Search, TradeTools, LocalPrices
+Start all MCP services: Math, Search, TradeTools, LocalPrices, NewsSearch
 """
 
 import os
@@ -24,7 +24,8 @@ class MCPServiceManager:
             'math': int(os.getenv('MATH_HTTP_PORT', '8000')),
             'search': int(os.getenv('SEARCH_HTTP_PORT', '8001')),
             'trade_okx': int(os.getenv('TRADE_OKX_HTTP_PORT', '8004')),
-            'price_okx': int(os.getenv('GETPRICE_OKX_HTTP_PORT', '8005'))
+            'price_okx': int(os.getenv('GETPRICE_OKX_HTTP_PORT', '8005')),
+            'news': int(os.getenv('NEWS_HTTP_PORT', '8006'))
         }
         
         # Service configurations
@@ -48,6 +49,11 @@ class MCPServiceManager:
                 'script': 'tool_get_price_okx.py',
                 'name': 'OKXPriceTools',
                 'port': self.ports['price_okx']
+            },
+            'news': {
+                'script': 'tool_news_search.py',
+                'name': 'NewsSearch',
+                'port': self.ports['news']
             }
         }
         
@@ -6,7 +6,9 @@ from fastmcp import FastMCP
 import sys
 import os
 from typing import Dict, List, Optional, Any
-import ccxt
+import json
+import time
+import asyncio
 from datetime import datetime, timedelta
 
 # Add project root directory to Python path
@@ -14,11 +16,17 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
 from tools.general_tools import get_config_value
+from tools.okx_clients import get_pooled_async_okx_client, okx_clients_lifespan, okx_sandbox_from_env
+from tools.ticker_cache import get_ticker_cache, ticker_cache_key, fetch_ticker_cached
+from tools.candle_store import get_candle_store
+from tools.replay_exchange import get_async_replay_exchange, is_replay_exchange, is_replay_mode
+from prompts.agent_prompt import all_crypto_symbols
 
-mcp = FastMCP("OKXPriceTools")
+# Pooled async clients are closed when the server shuts down
+mcp = FastMCP("OKXPriceTools", lifespan=okx_clients_lifespan)
 
 
-def get_okx_client(trading_type: str = "spot"):
+async def get_okx_client(trading_type: str = "spot"):
     """
     Get OKX exchange client instance
     
@@ -27,25 +35,18 @@ def get_okx_client(trading_type: str = "spot"):
                      "future" for delivery futures, "option" for options
     
     Returns:
-        ccxt.okx: OKX exchange client
+        ccxt.async_support.okx: Pooled async OKX exchange client, or the replay exchange in replay mode
     """
-    # For price queries, we don't need API credentials
-    exchange = ccxt.okx({
-        'enableRateLimit': True,
-        'options': {
-            'defaultType': trading_type,
-        }
-    })
-    
-    # Use testnet if configured
-    if os.getenv("OKX_TESTNET", "false").lower() == "true":
-        exchange.set_sandbox_mode(True)
+    if is_replay_mode():
+        return get_async_replay_exchange(trading_type)
     
-    return exchange
+    # For price queries, we don't need API credentials.
+    # The client is shared: markets, rate limiter and HTTP session survive across tool calls
+    return await get_pooled_async_okx_client(trading_type)
 
 
 @mcp.tool()
-def get_current_price_okx(symbol: str, trading_type: str = "spot") -> Dict[str, Any]:
+async def get_current_price_okx(symbol: str, trading_type: str = "spot") -> Dict[str, Any]:
     """
     Get current market price for a cryptocurrency trading pair on OKX
     
@@ -65,6 +66,7 @@ def get_current_price_okx(symbol: str, trading_type: str = "spot") -> Dict[str,
           - timestamp: Timestamp of the price
           - datetime: Human-readable datetime
           - trading_type: Type of trading (spot/swap/future)
+          - price_age_ms: How long ago the price was fetched (prices are cached briefly)
         
     Example:
         >>> # Spot trading
@@ -73,8 +75,8 @@ def get_current_price_okx(symbol: str, trading_type: str = "spot") -> Dict[str,
         >>> result = get_current_price_okx("BTC/USDT:USDT", trading_type="swap")
     """
     try:
-        exchange = get_okx_client(trading_type)
-        ticker = exchange.fetch_ticker(symbol)
+        exchange = await get_okx_client(trading_type)
+        ticker, fetched_at = await fetch_ticker_cached(exchange, symbol, trading_type)
         
         return {
             "symbol": symbol,
@@ -86,7 +88,8 @@ def get_current_price_okx(symbol: str, trading_type: str = "spot") -> Dict[str,
             "low": ticker.get('low'),
             "volume": ticker.get('baseVolume'),
             "timestamp": ticker.get('timestamp'),
-            "datetime": ticker.get('datetime')
+            "datetime": ticker.get('datetime'),
+            "price_age_ms": int((time.time() - fetched_at) * 1000)
         }
     except Exception as e:
         return {
@@ -96,11 +99,96 @@ def get_current_price_okx(symbol: str, trading_type: str = "spot") -> Dict[str,
         }
 
 
+def _format_ticker(ticker: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-symbol price fields returned by the multi-symbol tools"""
+    return {
+        "price": ticker.get('last'),
+        "bid": ticker.get('bid'),
+        "ask": ticker.get('ask'),
+        "high": ticker.get('high'),
+        "low": ticker.get('low'),
+        "volume": ticker.get('baseVolume'),
+        "timestamp": ticker.get('timestamp'),
+        "datetime": ticker.get('datetime')
+    }
+
+
+async def _fetch_prices(symbols: List[str], trading_type: str = "spot") -> Dict[str, Any]:
+    """
+    Price many symbols with one bulk tickers request
+    
+    Fresh tickers come from the shared ticker cache; symbols missing from the
+    bulk response are fetched individually, concurrently.
+    """
+    exchange = await get_okx_client(trading_type)
+    # Replayed prices depend on the caller's simulated date and bypass the shared cache
+    cache = None if is_replay_exchange(exchange) else get_ticker_cache()
+    sandbox = okx_sandbox_from_env()
+    results = {}
+    
+    # Serve what the shared cache has fresh, bulk-fetch the rest
+    to_fetch = []
+    for symbol in symbols:
+        entry = cache.get_fresh(ticker_cache_key(symbol, trading_type, sandbox)) if cache else None
+        if entry is not None:
+            results[symbol] = _format_ticker(entry[0])
+        else:
+            to_fetch.append(symbol)
+    
+    tickers = {}
+    if to_fetch:
+        try:
+            tickers = await exchange.fetch_tickers(to_fetch)
+        except Exception as e:
+            print(f"⚠️ Bulk ticker request failed, falling back to per-symbol requests: {e}")
+    
+    missing = []
+    for symbol in to_fetch:
+        ticker = tickers.get(symbol)
+        if ticker:
+            if cache:
+                cache.put(ticker_cache_key(symbol, trading_type, sandbox), ticker)
+            results[symbol] = _format_ticker(ticker)
+        else:
+            missing.append(symbol)
+    
+    async def fetch_one(symbol):
+        try:
+            ticker, _ = await fetch_ticker_cached(exchange, symbol, trading_type)
+            return symbol, _format_ticker(ticker)
+        except Exception as e:
+            return symbol, {"error": f"Failed to fetch price: {str(e)}"}
+    
+    if missing:
+        results.update(await asyncio.gather(*(fetch_one(symbol) for symbol in missing)))
+    
+    # Keep the caller's symbol order
+    return {symbol: results[symbol] for symbol in symbols}
+
+
+def load_trading_pairs() -> List[str]:
+    """
+    Trading pair universe: okx_config.trading_pairs of the config file
+    (OKX_CONFIG_PATH, default configs/okx_crypto_config.json), else the default symbol list
+    """
+    config_path = os.getenv("OKX_CONFIG_PATH") or os.path.join(project_root, "configs", "okx_crypto_config.json")
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            trading_pairs = json.load(f).get("okx_config", {}).get("trading_pairs")
+        if trading_pairs:
+            return list(trading_pairs)
+    except Exception as e:
+        print(f"⚠️ Failed to read trading pairs from {config_path}: {e}")
+    return list(all_crypto_symbols)
+
+
 @mcp.tool()
-def get_multiple_prices_okx(symbols: List[str]) -> Dict[str, Any]:
+async def get_multiple_prices_okx(symbols: List[str]) -> Dict[str, Any]:
     """
     Get current market prices for multiple cryptocurrency trading pairs on OKX
     
+    All symbols are priced with a single bulk request.
+    
     Args:
         symbols: List of trading pair symbols (e.g., ["BTC/USDT", "ETH/USDT"])
         
@@ -111,38 +199,42 @@ def get_multiple_prices_okx(symbols: List[str]) -> Dict[str, Any]:
         >>> result = get_multiple_prices_okx(["BTC/USDT", "ETH/USDT"])
         >>> print(result)  # {"BTC/USDT": {...}, "ETH/USDT": {...}}
     """
-    results = {}
-    
     try:
-        exchange = get_okx_client()
+        return await _fetch_prices(symbols)
+    except Exception as e:
+        return {
+            "error": f"Failed to fetch prices: {str(e)}"
+        }
+
+
+@mcp.tool()
+async def get_universe_prices_okx(trading_type: str = "spot") -> Dict[str, Any]:
+    """
+    Get current market prices for every configured trading pair on OKX in one call
+    
+    The universe is okx_config.trading_pairs from the trading configuration file.
+    
+    Args:
+        trading_type: Trading type - "spot", "swap", "future", "option" (default: "spot")
         
-        for symbol in symbols:
-            try:
-                ticker = exchange.fetch_ticker(symbol)
-                results[symbol] = {
-                    "price": ticker.get('last'),
-                    "bid": ticker.get('bid'),
-                    "ask": ticker.get('ask'),
-                    "high": ticker.get('high'),
-                    "low": ticker.get('low'),
-                    "volume": ticker.get('baseVolume'),
-                    "timestamp": ticker.get('timestamp'),
-                    "datetime": ticker.get('datetime')
-                }
-            except Exception as e:
-                results[symbol] = {
-                    "error": f"Failed to fetch price: {str(e)}"
-                }
+    Returns:
+        Dict mapping symbols to their price information
         
-        return results
+    Example:
+        >>> result = get_universe_prices_okx()
+        >>> print(result)  # {"BTC/USDT": {...}, "ETH/USDT": {...}, ...}
+    """
+    try:
+        return await _fetch_prices(load_trading_pairs(), trading_type)
     except Exception as e:
         return {
-            "error": f"Failed to fetch prices: {str(e)}"
+            "error": f"Failed to fetch prices: {str(e)}",
+            "trading_type": trading_type
         }
 
 
 @mcp.tool()
-def get_historical_ohlcv_okx(symbol: str, timeframe: str = "1d", limit: int = 100) -> Dict[str, Any]:
+async def get_historical_ohlcv_okx(symbol: str, timeframe: str = "1d", limit: int = 100) -> Dict[str, Any]:
     """
     Get historical OHLCV (Open, High, Low, Close, Volume) data for a trading pair on OKX
     
@@ -152,21 +244,27 @@ def get_historical_ohlcv_okx(symbol: str, timeframe: str = "1d", limit: int = 10
         limit: Number of candles to fetch (default: 100)
         
     Returns:
-        Dict containing historical OHLCV data
+        Dict containing historical OHLCV data (served from the local candle store,
+        synced incrementally from OKX)
         
     Example:
         >>> result = get_historical_ohlcv_okx("BTC/USDT", "1d", 30)
         >>> print(result)  # {"symbol": "BTC/USDT", "timeframe": "1d", "data": [...]}
     """
     try:
-        exchange = get_okx_client()
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+        exchange = await get_okx_client()
+        if is_replay_exchange(exchange):
+            # Recorded candles that had closed by the simulated date
+            ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+        else:
+            # Closed candles come from the local store; only the missing tail is fetched
+            ohlcv = (await get_candle_store(symbol, timeframe).latest_async(exchange, limit)).tolist()
         
         # Format OHLCV data
         formatted_data = []
         for candle in ohlcv:
             formatted_data.append({
-                "timestamp": candle[0],
+                "timestamp": int(candle[0]),
                 "datetime": datetime.fromtimestamp(candle[0] / 1000).strftime("%Y-%m-%d %H:%M:%S"),
                 "open": candle[1],
                 "high": candle[2],
@@ -189,7 +287,7 @@ def get_historical_ohlcv_okx(symbol: str, timeframe: str = "1d", limit: int = 10
 
 
 @mcp.tool()
-def get_24h_stats_okx(symbol: str) -> Dict[str, Any]:
+async def get_24h_stats_okx(symbol: str) -> Dict[str, Any]:
     """
     Get 24-hour statistics for a trading pair on OKX
     
@@ -204,8 +302,8 @@ def get_24h_stats_okx(symbol: str) -> Dict[str, Any]:
         >>> print(result)  # {"symbol": "BTC/USDT", "change": 2.5, ...}
     """
     try:
-        exchange = get_okx_client()
-        ticker = exchange.fetch_ticker(symbol)
+        exchange = await get_okx_client()
+        ticker, _ = await fetch_ticker_cached(exchange, symbol)
         
         return {
             "symbol": symbol,
@@ -227,7 +325,7 @@ def get_24h_stats_okx(symbol: str) -> Dict[str, Any]:
 
 
 @mcp.tool()
-def get_orderbook_okx(symbol: str, limit: int = 20) -> Dict[str, Any]:
+async def get_orderbook_okx(symbol: str, limit: int = 20) -> Dict[str, Any]:
     """
     Get current order book (bids and asks) for a trading pair on OKX
     
@@ -243,8 +341,8 @@ def get_orderbook_okx(symbol: str, limit: int = 20) -> Dict[str, Any]:
         >>> print(result)  # {"symbol": "BTC/USDT", "bids": [...], "asks": [...]}
     """
     try:
-        exchange = get_okx_client()
-        orderbook = exchange.fetch_order_book(symbol, limit)
+        exchange = await get_okx_client()
+        orderbook = await exchange.fetch_order_book(symbol, limit)
         
         return {
             "symbol": symbol,
@@ -263,7 +361,7 @@ def get_orderbook_okx(symbol: str, limit: int = 20) -> Dict[str, Any]:
 
 
 @mcp.tool()
-def list_okx_markets(trading_type: str = "spot") -> Dict[str, Any]:
+async def list_okx_markets(trading_type: str = "spot") -> Dict[str, Any]:
     """
     List available trading markets on OKX
     
@@ -280,8 +378,8 @@ def list_okx_markets(trading_type: str = "spot") -> Dict[str, Any]:
         >>> result = list_okx_markets("swap")
     """
     try:
-        exchange = get_okx_client(trading_type)
-        markets = exchange.load_markets()
+        exchange = await get_okx_client(trading_type)
+        markets = await exchange.load_markets()
         
         # Filter markets by trading type
         filtered_markets = []
@@ -313,7 +411,7 @@ def list_okx_markets(trading_type: str = "spot") -> Dict[str, Any]:
 
 
 @mcp.tool()
-def get_funding_rate_okx(symbol: str) -> Dict[str, Any]:
+async def get_funding_rate_okx(symbol: str) -> Dict[str, Any]:
     """
     Get funding rate for perpetual swap contracts on OKX
     
@@ -328,10 +426,10 @@ def get_funding_rate_okx(symbol: str) -> Dict[str, Any]:
         >>> print(result)  # {"symbol": "BTC/USDT:USDT", "funding_rate": 0.0001, ...}
     """
     try:
-        exchange = get_okx_client("swap")
+        exchange = await get_okx_client("swap")
         
         # Fetch funding rate
-        funding_rate = exchange.fetch_funding_rate(symbol)
+        funding_rate = await exchange.fetch_funding_rate(symbol)
         
         return {
             "symbol": symbol,
@@ -1,12 +1,13 @@
 from typing import Dict, Any, Optional, List
 import os
+import asyncio
 import logging
-import requests
-import requests
+import weakref
+from contextlib import asynccontextmanager
+import aiohttp
 from fastmcp import FastMCP
 from dotenv import load_dotenv
 load_dotenv()
-import random
 from datetime import datetime, timedelta
 import re
 import json
@@ -14,6 +15,9 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from tools.general_tools import get_config_value
+from tools.search_cache import PAGE, SEARCH, get_search_cache, page_key, search_key
+from tools.replay_exchange import is_replay_mode
+from tools.news_index import search_local_news
 
 logger = logging.getLogger(__name__)
 
@@ -95,51 +99,109 @@ def parse_date_to_standard(date_str: str) -> str:
     # If unable to parse, return original string
     return date_str
 
+# aiohttp sessions are bound to the loop that created them: one pooled session per event loop
+_http_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Keep-alive HTTP session of the running event loop, shared by all Jina requests"""
+    loop = asyncio.get_running_loop()
+    session = _http_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=int(os.getenv("JINA_MAX_CONNECTIONS", "16")))
+        session = _http_sessions[loop] = aiohttp.ClientSession(connector=connector)
+    return session
+
+
+@asynccontextmanager
+async def http_session_lifespan(server):
+    """FastMCP lifespan: closes the pooled HTTP session when the server stops"""
+    try:
+        yield
+    finally:
+        session = _http_sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+
 class WebScrapingJinaTool:
-    def __init__(self):
+    def __init__(self, top_k: Optional[int] = None, request_timeout: Optional[float] = None,
+                 deadline: Optional[float] = None):
+        """
+        Args:
+            top_k: Number of search hits to scrape (default JINA_SCRAPE_TOP_K or 3)
+            request_timeout: Timeout of one Jina request in seconds (default JINA_REQUEST_TIMEOUT or 15)
+            deadline: Time budget for all scrapes of a query in seconds (default JINA_SCRAPE_DEADLINE or 20)
+        """
         self.api_key = os.environ.get("JINA_API_KEY")
         if not self.api_key:
             raise ValueError("Jina API key not provided! Please set JINA_API_KEY environment variable.")
+        self.top_k = top_k or int(os.getenv("JINA_SCRAPE_TOP_K", "3"))
+        self.request_timeout = request_timeout or float(os.getenv("JINA_REQUEST_TIMEOUT", "15"))
+        self.deadline = deadline or float(os.getenv("JINA_SCRAPE_DEADLINE", "20"))
+        # Shared on-disk cache of search hits and scraped pages (None if disabled)
+        self.cache = get_search_cache()
 
-    def __call__(self, query: str) -> List[Dict[str, Any]]:
+    async def __call__(self, query: str) -> List[Dict[str, Any]]:
         print(f"Searching for {query}")
-        all_urls = self._jina_search(query)
-        return_content = []
+        all_urls = await self._jina_search(query)
         print(f"Found {len(all_urls)} URLs")
-        if len(all_urls)>1:
-            # Randomly select three to form new all_urls
-            all_urls = random.sample(all_urls, 1)
-        for url in all_urls:
-            print(f"Scraping {url}")
-            return_content.append(self._jina_scrape(url))
-            print(f"Scraped {url}")
+        # Scrape the top-ranked hits concurrently, keep whatever finishes before the deadline
+        urls = all_urls[:self.top_k]
+        tasks = [asyncio.ensure_future(self._jina_scrape(url)) for url in urls]
+        if not tasks:
+            return []
+        done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"⚠️ {len(pending)} of {len(tasks)} scrapes missed the {self.deadline}s deadline")
 
-        return return_content  
+        return_content = []
+        for url, task in zip(urls, tasks):
+            if task in done:
+                print(f"Scraped {url}")
+                return_content.append(task.result())
+        return return_content
 
-    def _jina_scrape(self, url: str) -> Dict[str, Any]:
+    async def _jina_scrape(self, url: str) -> Dict[str, Any]:
+        if self.cache is not None:
+            cached = await self.cache.aget(PAGE, page_key(url))
+            if cached is not None:
+                return cached
+        
         try:
             jina_url = f'https://r.jina.ai/{url}'
             headers = {
                 "Accept": "application/json",
                 'Authorization': self.api_key,
-                'X-Timeout': "10",
+                'X-Timeout': str(int(self.request_timeout)),
                 "X-With-Generated-Alt": "true",
             }
-            response = requests.get(jina_url, headers=headers)
-
-            if response.status_code != 200:
-                raise Exception(f"Jina AI Reader Failed for {url}: {response.status_code}")
+            timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+            async with get_http_session().get(jina_url, headers=headers, timeout=timeout) as response:
+                if response.status != 200:
+                    raise Exception(f"Jina AI Reader Failed for {url}: {response.status}")
+                response_dict = await response.json(content_type=None)
 
-            response_dict = response.json()
-
-            return {
+            page = {
                 'url': response_dict['data']['url'],
                 'title': response_dict['data']['title'],
                 'description': response_dict['data']['description'],
                 'content': response_dict['data']['content'],
                 'publish_time': response_dict['data'].get('publishedTime', 'unknown')
             }
+            if self.cache is not None:
+                await self.cache.aput(PAGE, page_key(url), page)
+            return page
 
+        except asyncio.TimeoutError:
+            logger.error(f"Jina AI Reader timed out for {url}")
+            return {
+                'url': url,
+                'content': '',
+                'error': f"Timed out after {self.request_timeout}s"
+            }
         except Exception as e:
             logger.error(str(e))
             return {
@@ -148,8 +210,17 @@ class WebScrapingJinaTool:
                 'error': str(e)
             }
 
-    def _jina_search(self, query: str) -> List[str]:
-        url = f'https://s.jina.ai/?q={query}&n=1'
+    async def _jina_search(self, query: str) -> List[str]:
+        # Hits are filtered by TODAY_DATE, so the date is part of the cache key
+        today_date = get_config_value("TODAY_DATE")
+        cache_key = search_key(query, today_date)
+        if self.cache is not None:
+            cached = await self.cache.aget(SEARCH, cache_key)
+            if cached is not None:
+                print(f"Found {len(cached)} URLs in search cache")
+                return cached
+        
+        url = 'https://s.jina.ai/'
         headers = {
             'Authorization': f'Bearer {self.api_key}',        
             "Accept": "application/json",
@@ -157,10 +228,10 @@ class WebScrapingJinaTool:
         }
    
         try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()  # 检查HTTP状态码
-            
-            json_data = response.json()
+            timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+            async with get_http_session().get(url, params={"q": query, "n": 1}, headers=headers, timeout=timeout) as response:
+                response.raise_for_status()  # 检查HTTP状态码
+                json_data = await response.json(content_type=None)
             
             # Check if response data is valid
             if json_data is None:
@@ -189,7 +260,6 @@ class WebScrapingJinaTool:
                     continue
                 
                 # Check if before TODAY_DATE
-                today_date = get_config_value("TODAY_DATE")
                 if today_date:
                     if today_date > standardized_date:
                         filtered_urls.append(item['url'])
@@ -198,9 +268,14 @@ class WebScrapingJinaTool:
                     filtered_urls.append(item['url'])
             
             print(f"Found {len(filtered_urls)} URLs after filtering")
+            if self.cache is not None:
+                await self.cache.aput(SEARCH, cache_key, filtered_urls)
             return filtered_urls
             
-        except requests.exceptions.RequestException as e:
+        except asyncio.TimeoutError:
+            print(f"❌ Jina API request timed out after {self.request_timeout}s")
+            return []
+        except aiohttp.ClientError as e:
             print(f"❌ Jina API request failed: {e}")
             return []
         except ValueError as e:
@@ -211,11 +286,12 @@ class WebScrapingJinaTool:
             return []
 
 
-mcp = FastMCP("Search")
+# The pooled HTTP session is closed when the server shuts down
+mcp = FastMCP("Search", lifespan=http_session_lifespan)
 
 
 @mcp.tool()
-def get_information(query: str) -> str:
+async def get_information(query: str) -> str:
     """
     Use search tool to scrape and return main content information related to specified query in a structured way.
 
@@ -232,9 +308,16 @@ def get_information(query: str) -> str:
 
         If scraping fails, returns corresponding error information.
     """
+    # Replay backtests stay offline and point-in-time: answer from the local news index
+    if is_replay_mode():
+        try:
+            return search_local_news(query)
+        except Exception as e:
+            return f"❌ News search failed: {str(e)}"
+    
     try:
         tool = WebScrapingJinaTool()
-        results = tool(query)
+        results = await tool(query)
         
         # Check if results are empty
         if not results:
@@ -0,0 +1,48 @@
+"""
+News Search Tool
+Offline full-text search over the local news feeds (data/news.json, data/news/)
+"""
+from fastmcp import FastMCP
+import sys
+import os
+from typing import Optional
+from dotenv import load_dotenv
+load_dotenv()
+
+# Add project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from tools.news_index import search_local_news
+
+mcp = FastMCP("NewsSearch")
+
+
+@mcp.tool()
+def search_news(query: str, ticker: Optional[str] = None, limit: int = 5) -> str:
+    """
+    Search recorded crypto and market news published before the current trading date
+
+    Results are ranked by relevance (BM25 over titles and summaries) and include the
+    overall sentiment and, when a ticker is given, the sentiment towards that asset.
+
+    Args:
+        query: Key words to search for (e.g. "bitcoin ETF inflows"); empty returns the latest news
+        ticker: Optional asset filter, e.g. "BTC", "ETH" or "BTC/USDT"
+        limit: Maximum number of articles to return (default: 5)
+
+    Returns:
+        A string with the matching articles: URL, title, source, publish time, sentiment and summary
+
+    Example:
+        >>> result = search_news("stablecoin regulation", ticker="BTC")
+    """
+    try:
+        return search_local_news(query, ticker, max(1, min(int(limit), 20)))
+    except Exception as e:
+        return f"❌ News search failed: {str(e)}"
+
+
+if __name__ == "__main__":
+    port = int(os.getenv("NEWS_HTTP_PORT", "8006"))
+    mcp.run(transport="streamable-http", port=port)
@@ -5,20 +5,30 @@ Provides buy and sell functionality for cryptocurrency trading on OKX exchange
 from fastmcp import FastMCP
 import sys
 import os
+import asyncio
 from typing import Dict, List, Optional, Any
-import ccxt
 
 # Add project root directory to Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from tools.general_tools import get_config_value, write_config_value
-import json
+from tools.runtime_context import get_runtime_context
+from tools.position_store import PositionStore, OrderRejected
+from tools.sqlite_ledger import SQLiteLedger, ledger_db_path, ledger_enabled
+from tools.okx_clients import get_pooled_async_okx_client, okx_clients_lifespan, okx_credentials_from_env
+from tools.ticker_cache import fetch_ticker_cached
+from tools.replay_exchange import get_async_replay_exchange, is_replay_mode
+import time
 
-mcp = FastMCP("OKXTradeTools")
+# Pooled async clients are closed when the server shuts down
+mcp = FastMCP("OKXTradeTools", lifespan=okx_clients_lifespan)
 
+# Position stores keep their index in memory between tool calls
+_position_stores: Dict[str, PositionStore] = {}
+_sqlite_ledger: Optional[SQLiteLedger] = None
 
-def get_okx_client(trading_type: str = "spot"):
+
+async def get_okx_client(trading_type: str = "spot"):
     """
     Get OKX exchange client instance
     
@@ -27,58 +37,62 @@ def get_okx_client(trading_type: str = "spot"):
                      "future" for delivery futures, "option" for options
     
     Returns:
-        ccxt.okx: OKX exchange client
+        ccxt.async_support.okx: Pooled async OKX exchange client, or the replay exchange in replay mode
         
     Raises:
         ValueError: If OKX API credentials are not set
     """
-    api_key = os.getenv("OKX_API_KEY")
-    api_secret = os.getenv("OKX_API_SECRET")
-    passphrase = os.getenv("OKX_PASSPHRASE")
+    if is_replay_mode():
+        # Orders are simulated and priced from recorded data, no credentials needed
+        return get_async_replay_exchange(trading_type)
     
-    if not all([api_key, api_secret, passphrase]):
+    credentials = okx_credentials_from_env()
+    if credentials is None:
         raise ValueError("OKX API credentials not set. Please set OKX_API_KEY, OKX_API_SECRET, and OKX_PASSPHRASE environment variables")
     
-    # Initialize OKX exchange client
-    exchange = ccxt.okx({
-        'apiKey': api_key,
-        'secret': api_secret,
-        'password': passphrase,
-        'enableRateLimit': True,
-        'options': {
-            'defaultType': trading_type,  # 支持 spot, swap, future, option
-        }
-    })
-    
-    # Use testnet for testing if configured
-    if os.getenv("OKX_TESTNET", "false").lower() == "true":
-        exchange.set_sandbox_mode(True)
-    
-    return exchange
+    # Shared client: markets, rate limiter and HTTP session survive across tool calls
+    return await get_pooled_async_okx_client(trading_type, credentials=credentials)
 
 
-def get_current_price(symbol: str, trading_type: str = "spot") -> float:
+async def get_current_quote(symbol: str, trading_type: str = "spot") -> tuple:
     """
-    Get current market price for a trading pair
+    Get current market price and when it was fetched
+    
+    Prices come from the ticker cache shared with the price server, so an order
+    placed right after a price lookup does not hit the exchange again.
     
     Args:
         symbol: Trading pair symbol (e.g., "BTC/USDT" for spot, "BTC/USDT:USDT" for swap)
         trading_type: Trading type - "spot", "swap", "future", "option"
         
     Returns:
-        Current market price
+        (price, fetched_at): Current market price and fetch time in epoch seconds
     """
     try:
-        exchange = get_okx_client(trading_type)
-        ticker = exchange.fetch_ticker(symbol)
-        return ticker['last']
+        exchange = await get_okx_client(trading_type)
+        ticker, fetched_at = await fetch_ticker_cached(exchange, symbol, trading_type)
+        return ticker['last'], fetched_at
     except Exception as e:
         print(f"Error fetching price for {symbol}: {e}")
         raise
 
 
+async def get_current_price(symbol: str, trading_type: str = "spot") -> float:
+    """
+    Get current market price for a trading pair
+    
+    Args:
+        symbol: Trading pair symbol (e.g., "BTC/USDT" for spot, "BTC/USDT:USDT" for swap)
+        trading_type: Trading type - "spot", "swap", "future", "option"
+        
+    Returns:
+        Current market price
+    """
+    return (await get_current_quote(symbol, trading_type))[0]
+
+
 @mcp.tool()
-def buy_okx(symbol: str, amount: float, order_type: str = "market", trading_type: str = "spot") -> Dict[str, Any]:
+async def buy_okx(symbol: str, amount: float, order_type: str = "market", trading_type: str = "spot") -> Dict[str, Any]:
     """
     Buy cryptocurrency on OKX exchange
     
@@ -106,63 +120,61 @@ def buy_okx(symbol: str, amount: float, order_type: str = "market", trading_type
         >>> # Perpetual swap (futures)
         >>> result = buy_okx("BTC/USDT:USDT", 1, trading_type="swap")
     """
-    signature = get_config_value("SIGNATURE")
+    runtime = get_runtime_context()
+    signature = runtime.signature
     if signature is None:
         raise ValueError("SIGNATURE environment variable is not set")
     
-    today_date = get_config_value("TODAY_DATE")
+    today_date = runtime.today_date
     
     try:
-        # Get current position and action ID
-        current_position, current_action_id = get_latest_position_okx(today_date, signature)
-        
-        # Get current price
-        current_price = get_current_price(symbol, trading_type)
+        # Get current price (outside the ledger transaction, so the ledger is never locked during network I/O)
+        current_price, price_fetched_at = await get_current_quote(symbol, trading_type)
         
         # Calculate cost
         cost = current_price * amount
-        cash_left = current_position.get("USDT", 0) - cost
-        
-        # Check if sufficient funds
-        if cash_left < 0:
-            return {
-                "error": "Insufficient USDT balance",
-                "required": cost,
-                "available": current_position.get("USDT", 0),
-                "symbol": symbol,
-                "date": today_date
-            }
-        
-        # Execute order on OKX (commented out for simulation mode)
-        # exchange = get_okx_client()
-        # order = exchange.create_market_buy_order(symbol, amount)
-        
-        # Simulate order for now
-        order = {
-            "id": f"simulated_{current_action_id + 1}",
-            "symbol": symbol,
-            "type": order_type,
-            "side": "buy",
-            "amount": amount,
-            "price": current_price,
-            "cost": cost,
-            "status": "closed"
-        }
-        
-        # Update position
-        new_position = current_position.copy()
-        new_position["USDT"] = cash_left
         
         # Extract base currency from symbol (e.g., "BTC" from "BTC/USDT")
         base_currency = symbol.split("/")[0]
-        new_position[base_currency] = new_position.get(base_currency, 0) + amount
         
-        # Save position record
-        position_file_path = os.path.join(project_root, "data", "agent_data", signature, "position", "position_okx.jsonl")
-        os.makedirs(os.path.dirname(position_file_path), exist_ok=True)
-        
-        with open(position_file_path, "a") as f:
-            record = {
+        def apply_buy(current_position: Dict[str, Any], current_action_id: int) -> Dict[str, Any]:
+            cash_left = current_position.get("USDT", 0) - cost
+            
+            # Check if sufficient funds
+            if cash_left < 0:
+                raise OrderRejected({
+                    "error": "Insufficient USDT balance",
+                    "required": cost,
+                    "available": current_position.get("USDT", 0),
+                    "symbol": symbol,
+                    "date": today_date
+                })
+            
+            # Execute order on OKX (commented out for simulation mode)
+            # exchange = get_okx_client()
+            # order = exchange.create_market_buy_order(symbol, amount)
+            
+            # Age of the fill price at execution time
+            price_age_ms = int((time.time() - price_fetched_at) * 1000)
+            
+            # Simulate order for now
+            order = {
+                "id": f"simulated_{current_action_id + 1}",
+                "symbol": symbol,
+                "type": order_type,
+                "side": "buy",
+                "amount": amount,
+                "price": current_price,
+                "cost": cost,
+                "status": "closed"
+            }
+            
+            # Update position
+            new_position = current_position.copy()
+            new_position["USDT"] = cash_left
+            new_position[base_currency] = new_position.get(base_currency, 0) + amount
+            
+            return {
                 "date": today_date,
                 "id": current_action_id + 1,
                 "this_action": {
@@ -171,25 +183,31 @@ def buy_okx(symbol: str, amount: float, order_type: str = "market", trading_type
                     "amount": amount,
                     "price": current_price,
                     "cost": cost,
-                    "trading_type": trading_type
+                    "trading_type": trading_type,
+                    "price_age_ms": price_age_ms
                 },
                 "positions": new_position,
                 "order_info": order
             }
-            f.write(json.dumps(record) + "\n")
         
-        write_config_value("IF_TRADE", True)
+        # Read the latest position, apply the order, save the new record atomically and
+        # flag the trade. The ledger and the runtime env file may wait on a lock, so
+        # this runs off the event loop
+        record = await asyncio.to_thread(execute_order, signature, today_date, apply_buy, runtime)
         
         return {
             "success": True,
-            "order_id": order["id"],
+            "order_id": record["order_info"]["id"],
             "symbol": symbol,
             "amount": amount,
             "price": current_price,
             "cost": cost,
-            "new_position": new_position
+            "price_age_ms": record["this_action"]["price_age_ms"],
+            "new_position": record["positions"]
         }
         
+    except OrderRejected as e:
+        return e.payload
     except Exception as e:
         return {
             "error": f"Failed to execute buy order: {str(e)}",
@@ -199,7 +217,7 @@ def buy_okx(symbol: str, amount: float, order_type: str = "market", trading_type
 
 
 @mcp.tool()
-def sell_okx(symbol: str, amount: float, order_type: str = "market", trading_type: str = "spot") -> Dict[str, Any]:
+async def sell_okx(symbol: str, amount: float, order_type: str = "market", trading_type: str = "spot") -> Dict[str, Any]:
     """
     Sell cryptocurrency on OKX exchange
     
@@ -227,62 +245,65 @@ def sell_okx(symbol: str, amount: float, order_type: str = "market", trading_typ
         >>> # Perpetual swap (futures)
         >>> result = sell_okx("BTC/USDT:USDT", 1, trading_type="swap")
     """
-    signature = get_config_value("SIGNATURE")
+    runtime = get_runtime_context()
+    signature = runtime.signature
     if signature is None:
         raise ValueError("SIGNATURE environment variable is not set")
     
-    today_date = get_config_value("TODAY_DATE")
+    today_date = runtime.today_date
     
     try:
-        # Get current position and action ID
-        current_position, current_action_id = get_latest_position_okx(today_date, signature)
-        
         # Extract base currency from symbol
         base_currency = symbol.split("/")[0]
         
-        # Check if holding this currency
-        if base_currency not in current_position or current_position[base_currency] < amount:
-            return {
-                "error": f"Insufficient {base_currency} balance",
-                "have": current_position.get(base_currency, 0),
-                "want_to_sell": amount,
-                "symbol": symbol,
-                "date": today_date
-            }
+        def check_balance(current_position: Dict[str, Any]) -> None:
+            # Check if holding this currency
+            if base_currency not in current_position or current_position[base_currency] < amount:
+                raise OrderRejected({
+                    "error": f"Insufficient {base_currency} balance",
+                    "have": current_position.get(base_currency, 0),
+                    "want_to_sell": amount,
+                    "symbol": symbol,
+                    "date": today_date
+                })
+        
+        # Reject early without a price lookup; re-checked inside the transaction
+        check_balance((await asyncio.to_thread(get_latest_position_okx, today_date, signature))[0])
         
         # Get current price
-        current_price = get_current_price(symbol, trading_type)
+        current_price, price_fetched_at = await get_current_quote(symbol, trading_type)
         
         # Calculate proceeds
         proceeds = current_price * amount
         
-        # Execute order on OKX (commented out for simulation mode)
-        # exchange = get_okx_client()
-        # order = exchange.create_market_sell_order(symbol, amount)
-        
-        # Simulate order for now
-        order = {
-            "id": f"simulated_{current_action_id + 1}",
-            "symbol": symbol,
-            "type": order_type,
-            "side": "sell",
-            "amount": amount,
-            "price": current_price,
-            "cost": proceeds,
-            "status": "closed"
-        }
-        
-        # Update position
-        new_position = current_position.copy()
-        new_position[base_currency] -= amount
-        new_position["USDT"] = new_position.get("USDT", 0) + proceeds
-        
-        # Save position record
-        position_file_path = os.path.join(project_root, "data", "agent_data", signature, "position", "position_okx.jsonl")
-        os.makedirs(os.path.dirname(position_file_path), exist_ok=True)
-        
-        with open(position_file_path, "a") as f:
-            record = {
+        def apply_sell(current_position: Dict[str, Any], current_action_id: int) -> Dict[str, Any]:
+            check_balance(current_position)
+            
+            # Execute order on OKX (commented out for simulation mode)
+            # exchange = get_okx_client()
+            # order = exchange.create_market_sell_order(symbol, amount)
+            
+            # Age of the fill price at execution time
+            price_age_ms = int((time.time() - price_fetched_at) * 1000)
+            
+            # Simulate order for now
+            order = {
+                "id": f"simulated_{current_action_id + 1}",
+                "symbol": symbol,
+                "type": order_type,
+                "side": "sell",
+                "amount": amount,
+                "price": current_price,
+                "cost": proceeds,
+                "status": "closed"
+            }
+            
+            # Update position
+            new_position = current_position.copy()
+            new_position[base_currency] -= amount
+            new_position["USDT"] = new_position.get("USDT", 0) + proceeds
+            
+            return {
                 "date": today_date,
                 "id": current_action_id + 1,
                 "this_action": {
@@ -291,25 +312,31 @@ def sell_okx(symbol: str, amount: float, order_type: str = "market", trading_typ
                     "amount": amount,
                     "price": current_price,
                     "proceeds": proceeds,
-                    "trading_type": trading_type
+                    "trading_type": trading_type,
+                    "price_age_ms": price_age_ms
                 },
                 "positions": new_position,
                 "order_info": order
             }
-            f.write(json.dumps(record) + "\n")
         
-        write_config_value("IF_TRADE", True)
+        # Read the latest position, apply the order, save the new record atomically and
+        # flag the trade. The ledger and the runtime env file may wait on a lock, so
+        # this runs off the event loop
+        record = await asyncio.to_thread(execute_order, signature, today_date, apply_sell, runtime)
         
         return {
             "success": True,
-            "order_id": order["id"],
+            "order_id": record["order_info"]["id"],
             "symbol": symbol,
             "amount": amount,
             "price": current_price,
             "proceeds": proceeds,
-            "new_position": new_position
+            "price_age_ms": record["this_action"]["price_age_ms"],
+            "new_position": record["positions"]
         }
         
+    except OrderRejected as e:
+        return e.payload
     except Exception as e:
         return {
             "error": f"Failed to execute sell order: {str(e)}",
@@ -318,6 +345,66 @@ def sell_okx(symbol: str, amount: float, order_type: str = "market", trading_typ
         }
 
 
+def get_position_store(signature: str) -> PositionStore:
+    """
+    Get the (cached) indexed position store of an agent
+    
+    Args:
+        signature: Model signature used in the data path
+        
+    Returns:
+        PositionStore for data/agent_data/<signature>/position/position_okx.jsonl
+    """
+    store = _position_stores.get(signature)
+    if store is None:
+        position_file = os.path.join(project_root, "data", "agent_data", signature, "position", "position_okx.jsonl")
+        store = _position_stores.setdefault(signature, PositionStore(position_file))
+    return store
+
+
+def get_sqlite_ledger() -> Optional[SQLiteLedger]:
+    """
+    Get the SQLite ledger if LEDGER_BACKEND=sqlite, otherwise None (jsonl files are used)
+    
+    Returns:
+        Shared SQLiteLedger instance or None
+    """
+    global _sqlite_ledger
+    if not ledger_enabled():
+        return None
+    if _sqlite_ledger is None:
+        _sqlite_ledger = SQLiteLedger(ledger_db_path())
+    return _sqlite_ledger
+
+
+def _initial_positions() -> Dict[str, Any]:
+    return {"USDT": float(os.getenv("INITIAL_CASH_USDT", "10000.0"))}
+
+
+def execute_order(signature: str, today_date: str, apply_fn, runtime=None) -> Dict[str, Any]:
+    """
+    Apply an order to the agent's ledger as one atomic read-modify-write
+    
+    Args:
+        signature: Model signature
+        today_date: Trading date
+        apply_fn: Builds the new position record from (positions, action_id),
+                  or raises OrderRejected
+        runtime: RuntimeContext whose IF_TRADE flag is set once the record is saved
+        
+    Returns:
+        The saved position record
+    """
+    ledger = get_sqlite_ledger()
+    if ledger is not None:
+        record = ledger.execute(signature, today_date, apply_fn, _initial_positions())
+    else:
+        record = get_position_store(signature).execute(today_date, apply_fn, _initial_positions())
+    if runtime is not None:
+        runtime.if_trade = True
+    return record
+
+
 def get_latest_position_okx(today_date: str, modelname: str) -> tuple:
     """
     Get latest OKX position
@@ -329,60 +416,16 @@ def get_latest_position_okx(today_date: str, modelname: str) -> tuple:
     Returns:
         (positions, max_id): Position dictionary and max action ID
     """
-    from pathlib import Path
-    
-    base_dir = Path(__file__).resolve().parents[1]
-    position_file = base_dir / "data" / "agent_data" / modelname / "position" / "position_okx.jsonl"
-    
-    if not position_file.exists():
-        # Initialize with default USDT balance
-        initial_cash = float(os.getenv("INITIAL_CASH_USDT", "10000.0"))
-        return {"USDT": initial_cash}, -1
-    
-    # Try to read today's record first
-    max_id_today = -1
-    latest_positions_today = {}
-    
-    with position_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                if doc.get("date") == today_date:
-                    current_id = doc.get("id", -1)
-                    if current_id > max_id_today:
-                        max_id_today = current_id
-                        latest_positions_today = doc.get("positions", {})
-            except Exception:
-                continue
-    
-    if max_id_today >= 0:
-        return latest_positions_today, max_id_today
-    
-    # If no record for today, get the latest record
-    max_id_all = -1
-    latest_positions_all = {}
-    
-    with position_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                current_id = doc.get("id", -1)
-                if current_id > max_id_all:
-                    max_id_all = current_id
-                    latest_positions_all = doc.get("positions", {})
-            except Exception:
-                continue
-    
-    if max_id_all >= 0:
-        return latest_positions_all, max_id_all
+    ledger = get_sqlite_ledger()
+    if ledger is not None:
+        latest = ledger.get_latest_position(modelname, today_date)
+    else:
+        latest = get_position_store(modelname).get_latest_position(today_date)
+    if latest is not None:
+        return latest
     
     # No records found, return initial balance
-    initial_cash = float(os.getenv("INITIAL_CASH_USDT", "10000.0"))
-    return {"USDT": initial_cash}, -1
+    return _initial_positions(), -1
 
 
 if __name__ == "__main__":
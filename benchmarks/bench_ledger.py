@@ -0,0 +1,141 @@
+"""
+Ledger benchmark: append and lookup cost of the jsonl PositionStore and the
+SQLite ledger at growing history sizes
+"""
+
+import os
+import json
+import time
+import random
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from benchmarks.common import latency_stats
+from tools.position_store import PositionStore
+from tools.sqlite_ledger import SQLiteLedger
+
+SIGNATURE = "bench-ledger"
+RECORDS_PER_DAY = 20
+_SYMBOLS = ["BTC/USDT", "ETH/USDT", "SOL/USDT", "BNB/USDT", "XRP/USDT"]
+
+
+def _record(action_id: int) -> Dict[str, Any]:
+    date = (datetime(2020, 1, 1) + timedelta(days=action_id // RECORDS_PER_DAY)).strftime("%Y-%m-%d")
+    symbol = _SYMBOLS[action_id % len(_SYMBOLS)]
+    return {
+        "date": date,
+        "id": action_id,
+        "this_action": {"action": "buy", "symbol": symbol, "amount": 0.01, "price": 100.0, "cost": 1.0},
+        "positions": {**{s: round(0.01 * (action_id % 7), 4) for s in _SYMBOLS}, "USDT": 10000.0 - action_id * 0.001},
+    }
+
+
+def _order(today: str) -> Callable[[Dict[str, Any], int], Dict[str, Any]]:
+    """apply_fn of a small buy on ``today``"""
+    def apply(positions: Dict[str, Any], action_id: int) -> Dict[str, Any]:
+        positions = dict(positions)
+        positions["BTC/USDT"] = positions.get("BTC/USDT", 0) + 0.01
+        return {"date": today, "id": action_id + 1,
+                "this_action": {"action": "buy", "symbol": "BTC/USDT", "amount": 0.01, "price": 100.0, "cost": 1.0},
+                "positions": positions}
+    return apply
+
+
+def _time_calls(fn: Callable[[int], Any], samples: int) -> List[float]:
+    durations = []
+    for i in range(samples):
+        start = time.perf_counter()
+        fn(i)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _bench_position_store(directory: str, size: int, samples: int, rng: random.Random) -> Dict[str, Any]:
+    path = os.path.join(directory, f"position-{size}.jsonl")
+    start = time.perf_counter()
+    with open(path, "w", encoding="utf-8") as f:
+        for action_id in range(size):
+            f.write(json.dumps(_record(action_id)) + "\n")
+    fill_s = time.perf_counter() - start
+
+    store = PositionStore(path)
+    start = time.perf_counter()
+    store.rebuild()
+    rebuild_s = time.perf_counter() - start
+
+    # A fresh instance loads the index file from disk, as a new tool server process would
+    start = time.perf_counter()
+    PositionStore(path).max_date()
+    open_s = time.perf_counter() - start
+
+    today = _record(size + samples)["date"]
+    dates = [_record(rng.randrange(size))["date"] for _ in range(samples)]
+    result = {
+        "file_mb": round(os.path.getsize(path) / 1e6, 2),
+        "fill_s": round(fill_s, 3),
+        "index_rebuild_s": round(rebuild_s, 3),
+        "index_open_s": round(open_s, 4),
+        "latest": latency_stats(_time_calls(lambda i: store.latest(), samples)),
+        "latest_by_date": latency_stats(_time_calls(lambda i: store.latest(dates[i]), samples)),
+        "append": latency_stats(_time_calls(lambda i: store.append(_record(size + i)), samples)),
+        "execute": latency_stats(_time_calls(lambda i: store.execute(today, _order(today), {}), samples)),
+    }
+    for suffix in ("", PositionStore.INDEX_SUFFIX):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return result
+
+
+def _bench_sqlite(directory: str, size: int, samples: int, rng: random.Random) -> Dict[str, Any]:
+    path = os.path.join(directory, f"ledger-{size}.db")
+    ledger = SQLiteLedger(path)
+    conn = ledger._connection()
+    start = time.perf_counter()
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO positions (signature, action_id, date, positions, record) VALUES (?, ?, ?, ?, ?)",
+        ((SIGNATURE, r["id"], r["date"], json.dumps(r["positions"]), json.dumps(r))
+         for r in map(_record, range(size))),
+    )
+    conn.execute("COMMIT")
+    fill_s = time.perf_counter() - start
+
+    dates = [_record(rng.randrange(size))["date"] for _ in range(samples)]
+    today = _record(size + samples)["date"]
+    result = {
+        "file_mb": round(os.path.getsize(path) / 1e6, 2),
+        "fill_s": round(fill_s, 3),
+        "latest": latency_stats(_time_calls(lambda i: ledger.get_latest_position(SIGNATURE), samples)),
+        "latest_by_date": latency_stats(_time_calls(lambda i: ledger.get_latest_position(SIGNATURE, dates[i]), samples)),
+        "append": latency_stats(_time_calls(lambda i: ledger.append(SIGNATURE, _record(size + i)), samples)),
+        "execute": latency_stats(_time_calls(lambda i: ledger.execute(SIGNATURE, today, _order(today), {}), samples)),
+    }
+    ledger.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return result
+
+
+def run(workdir: str, sizes: List[int], samples: int = 1000, seed: int = 7) -> Dict[str, Any]:
+    """
+    Benchmark both ledger backends
+
+    Args:
+        workdir: Scratch directory for the ledger files
+        sizes: History sizes (number of existing records) to test
+        samples: Timed operations per measurement
+        seed: Random seed for the looked-up dates
+
+    Returns:
+        {"jsonl": {size: stats}, "sqlite": {size: stats}}
+    """
+    directory = os.path.join(workdir, "ledger")
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    results: Dict[str, Any] = {"records_per_day": RECORDS_PER_DAY, "jsonl": {}, "sqlite": {}}
+    for size in sizes:
+        print(f"📒 Ledger benchmark: {size} records")
+        results["jsonl"][str(size)] = _bench_position_store(directory, size, samples, rng)
+        results["sqlite"][str(size)] = _bench_sqlite(directory, size, samples, rng)
+    return results
@@ -0,0 +1,116 @@
+"""
+Session benchmark: end-to-end trading sessions of N concurrent agents
+
+Each agent is a BaseAgent driven by the scripted model, trading on the replay
+exchange through the real MCP servers. Reports per-step latency (one agent
+invocation: model turns plus tool calls) and sessions per second.
+"""
+
+import os
+import json
+import time
+import asyncio
+from typing import Any, Dict, List
+
+from agent.base_agent.base_agent import BaseAgent
+from benchmarks.common import BENCH_SYMBOLS, latency_stats
+from prompts.agent_prompt import STOP_SIGNAL, agent_system_prompt
+from tools.runtime_context import agent_runtime_env_path, get_runtime_context
+
+
+class BenchAgent(BaseAgent):
+    """BaseAgent that records the duration of every step"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.step_durations: List[float] = []
+        self.sessions = 0
+
+    def get_system_prompt(self, today_date: str) -> str:
+        # Same template as production, filled from the local ledger instead of live prices
+        latest = self.position_store.latest() or {}
+        return agent_system_prompt.format(
+            date=today_date,
+            positions=json.dumps(latest.get("positions", {})),
+            yesterday_close_price="{}",
+            today_buy_price="{}",
+            STOP_SIGNAL=STOP_SIGNAL,
+        )
+
+    async def _ainvoke_with_retry(self, message, context):
+        start = time.perf_counter()
+        try:
+            return await super()._ainvoke_with_retry(message, context)
+        finally:
+            self.step_durations.append(time.perf_counter() - start)
+
+    async def run_trading_session(self, today_date: str) -> None:
+        await super().run_trading_session(today_date)
+        self.sessions += 1
+
+
+async def _run_agents(workdir: str, servers: Dict[str, Dict[str, Any]], agents: int, script: str,
+                      init_date: str, end_date: str, tag: str) -> Dict[str, Any]:
+    bench_agents = []
+    for i in range(agents):
+        signature = f"bench-{tag}-{i}"
+        runtime_env_path = agent_runtime_env_path(signature, os.path.join(workdir, "agent_data"))
+        os.makedirs(os.path.dirname(runtime_env_path), exist_ok=True)
+        get_runtime_context(runtime_env_path).update(
+            SIGNATURE=signature, TODAY_DATE=init_date, IF_TRADE=False, TRADING_MODE="replay",
+        )
+        agent = BenchAgent(
+            signature=signature,
+            basemodel=f"scripted/{script}",
+            stock_symbols=BENCH_SYMBOLS,
+            mcp_config=servers,
+            log_path=os.path.join(workdir, "agent_data"),
+            max_steps=10,
+            init_date=init_date,
+            runtime_env_path=runtime_env_path,
+        )
+        bench_agents.append(agent)
+
+    async def run_one(agent: BenchAgent) -> None:
+        await agent.initialize()
+        await agent.run_date_range(init_date, end_date)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(asyncio.create_task(run_one(agent)) for agent in bench_agents))
+    elapsed = time.perf_counter() - start
+
+    sessions = sum(agent.sessions for agent in bench_agents)
+    steps = [d for agent in bench_agents for d in agent.step_durations]
+    return {
+        "agents": agents,
+        "sessions": sessions,
+        "elapsed_s": round(elapsed, 3),
+        "sessions_per_s": round(sessions / elapsed, 2) if elapsed > 0 else None,
+        "step": latency_stats(steps),
+    }
+
+
+async def run(workdir: str, servers: Dict[str, Dict[str, Any]], agent_counts: List[int], init_date: str,
+              end_date: str, script: str = "buy_and_hold") -> Dict[str, Any]:
+    """
+    Run full date ranges with growing numbers of concurrent agents
+
+    Args:
+        workdir: Benchmark work directory (runtime env files, agent logs)
+        servers: MultiServerMCPClient config of the running servers
+        agent_counts: Numbers of concurrent agents to test, e.g. [1, 4, 16]
+        init_date: Registration date of the agents; sessions start the next weekday
+        end_date: Last trading date
+        script: Built-in scripted model script
+
+    Returns:
+        {"script": ..., "<agents>": {sessions, elapsed_s, sessions_per_s, step stats}}
+    """
+    results: Dict[str, Any] = {"script": script, "init_date": init_date, "end_date": end_date}
+    for count in agent_counts:
+        print(f"🤖 Session benchmark: {count} concurrent agent(s)")
+        result = await _run_agents(workdir, servers, count, script, init_date, end_date, tag=f"{script}-{count}")
+        results[str(count)] = result
+        print(f"   {result['sessions']} sessions in {result['elapsed_s']} s "
+              f"({result['sessions_per_s']} sessions/s), step p50 {result['step'].get('p50_ms', 0):.1f} ms")
+    return results
@@ -0,0 +1,70 @@
+"""
+Tool benchmark: round-trip latency of every MCP server as seen by the agent
+
+Calls go through langchain-mcp-adapters tools over streamable HTTP, the same
+path BaseAgent uses, against servers running on replayed synthetic data.
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+from langchain_mcp_adapters.client import MultiServerMCPClient
+
+from benchmarks.common import latency_stats
+from tools.runtime_context import RUNTIME_ENV_HEADER, agent_runtime_env_path, get_runtime_context
+
+# (server, tool, arguments) measured by default
+TOOL_CALLS: List[Tuple[str, str, Dict[str, Any]]] = [
+    ("math", "add", {"a": 1.5, "b": 2.5}),
+    ("okx_price", "get_current_price_okx", {"symbol": "BTC/USDT"}),
+    ("okx_price", "get_multiple_prices_okx", {"symbols": ["BTC/USDT", "ETH/USDT", "SOL/USDT"]}),
+    ("okx_price", "get_historical_ohlcv_okx", {"symbol": "ETH/USDT", "timeframe": "1h", "limit": 100}),
+    ("okx_trade", "buy_okx", {"symbol": "BTC/USDT", "amount": 0.0001}),
+    ("news", "search_news", {"query": "bitcoin etf inflows", "ticker": "BTC"}),
+    ("search", "get_information", {"query": "solana defi liquidity"}),
+]
+
+
+async def run(workdir: str, servers: Dict[str, Dict[str, Any]], today_date: str,
+              samples: int = 200, warmup: int = 5) -> Dict[str, Any]:
+    """
+    Measure tool round trips per server
+
+    Args:
+        workdir: Benchmark work directory (holds the runtime env file)
+        servers: MultiServerMCPClient config of the running servers
+        today_date: Simulated trading date of the calls
+        samples: Timed calls per tool
+        warmup: Untimed calls per tool (first-call imports, client pools)
+
+    Returns:
+        {"<server>.<tool>": latency stats with payload size}
+    """
+    runtime_env_path = agent_runtime_env_path("bench-tools", os.path.join(workdir, "agent_data"))
+    os.makedirs(os.path.dirname(runtime_env_path), exist_ok=True)
+    get_runtime_context(runtime_env_path).update(
+        SIGNATURE="bench-tools", TODAY_DATE=today_date, IF_TRADE=False, TRADING_MODE="replay",
+    )
+    config = {
+        name: {**cfg, "headers": {RUNTIME_ENV_HEADER: runtime_env_path}}
+        for name, cfg in servers.items()
+    }
+
+    results: Dict[str, Any] = {}
+    for server, tool_name, args in TOOL_CALLS:
+        tools = {tool.name: tool for tool in await MultiServerMCPClient({server: config[server]}).get_tools()}
+        tool = tools[tool_name]
+        response = None
+        for _ in range(warmup):
+            response = await tool.ainvoke(args)
+        durations = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            response = await tool.ainvoke(args)
+            durations.append(time.perf_counter() - start)
+        stats = latency_stats(durations)
+        stats["response_bytes"] = len(str(response).encode("utf-8"))
+        results[f"{server}.{tool_name}"] = stats
+        print(f"🔧 {server}.{tool_name}: p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+    return results
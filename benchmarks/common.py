@@ -0,0 +1,258 @@
+"""
+Benchmark helpers: latency statistics, synthetic replay data and local MCP servers
+
+Everything runs locally: prices come from synthetic candles served by the replay
+exchange, news from a synthetic feed, the ledger is a SQLite file in the work
+directory and the model is the scripted provider.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import platform
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from tools.candle_store import CandleStore, timeframe_to_ms
+
+BENCH_SYMBOLS = ["BTC/USDT", "ETH/USDT", "SOL/USDT"]
+_START_PRICES = {"BTC/USDT": 60000.0, "ETH/USDT": 3000.0, "SOL/USDT": 150.0}
+
+# MCP servers of the default agent config: name -> (script, port variable)
+MCP_SERVERS = {
+    "math": ("tool_math.py", "MATH_HTTP_PORT"),
+    "search": ("tool_jina_search.py", "SEARCH_HTTP_PORT"),
+    "okx_trade": ("tool_trade_okx.py", "TRADE_OKX_HTTP_PORT"),
+    "okx_price": ("tool_get_price_okx.py", "GETPRICE_OKX_HTTP_PORT"),
+    "news": ("tool_news_search.py", "NEWS_HTTP_PORT"),
+}
+
+
+# --------------------------------------------------------------- statistics
+
+def latency_stats(samples: List[float]) -> Dict[str, Any]:
+    """
+    Summarize latency samples
+
+    Args:
+        samples: Durations in seconds
+
+    Returns:
+        Count, mean, p50/p95/p99 and max in milliseconds
+    """
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "max_ms": round(float(ms.max()), 4),
+    }
+
+
+def environment_info() -> Dict[str, Any]:
+    """Machine and interpreter details stored with every result file"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+            capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+# ----------------------------------------------------------- synthetic data
+
+def write_synthetic_market(
+    candle_root: str,
+    start_date: str,
+    end_date: str,
+    symbols: List[str] = BENCH_SYMBOLS,
+    timeframes: List[str] = ("1h", "1d"),
+    seed: int = 7,
+) -> None:
+    """
+    Write random-walk candles for the replay exchange
+
+    Args:
+        candle_root: CandleStore root (CANDLE_STORE_PATH of the servers)
+        start_date: First day with data (YYYY-MM-DD)
+        end_date: Last day with data (YYYY-MM-DD), inclusive
+        symbols: Trading pairs to generate
+        timeframes: ccxt timeframes to generate
+        seed: Random seed, so every run replays the same prices
+    """
+    rng = random.Random(seed)
+    start_ms = int(datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp() * 1000)
+    end_ms = int((datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)).replace(tzinfo=timezone.utc).timestamp() * 1000)
+    for symbol in symbols:
+        for timeframe in timeframes:
+            step = timeframe_to_ms(timeframe)
+            price = _START_PRICES.get(symbol, 100.0)
+            candles = []
+            for ts in range(start_ms, end_ms, step):
+                open_ = price
+                price = max(price * (1 + rng.gauss(0, 0.01)), 0.01)
+                high = max(open_, price) * (1 + abs(rng.gauss(0, 0.002)))
+                low = min(open_, price) * (1 - abs(rng.gauss(0, 0.002)))
+                candles.append([ts, open_, high, low, price, rng.uniform(10, 1000)])
+            CandleStore(candle_root, symbol, timeframe).append(candles)
+
+
+def write_synthetic_news(path: str, start_date: str, end_date: str, per_day: int = 20, seed: int = 7) -> None:
+    """
+    Write an Alpha-Vantage-style news feed for the news index
+
+    Args:
+        path: Feed file to write
+        start_date: First publication day (YYYY-MM-DD)
+        end_date: Last publication day (YYYY-MM-DD)
+        per_day: Articles per day
+        seed: Random seed
+    """
+    rng = random.Random(seed)
+    words = ["bitcoin", "ether", "solana", "etf", "inflows", "regulation", "stablecoin", "rally",
+             "selloff", "liquidity", "funding", "miners", "defi", "exchange", "halving", "macro"]
+    tickers = ["CRYPTO:BTC", "CRYPTO:ETH", "CRYPTO:SOL"]
+    day = datetime.strptime(start_date, "%Y-%m-%d")
+    last = datetime.strptime(end_date, "%Y-%m-%d")
+    feed = []
+    while day <= last:
+        for i in range(per_day):
+            published = day + timedelta(minutes=rng.randrange(24 * 60))
+            feed.append({
+                "title": " ".join(rng.choice(words) for _ in range(6)).capitalize(),
+                "url": f"https://news.example/{day:%Y%m%d}/{i}",
+                "time_published": published.strftime("%Y%m%dT%H%M%S"),
+                "summary": " ".join(rng.choice(words) for _ in range(40)),
+                "source": "Benchmark Wire",
+                "overall_sentiment_score": round(rng.uniform(-1, 1), 3),
+                "overall_sentiment_label": "Neutral",
+                "ticker_sentiment": [{"ticker": rng.choice(tickers), "relevance_score": "0.5",
+                                      "ticker_sentiment_score": "0.1", "ticker_sentiment_label": "Neutral"}],
+            })
+        day += timedelta(days=1)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"feed": feed}, f)
+
+
+# ------------------------------------------------------------- MCP servers
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def server_env(workdir: str) -> Dict[str, str]:
+    """Environment of the benchmark servers: replay data, ledger and caches inside workdir"""
+    return {
+        "RUNTIME_ENV_ROOT": os.path.join(workdir, "agent_data"),
+        "CANDLE_STORE_PATH": os.path.join(workdir, "candles"),
+        "REPLAY_DATA_PATH": os.path.join(workdir, "replay"),
+        "NEWS_DATA_PATH": os.path.join(workdir, "news", "news.json"),
+        "LEDGER_BACKEND": "sqlite",
+        "LEDGER_DB_PATH": os.path.join(workdir, "ledger.db"),
+        "TICKER_CACHE_PATH": os.path.join(workdir, "cache", "tickers.db"),
+        "JINA_CACHE_TTL": "0",
+        "LLM_CACHE_MODE": "passthrough",
+    }
+
+
+@contextmanager
+def mcp_servers(workdir: str, startup_timeout: float = 60.0) -> Iterator[Dict[str, Dict[str, Any]]]:
+    """
+    Run the MCP tool servers as subprocesses on free local ports
+
+    Args:
+        workdir: Directory holding the synthetic data, ledger and server logs
+        startup_timeout: Seconds to wait for all servers to accept connections
+
+    Yields:
+        MultiServerMCPClient config for the running servers
+    """
+    env = dict(os.environ)
+    env.update(server_env(workdir))
+    ports = {name: _free_port() for name in MCP_SERVERS}
+    for name, (_, port_var) in MCP_SERVERS.items():
+        env[port_var] = str(ports[name])
+
+    log_dir = os.path.join(workdir, "server_logs")
+    os.makedirs(log_dir, exist_ok=True)
+    processes = []
+    try:
+        for name, (script, _) in MCP_SERVERS.items():
+            log = open(os.path.join(log_dir, f"{name}.log"), "w")
+            processes.append((subprocess.Popen(
+                [sys.executable, os.path.join(project_root, "agent_tools", script)],
+                cwd=os.path.join(project_root, "agent_tools"), env=env, stdout=log, stderr=subprocess.STDOUT,
+            ), log))
+        for name, port in ports.items():
+            if not _wait_for_port(port, startup_timeout):
+                raise RuntimeError(f"MCP server {name} did not start, see {log_dir}/{name}.log")
+        yield {
+            name: {"transport": "streamable_http", "url": f"http://127.0.0.1:{port}/mcp"}
+            for name, port in ports.items()
+        }
+    finally:
+        for process, log in processes:
+            process.terminate()
+        for process, log in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+
+
+def write_results(results: Dict[str, Any], output: Optional[str] = None) -> str:
+    """
+    Write a result file
+
+    Args:
+        results: Benchmark results
+        output: Target path, defaults to benchmarks/results/bench-<timestamp>.json
+
+    Returns:
+        Path of the written file
+    """
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(project_root, "benchmarks", "results", f"bench-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return output
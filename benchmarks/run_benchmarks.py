@@ -0,0 +1,139 @@
+"""
+Benchmark runner
+
+Runs the ledger, tool and session benchmarks locally (scripted model, replay
+exchange, synthetic data) and writes one JSON result file per run.
+
+Usage:
+    python -m benchmarks.run_benchmarks                          # all suites
+    python -m benchmarks.run_benchmarks --suites ledger --ledger-sizes 10000 100000 1000000
+    python -m benchmarks.run_benchmarks --suites sessions --agents 1 8 32 --end-date 2025-10-31
+    python -m benchmarks.run_benchmarks --compare old.json new.json
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks import bench_ledger, bench_sessions, bench_tools
+from benchmarks.common import (
+    environment_info,
+    mcp_servers,
+    server_env,
+    write_results,
+    write_synthetic_market,
+    write_synthetic_news,
+)
+
+SUITES = ["ledger", "tools", "sessions"]
+
+
+def _prepare_data(workdir: str, init_date: str, end_date: str) -> None:
+    history_start = (datetime.strptime(init_date, "%Y-%m-%d") - timedelta(days=60)).strftime("%Y-%m-%d")
+    write_synthetic_market(os.path.join(workdir, "candles"), history_start, end_date)
+    write_synthetic_news(os.path.join(workdir, "news", "news.json"), history_start, end_date)
+
+
+@contextlib.contextmanager
+def _quiet(enabled: bool) -> Iterator[None]:
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+async def _run_mcp_suites(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    _prepare_data(workdir, args.init_date, args.end_date)
+    # The agents' own process reads the same data, ledger and caches as the servers
+    os.environ.update(server_env(workdir))
+    with mcp_servers(workdir) as servers:
+        if "tools" in args.suites:
+            results["tools"] = await bench_tools.run(workdir, servers, args.end_date, samples=args.samples)
+        if "sessions" in args.suites:
+            sessions = {}
+            for count in args.agents:
+                print(f"🤖 Session benchmark: {count} concurrent agent(s)")
+                with _quiet(not args.verbose):
+                    result = await bench_sessions.run(
+                        workdir, servers, [count], args.init_date, args.end_date, script=args.script,
+                    )
+                sessions.update(result)
+                run = result[str(count)]
+                print(f"   {run['sessions']} sessions in {run['elapsed_s']} s ({run['sessions_per_s']} sessions/s), "
+                      f"step p50 {run['step'].get('p50_ms', 0):.1f} ms, p99 {run['step'].get('p99_ms', 0):.1f} ms")
+            results["sessions"] = sessions
+    return results
+
+
+def _flatten(results: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _flatten(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and (
+            key.endswith("_ms") or key.endswith("_s") or key == "sessions_per_s"
+        ):
+            yield path, float(value)
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """Print the metrics of two result files side by side"""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = dict(_flatten(json.load(f)["results"]))
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = dict(_flatten(json.load(f)["results"]))
+    print(f"{'metric':<70} {'old':>12} {'new':>12} {'change':>9}")
+    for key in sorted(old.keys() & new.keys()):
+        if not key.endswith(("p50_ms", "p99_ms", "sessions_per_s", "index_rebuild_s", "elapsed_s")):
+            continue
+        change = f"{(new[key] / old[key] - 1) * 100:+.1f}%" if old[key] else "n/a"
+        print(f"{key:<70} {old[key]:>12.3f} {new[key]:>12.3f} {change:>9}")
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the local AI-Trader benchmarks")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=SUITES, help="Benchmarks to run")
+    parser.add_argument("--ledger-sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000],
+                        help="Existing ledger records per measurement")
+    parser.add_argument("--samples", type=int, default=200, help="Timed operations per ledger/tool measurement")
+    parser.add_argument("--agents", nargs="+", type=int, default=[1, 4, 16], help="Concurrent agents per session run")
+    parser.add_argument("--script", default="buy_and_hold", help="Built-in scripted model script of the agents")
+    parser.add_argument("--init-date", default="2025-10-01", help="Agent registration date")
+    parser.add_argument("--end-date", default="2025-10-14", help="Last trading date")
+    parser.add_argument("--workdir", help="Scratch directory (default: a temporary directory)")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/bench-<timestamp>.json)")
+    parser.add_argument("--verbose", action="store_true", help="Show agent output during session runs")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir or stack.enter_context(tempfile.TemporaryDirectory(prefix="ai-trader-bench-"))
+        os.makedirs(workdir, exist_ok=True)
+        config = {k: v for k, v in vars(args).items() if k not in ("workdir", "output", "compare", "verbose")}
+        results: Dict[str, Any] = {}
+        if "ledger" in args.suites:
+            results["ledger"] = bench_ledger.run(workdir, args.ledger_sizes, samples=args.samples)
+        if "tools" in args.suites or "sessions" in args.suites:
+            results.update(asyncio.run(_run_mcp_suites(args, workdir)))
+
+    output = write_results({"environment": environment_info(), "config": config, "results": results}, args.output)
+    print(f"✅ Benchmark results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
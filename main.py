@@ -7,8 +7,10 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import tools and prompts
-from tools.general_tools import get_config_value, write_config_value
+from tools.general_tools import get_config_value, write_config_value, set_runtime_env_path
+from tools.runtime_context import agent_runtime_env_path, runtime_env_root
 from tools.config_validator import run_validation
+from tools.metrics import configure_metrics
 from prompts.agent_prompt import all_crypto_symbols
 
 
@@ -92,12 +94,147 @@ def load_config(config_path=None):
         exit(1)
 
 
-async def main(config_path=None, skip_validation=False):
+async def run_model(AgentClass, agent_type, model_config, agent_kwargs, init_date, end_date, runtime_env_path=None,
+                    trading_mode="crypto_okx"):
+    """
+    Create, initialize and run one model's agent over the date range
+    
+    Args:
+        AgentClass: Agent class to instantiate
+        agent_type: Agent type name (for display)
+        model_config: Model entry from the configuration file
+        agent_kwargs: Shared keyword arguments for the agent constructor
+        init_date: Start date
+        end_date: End date
+        runtime_env_path: Private runtime env file for this model (parallel mode)
+        trading_mode: "crypto_okx" for live OKX data, "replay" for recorded data
+        
+    Returns:
+        bool: False if the model was skipped because of an invalid entry
+        
+    Raises:
+        Exception: Any error raised while initializing or running the agent
+    """
+    # Read basemodel and signature directly from configuration file
+    model_name = model_config.get("name", "unknown")
+    basemodel = model_config.get("basemodel")
+    signature = model_config.get("signature")
+    openai_base_url = model_config.get("openai_base_url",None)
+    openai_api_key = model_config.get("openai_api_key",None)
+
+    # Validate required fields
+    if not basemodel:
+        print(f"❌ Model {model_name} missing basemodel field")
+        return False
+    if not signature:
+        print(f"❌ Model {model_name} missing signature field")
+        return False
+    
+    print("=" * 60)
+    print(f"🤖 Processing model: {model_name}")
+    print(f"📝 Signature: {signature}")
+    print(f"🔧 BaseModel: {basemodel}")
+    
+    # Isolate runtime state of this task before touching it
+    if runtime_env_path:
+        set_runtime_env_path(runtime_env_path)
+    
+    # Initialize runtime configuration
+    write_config_value("SIGNATURE", signature)
+    write_config_value("TODAY_DATE", end_date)
+    write_config_value("IF_TRADE", False)
+    write_config_value("TRADING_MODE", trading_mode)
+
+    # Dynamically create Agent instance
+    agent = AgentClass(
+        signature=signature,
+        basemodel=basemodel,
+        openai_base_url=openai_base_url,
+        openai_api_key=openai_api_key,
+        runtime_env_path=runtime_env_path,
+        **agent_kwargs
+    )
+    
+    print(f"✅ {agent_type} instance created successfully: {agent}")
+    
+    # Initialize MCP connection and AI model
+    await agent.initialize()
+    print("✅ Initialization successful")
+    # Run all trading days in date range
+    await agent.run_date_range(init_date, end_date)
+    
+    # Display final position summary
+    summary = agent.get_position_summary()
+    print(f"📊 Final position summary ({signature}):")
+    print(f"   - Latest date: {summary.get('latest_date')}")
+    print(f"   - Total records: {summary.get('total_records')}")
+    print(f"   - Cash balance: ${summary.get('positions', {}).get('CASH', 0):.2f}")
+    
+    print("=" * 60)
+    print(f"✅ Model {model_name} ({signature}) processing completed")
+    print("=" * 60)
+    return True
+
+
+async def run_models_parallel(AgentClass, agent_type, enabled_models, agent_kwargs, init_date, end_date, parallel,
+                              trading_mode="crypto_okx"):
+    """
+    Run several models concurrently, each as its own asyncio task
+    
+    Every model gets a private runtime env file under its data directory, so the
+    SIGNATURE/TODAY_DATE/IF_TRADE state of one model never leaks into another.
+    A failing or skipped (misconfigured) model is reported and does not stop the others.
+    
+    Args:
+        AgentClass: Agent class to instantiate
+        agent_type: Agent type name (for display)
+        enabled_models: Model entries to run
+        agent_kwargs: Shared keyword arguments for the agent constructor
+        init_date: Start date
+        end_date: End date
+        parallel: Maximum number of models running at the same time
+        trading_mode: "crypto_okx" for live OKX data, "replay" for recorded data
+        
+    Returns:
+        list: Names of the models that failed or were skipped
+    """
+    semaphore = asyncio.Semaphore(parallel)
+    log_path = agent_kwargs["log_path"]
+    if os.path.realpath(log_path) != runtime_env_root():
+        print(f"⚠️ log_path {log_path} differs from RUNTIME_ENV_ROOT ({runtime_env_root()}); "
+              f"the tool servers will ignore the per-model runtime env files")
+    
+    async def run_one(model_config):
+        signature = model_config.get("signature") or model_config.get("name", "unknown")
+        runtime_env_path = agent_runtime_env_path(signature, log_path)
+        os.makedirs(os.path.dirname(runtime_env_path), exist_ok=True)
+        async with semaphore:
+            return await run_model(
+                AgentClass, agent_type, model_config, agent_kwargs,
+                init_date, end_date, runtime_env_path=runtime_env_path, trading_mode=trading_mode
+            )
+    
+    tasks = [asyncio.create_task(run_one(model_config)) for model_config in enabled_models]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    failed = []
+    for model_config, result in zip(enabled_models, results):
+        if isinstance(result, BaseException):
+            model_name = model_config.get("name", "unknown")
+            print(f"❌ Error processing model {model_name} ({model_config.get('signature')}): {result}")
+            failed.append(model_name)
+        elif result is False:
+            failed.append(model_config.get("name", "unknown"))
+    return failed
+
+
+async def main(config_path=None, skip_validation=False, parallel=1):
     """Run trading experiment using BaseAgent class
     
     Args:
         config_path: Configuration file path, if None use default config
         skip_validation: Skip configuration validation (not recommended)
+        parallel: Number of models to run concurrently (1 = one after another)
     """
     # Determine config path
     if config_path is None:
@@ -125,6 +262,9 @@ async def main(config_path=None, skip_validation=False):
         print(str(e))
         exit(1)
     
+    # Trading mode: live OKX market data or recorded data replayed as of each trading day
+    trading_mode = config.get("trading_mode", "crypto_okx")
+    
     # Get date range from configuration file
     INIT_DATE = config["date_range"]["init_date"]
     END_DATE = config["date_range"]["end_date"]
@@ -157,6 +297,11 @@ async def main(config_path=None, skip_validation=False):
     max_retries = agent_config.get("max_retries", 3)
     base_delay = agent_config.get("base_delay", 0.5)
     initial_cash = agent_config.get("initial_cash", 10000.0)
+    context_token_budget = agent_config.get("context_token_budget", 32000)
+    context_keep_recent = agent_config.get("context_keep_recent", 2)
+    max_parallel_tools = agent_config.get("max_parallel_tools", 8)
+    tool_timeout = agent_config.get("tool_timeout", 60.0)
+    untimed_tools = agent_config.get("untimed_tools")
     
     # Display enabled model information
     model_names = [m.get("name", m.get("signature")) for m in enabled_models]
@@ -164,80 +309,52 @@ async def main(config_path=None, skip_validation=False):
     print("🚀 Starting trading experiment")
     print(f"🤖 Agent type: {agent_type}")
     print(f"📅 Date range: {INIT_DATE} to {END_DATE}")
+    print(f"🔁 Trading mode: {trading_mode}")
     print(f"🤖 Model list: {model_names}")
-    print(f"⚙️  Agent config: max_steps={max_steps}, max_retries={max_retries}, base_delay={base_delay}, initial_cash={initial_cash}")
-                    
+    print(f"⚙️  Agent config: max_steps={max_steps}, max_retries={max_retries}, base_delay={base_delay}, initial_cash={initial_cash}, context_token_budget={context_token_budget}, max_parallel_tools={max_parallel_tools}, tool_timeout={tool_timeout}")
+    
+    # Get log path configuration
+    log_path = log_config.get("log_path", "./data/agent_data")
+    
+    agent_kwargs = dict(
+        stock_symbols=all_crypto_symbols,
+        log_path=log_path,
+        max_steps=max_steps,
+        max_retries=max_retries,
+        base_delay=base_delay,
+        initial_cash=initial_cash,
+        init_date=INIT_DATE,
+        context_token_budget=context_token_budget,
+        context_keep_recent=context_keep_recent,
+        max_parallel_tools=max_parallel_tools,
+        tool_timeout=tool_timeout,
+        untimed_tools=untimed_tools
+    )
+    
+    if parallel > 1:
+        print(f"⚡ Parallel mode: up to {parallel} models concurrently")
+        failed = await run_models_parallel(
+            AgentClass, agent_type, enabled_models, agent_kwargs,
+            INIT_DATE, END_DATE, parallel, trading_mode=trading_mode
+        )
+        if failed:
+            print(f"❌ {len(failed)} of {len(enabled_models)} models failed: {failed}")
+            exit(1)
+        print("🎉 All models processing completed!")
+        return
+    
     for model_config in enabled_models:
-        # Read basemodel and signature directly from configuration file
-        model_name = model_config.get("name", "unknown")
-        basemodel = model_config.get("basemodel")
-        signature = model_config.get("signature")
-        openai_base_url = model_config.get("openai_base_url",None)
-        openai_api_key = model_config.get("openai_api_key",None)
-
-        # Validate required fields
-        if not basemodel:
-            print(f"❌ Model {model_name} missing basemodel field")
-            continue
-        if not signature:
-            print(f"❌ Model {model_name} missing signature field")
-            continue
-        
-        print("=" * 60)
-        print(f"🤖 Processing model: {model_name}")
-        print(f"📝 Signature: {signature}")
-        print(f"🔧 BaseModel: {basemodel}")
-        
-        # Initialize runtime configuration
-        write_config_value("SIGNATURE", signature)
-        write_config_value("TODAY_DATE", END_DATE)
-        write_config_value("IF_TRADE", False)
-
-
-        # Get log path configuration
-        log_path = log_config.get("log_path", "./data/agent_data")
-
         try:
-            # Dynamically create Agent instance
-            agent = AgentClass(
-                signature=signature,
-                basemodel=basemodel,
-                stock_symbols=all_crypto_symbols,
-                log_path=log_path,
-                openai_base_url=openai_base_url,
-                openai_api_key=openai_api_key,
-                max_steps=max_steps,
-                max_retries=max_retries,
-                base_delay=base_delay,
-                initial_cash=initial_cash,
-                init_date=INIT_DATE
-            )
-            
-            print(f"✅ {agent_type} instance created successfully: {agent}")
-            
-            # Initialize MCP connection and AI model
-            await agent.initialize()
-            print("✅ Initialization successful")
-            # Run all trading days in date range
-            await agent.run_date_range(INIT_DATE, END_DATE)
-            
-            # Display final position summary
-            summary = agent.get_position_summary()
-            print(f"📊 Final position summary:")
-            print(f"   - Latest date: {summary.get('latest_date')}")
-            print(f"   - Total records: {summary.get('total_records')}")
-            print(f"   - Cash balance: ${summary.get('positions', {}).get('CASH', 0):.2f}")
-            
+            await run_model(AgentClass, agent_type, model_config, agent_kwargs, INIT_DATE, END_DATE,
+                            trading_mode=trading_mode)
         except Exception as e:
+            model_name = model_config.get("name", "unknown")
+            signature = model_config.get("signature")
             print(f"❌ Error processing model {model_name} ({signature}): {str(e)}")
             print(f"📋 Error details: {e}")
             # Can choose to continue processing next model, or exit
             # continue  # Continue processing next model
             exit()  # Or exit program
-        
-        print("=" * 60)
-        print(f"✅ Model {model_name} ({signature}) processing completed")
-        print("=" * 60)
     
     print("🎉 All models processing completed!")
     
@@ -250,6 +367,11 @@ if __name__ == "__main__":
     parser.add_argument('config', nargs='?', default=None, help='Configuration file path')
     parser.add_argument('--skip-validation', action='store_true', help='Skip configuration validation (not recommended)')
     parser.add_argument('--validate-only', action='store_true', help='Only run validation, do not start trading')
+    parser.add_argument('--parallel', type=int, default=1, metavar='N', help='Run up to N enabled models concurrently (default: 1)')
+    parser.add_argument('--metrics', nargs='?', const='', default=None, metavar='PATH',
+                        help='Record session/step/LLM/tool timings to a jsonl file (default: data/metrics/metrics-<timestamp>.jsonl)')
+    parser.add_argument('--metrics-port', type=int, default=None, metavar='PORT',
+                        help='Serve the metrics in Prometheus format on http://127.0.0.1:PORT/metrics (implies --metrics)')
     
     args = parser.parse_args()
     
@@ -272,5 +394,11 @@ if __name__ == "__main__":
     else:
         print(f"📄 Using default configuration file: configs/okx_crypto_config.json")
     
-    asyncio.run(main(config_path, skip_validation=args.skip_validation))
+    if args.parallel < 1:
+        parser.error("--parallel must be at least 1")
+    
+    if args.metrics is not None or args.metrics_port:
+        configure_metrics(args.metrics or None, prometheus_port=args.metrics_port)
+    
+    asyncio.run(main(config_path, skip_validation=args.skip_validation, parallel=args.parallel))
 
@@ -0,0 +1,412 @@
+"""
+Candle Store
+Local on-disk OHLCV store per (symbol, timeframe) with incremental sync
+
+Candles are kept as a flat float64 array of rows
+``[timestamp_ms, open, high, low, close, volume]`` in
+``<root>/<SYMBOL>/<timeframe>.f64`` and read through ``numpy.memmap``. Only closed
+candles are persisted; syncing appends the candles after the last stored one, and
+backfilling pages ``since`` further into the past. ``<timeframe>.meta.json``
+remembers ranges the exchange has no candles for (e.g. before a pair was listed),
+so they are not requested again.
+
+Calendar timeframes ("1M", "1y") have candles of varying length; they count as
+closed only once the exchange has returned the next candle.
+
+Environment:
+    CANDLE_STORE_PATH   Store root (default ./data/candles)
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Any, Dict, Generator, List, Optional, Tuple
+
+import numpy as np
+
+from tools.file_utils import file_lock, atomic_write_json
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+ROW_WIDTH = len(COLUMNS)
+ROW_BYTES = ROW_WIDTH * 8
+
+_TIMEFRAME_UNITS_MS = {
+    "s": 1000,
+    "m": 60 * 1000,
+    "h": 60 * 60 * 1000,
+    "d": 24 * 60 * 60 * 1000,
+    "w": 7 * 24 * 60 * 60 * 1000,
+    "M": 30 * 24 * 60 * 60 * 1000,
+    "y": 365 * 24 * 60 * 60 * 1000,
+}
+
+# Shortest and longest candle of calendar units; timeframe_to_ms() returns their nominal 30 / 365 days
+_CALENDAR_UNIT_SPANS_MS = {
+    "M": (28 * 24 * 60 * 60 * 1000, 31 * 24 * 60 * 60 * 1000),
+    "y": (365 * 24 * 60 * 60 * 1000, 366 * 24 * 60 * 60 * 1000),
+}
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """
+    Convert a ccxt timeframe string to milliseconds
+
+    Args:
+        timeframe: e.g. "1m", "4h", "1d", "1w"
+
+    Returns:
+        Candle duration in milliseconds
+    """
+    amount, unit = timeframe[:-1], timeframe[-1]
+    if unit not in _TIMEFRAME_UNITS_MS or not amount.isdigit():
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return int(amount) * _TIMEFRAME_UNITS_MS[unit]
+
+
+def symbol_dirname(symbol: str) -> str:
+    """Directory name of a symbol: "BTC/USDT:USDT" -> "BTC-USDT_USDT" """
+    return symbol.replace("/", "-").replace(":", "_")
+
+
+class CandleStore:
+    """Array-backed OHLCV history of one symbol and timeframe"""
+
+    def __init__(self, root: str, symbol: str, timeframe: str):
+        """
+        Args:
+            root: Store root directory
+            symbol: Trading pair symbol (e.g. "BTC/USDT")
+            timeframe: ccxt timeframe (e.g. "1d")
+        """
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.calendar = timeframe[-1] in _CALENDAR_UNIT_SPANS_MS
+        if self.calendar:
+            shortest, longest = _CALENDAR_UNIT_SPANS_MS[timeframe[-1]]
+            self.min_span_ms, self.max_span_ms = int(timeframe[:-1]) * shortest, int(timeframe[:-1]) * longest
+        else:
+            self.min_span_ms = self.max_span_ms = self.timeframe_ms
+        self.path = os.path.join(root, symbol_dirname(symbol), f"{timeframe}.f64")
+        self.meta_path = os.path.join(root, symbol_dirname(symbol), f"{timeframe}.meta.json")
+        self._lock = threading.RLock()
+        self._mmap: Optional[np.ndarray] = None
+        self._mmap_size = -1
+
+    # ---------------------------------------------------------------- reading
+
+    def _size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def array(self) -> np.ndarray:
+        """
+        All stored candles as a read-only (n, 6) array, memory-mapped from disk
+
+        Returns:
+            ndarray of [timestamp_ms, open, high, low, close, volume] rows, oldest first
+        """
+        size = self._size() // ROW_BYTES * ROW_BYTES
+        with self._lock:
+            if size != self._mmap_size:
+                if size == 0:
+                    self._mmap = np.empty((0, ROW_WIDTH), dtype=np.float64)
+                else:
+                    self._mmap = np.memmap(self.path, dtype=np.float64, mode="r", shape=(size // ROW_BYTES, ROW_WIDTH))
+                self._mmap_size = size
+            return self._mmap
+
+    def __len__(self) -> int:
+        return self._size() // ROW_BYTES
+
+    def first_timestamp(self) -> Optional[int]:
+        data = self.array()
+        return int(data[0, 0]) if len(data) else None
+
+    def last_timestamp(self) -> Optional[int]:
+        data = self.array()
+        return int(data[-1, 0]) if len(data) else None
+
+    def range(self, since: Optional[int] = None, until: Optional[int] = None, limit: Optional[int] = None) -> np.ndarray:
+        """
+        Candles with since <= timestamp < until
+
+        Args:
+            since: Start timestamp in ms (inclusive), None for the beginning
+            until: End timestamp in ms (exclusive), None for the end
+            limit: Keep only the last ``limit`` candles of the range
+
+        Returns:
+            (n, 6) ndarray view
+        """
+        data = self.array()
+        timestamps = data[:, 0]
+        start = 0 if since is None else int(np.searchsorted(timestamps, since, side="left"))
+        end = len(data) if until is None else int(np.searchsorted(timestamps, until, side="left"))
+        if limit is not None and end - start > limit:
+            start = end - limit
+        return data[start:end]
+
+    # ---------------------------------------------------------------- writing
+
+    def _closed(self, candles: List[List[float]], now_ms: int) -> List[List[float]]:
+        """Drop candles that have not closed yet: all but the newest, plus fixed-length ones past their close time"""
+        newest = max((c[0] for c in candles), default=None)
+        return [c for c in candles if c[0] < newest or (not self.calendar and c[0] + self.timeframe_ms <= now_ms)]
+
+    def append(self, candles: List[List[float]]) -> int:
+        """
+        Append candles newer than the last stored one
+
+        Args:
+            candles: ccxt OHLCV rows, any order
+
+        Returns:
+            Number of candles written
+        """
+        with self._lock, file_lock(self.path):
+            last = self.last_timestamp()
+            rows = sorted({int(c[0]): c[:ROW_WIDTH] for c in candles if last is None or c[0] > last}.items())
+            if not rows:
+                return 0
+            block = np.asarray([row for _, row in rows], dtype=np.float64).reshape(-1, ROW_WIDTH)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "ab") as f:
+                # Truncate a torn trailing row left by an interrupted write
+                f.truncate(self._size() // ROW_BYTES * ROW_BYTES)
+                f.write(block.tobytes())
+            return len(block)
+
+    def _prepend(self, candles: List[List[float]]) -> int:
+        """Merge candles older than the first stored one (rewrites the file)"""
+        with self._lock, file_lock(self.path):
+            first = self.first_timestamp()
+            rows = sorted({int(c[0]): c[:ROW_WIDTH] for c in candles if first is None or c[0] < first}.items())
+            if not rows:
+                return 0
+            block = np.asarray([row for _, row in rows], dtype=np.float64).reshape(-1, ROW_WIDTH)
+            merged = np.concatenate([block, np.array(self.array())])
+            tmp_path = self.path + ".tmp"
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            merged.tofile(tmp_path)
+            os.replace(tmp_path, self.path)
+            self._mmap_size = -1
+            return len(block)
+
+    # ------------------------------------------------------------------ exchange
+    #
+    # The fetch logic is written once as generator "plans" that yield
+    # (since, limit) fetch_ohlcv requests and receive the batches; _run() drives
+    # them with a ccxt client and _run_async() with a ccxt.async_support client.
+
+    def _run(self, exchange, plan: Generator[Tuple[int, int], List[List[float]], Any]) -> Any:
+        batch = None
+        while True:
+            try:
+                since, limit = plan.send(batch)
+            except StopIteration as done:
+                return done.value
+            batch = exchange.fetch_ohlcv(self.symbol, self.timeframe, since=since, limit=limit)
+
+    async def _run_async(self, exchange, plan: Generator[Tuple[int, int], List[List[float]], Any]) -> Any:
+        batch = None
+        while True:
+            try:
+                since, limit = plan.send(batch)
+            except StopIteration as done:
+                return done.value
+            batch = await exchange.fetch_ohlcv(self.symbol, self.timeframe, since=since, limit=limit)
+
+    def _fetch_pages(self, since: int, until: Optional[int], page_limit: int):
+        """Plan: page through fetch_ohlcv from ``since`` until ``until`` or the present"""
+        fetched = []
+        cursor = since
+        while True:
+            batch = yield cursor, page_limit
+            if not batch:
+                break
+            fetched.extend(batch)
+            next_cursor = int(batch[-1][0]) + self.min_span_ms
+            if next_cursor <= cursor or len(batch) < page_limit or (until is not None and next_cursor >= until):
+                break
+            cursor = next_cursor
+        if until is not None:
+            fetched = [c for c in fetched if c[0] < until]
+        return fetched
+
+    def _empty_before(self, first: int, since: int) -> bool:
+        """Whether an earlier backfill found no candles in [since, first)"""
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            return meta["first"] == first and since >= meta["checked_since"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+    def _backfill(self, since: int, page_limit: int):
+        """Plan of backfill()"""
+        now_ms = int(time.time() * 1000)
+        first = self.first_timestamp()
+        if first is not None and (since > first - self.min_span_ms or self._empty_before(first, since)):
+            # No candle can open in [since, first), or the exchange has none there
+            return 0
+        if first is None:
+            added = self.append(self._closed((yield from self._fetch_pages(since, None, page_limit)), now_ms))
+        else:
+            # Candles before the first stored one have all closed
+            added = self._prepend((yield from self._fetch_pages(since, first, page_limit)))
+        first = self.first_timestamp()
+        if first is not None and since <= first - self.min_span_ms:
+            # The exchange has nothing older (e.g. a recently listed pair)
+            try:
+                atomic_write_json(self.meta_path, {"first": first, "checked_since": since})
+            except OSError as e:
+                print(f"⚠️ Failed to write candle store metadata {self.meta_path}: {e}")
+        return added
+
+    def _sync(self, page_limit: int):
+        """Plan of sync()"""
+        last = self.last_timestamp()
+        if last is None:
+            return []
+        now_ms = int(time.time() * 1000)
+        if last + 2 * self.min_span_ms > now_ms:
+            # Only the forming candle is missing
+            batch = yield last + self.min_span_ms, 1
+        else:
+            batch = yield from self._fetch_pages(last + self.min_span_ms, None, page_limit)
+        closed = self._closed(batch, now_ms)
+        self.append(closed)
+        closed_timestamps = {c[0] for c in closed}
+        return [c for c in batch if c[0] not in closed_timestamps]
+
+    def _latest(self, limit: int, page_limit: int):
+        """Plan of latest_async()"""
+        now_ms = int(time.time() * 1000)
+        yield from self._backfill(now_ms - limit * self.max_span_ms, page_limit)
+        forming = yield from self._sync(page_limit)
+        return self._with_forming(forming, limit)
+
+    def _with_forming(self, forming: List[List[float]], limit: int) -> np.ndarray:
+        closed = self.range(limit=limit)
+        if forming:
+            tail = np.asarray([c[:ROW_WIDTH] for c in forming], dtype=np.float64).reshape(-1, ROW_WIDTH)
+            return np.concatenate([closed, tail])[-limit:]
+        return np.array(closed)
+
+    def backfill(self, exchange, since: int, page_limit: int = 100) -> int:
+        """
+        Make sure the store covers history back to ``since``
+
+        Args:
+            exchange: ccxt client
+            since: Oldest candle timestamp wanted, in ms
+            page_limit: Candles per fetch_ohlcv request
+
+        Returns:
+            Number of candles added
+        """
+        return self._run(exchange, self._backfill(since, page_limit))
+
+    def sync(self, exchange, page_limit: int = 100) -> List[List[float]]:
+        """
+        Fetch candles after the last stored one; closed ones are persisted
+
+        Args:
+            exchange: ccxt client
+            page_limit: Candles per fetch_ohlcv request
+
+        Returns:
+            Candles fetched that have not closed yet (not persisted)
+        """
+        return self._run(exchange, self._sync(page_limit))
+
+    async def backfill_async(self, exchange, since: int, page_limit: int = 100) -> int:
+        """backfill() for ccxt.async_support clients"""
+        return await self._run_async(exchange, self._backfill(since, page_limit))
+
+    async def sync_async(self, exchange, page_limit: int = 100) -> List[List[float]]:
+        """sync() for ccxt.async_support clients"""
+        return await self._run_async(exchange, self._sync(page_limit))
+
+    async def latest_async(self, exchange, limit: int, page_limit: int = 100) -> np.ndarray:
+        """
+        Last ``limit`` candles, read from disk and topped up from the exchange
+
+        Args:
+            exchange: ccxt.async_support client used for the missing tail
+            limit: Number of candles
+            page_limit: Candles per fetch_ohlcv request
+
+        Returns:
+            (n, 6) ndarray, the last row may be the still-forming candle
+        """
+        return await self._run_async(exchange, self._latest(limit, page_limit))
+
+
+_stores: Dict[Tuple[str, str, str], CandleStore] = {}
+_stores_lock = threading.Lock()
+
+
+def candle_store_root() -> str:
+    """Store root: CANDLE_STORE_PATH or ./data/candles"""
+    return os.getenv("CANDLE_STORE_PATH") or os.path.join(project_root, "data", "candles")
+
+
+def stored_symbols(root: Optional[str] = None) -> List[str]:
+    """Symbols with at least one stored timeframe, sorted"""
+    root = root or candle_store_root()
+    if not os.path.isdir(root):
+        return []
+    symbols = []
+    for name in sorted(os.listdir(root)):
+        if _timeframes_in(os.path.join(root, name)):
+            # Inverse of the directory naming in CandleStore: "BTC-USDT_USDT" -> "BTC/USDT:USDT"
+            symbols.append(name.replace("_", ":").replace("-", "/", 1))
+    return symbols
+
+
+def stored_timeframes(symbol: str, root: Optional[str] = None) -> List[str]:
+    """Timeframes stored for a symbol, shortest candle first"""
+    return _timeframes_in(os.path.join(root or candle_store_root(), symbol_dirname(symbol)))
+
+
+def _timeframes_in(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    timeframes = []
+    for name in os.listdir(directory):
+        timeframe, ext = os.path.splitext(name)
+        if ext != ".f64" or os.path.getsize(os.path.join(directory, name)) < ROW_BYTES:
+            continue
+        try:
+            timeframes.append((timeframe_to_ms(timeframe), timeframe))
+        except ValueError:
+            continue
+    return [timeframe for _, timeframe in sorted(timeframes)]
+
+
+def get_candle_store(symbol: str, timeframe: str, root: Optional[str] = None) -> CandleStore:
+    """
+    Shared CandleStore for a symbol and timeframe
+
+    Args:
+        symbol: Trading pair symbol
+        timeframe: ccxt timeframe
+        root: Store root, defaults to CANDLE_STORE_PATH or ./data/candles
+
+    Returns:
+        CandleStore (one instance per key per process)
+    """
+    root = root or candle_store_root()
+    key = (root, symbol, timeframe)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(key, CandleStore(root, symbol, timeframe))
+    return store
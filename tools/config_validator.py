@@ -26,11 +26,15 @@ class ConfigValidator:
         "anthropic": ["ANTHROPIC_API_KEY"],
         "github_copilot": ["GITHUB_COPILOT_API_KEY"],
         "google_gemini": ["GOOGLE_GEMINI_API_KEY"],
+        "scripted": [],  # Local scripted model, no API key required
     }
     
     # OKX related required variables
     OKX_REQUIRED = ["OKX_API_KEY", "OKX_API_SECRET", "OKX_PASSPHRASE"]
     
+    # Supported values of "trading_mode" in the configuration file
+    TRADING_MODES = ["crypto_okx", "replay"]
+    
     @staticmethod
     def validate_env_file() -> Tuple[bool, List[str]]:
         """
@@ -81,7 +85,7 @@ class ConfigValidator:
         # Check base URL
         base_url_var = f"{provider.upper()}_API_BASE"
         base_url = os.getenv(base_url_var) or os.getenv("OPENAI_API_BASE")
-        if not base_url and provider not in ["ollama"]:
+        if not base_url and provider not in ["ollama", "scripted"]:
             warnings.append(f"⚠️  {base_url_var} not set, using default")
         
         return len(errors) == 0, errors + warnings
@@ -115,6 +119,30 @@ class ConfigValidator:
         
         return len(errors) == 0, errors + warnings
     
+    @staticmethod
+    def validate_replay_data() -> Tuple[bool, List[str]]:
+        """
+        Validate that recorded market data exists for replay mode
+        
+        Returns:
+            Tuple of (is_valid, errors)
+        """
+        errors = []
+        
+        try:
+            from tools.candle_store import candle_store_root, stored_symbols
+        except ImportError as e:
+            return False, [f"❌ Replay mode unavailable: {e}"]
+        
+        root = candle_store_root()
+        symbols = stored_symbols(root)
+        if not symbols:
+            errors.append(f"❌ No recorded candles found in {root}")
+            errors.append("   Record data with: python -m tools.replay_exchange --since YYYY-MM-DD")
+            return False, errors
+        
+        return True, [f"✅ Replay data: {len(symbols)} symbols recorded in {root}"]
+    
     @staticmethod
     def validate_config_file(config_path: str) -> Tuple[bool, List[str]]:
         """
@@ -149,6 +177,11 @@ class ConfigValidator:
             if field not in config:
                 errors.append(f"❌ Missing required field in config: {field}")
         
+        # Validate trading_mode
+        trading_mode = config.get("trading_mode", "crypto_okx")
+        if trading_mode not in ConfigValidator.TRADING_MODES:
+            errors.append(f"❌ trading_mode must be one of {ConfigValidator.TRADING_MODES}, got: {trading_mode}")
+        
         # Validate date_range
         if "date_range" in config:
             date_range = config["date_range"]
@@ -183,6 +216,31 @@ class ConfigValidator:
                 initial_cash = agent_config["initial_cash"]
                 if not isinstance(initial_cash, (int, float)) or initial_cash <= 0:
                     errors.append("❌ initial_cash must be a positive number")
+            
+            if "context_token_budget" in agent_config:
+                budget = agent_config["context_token_budget"]
+                if budget is not None and (not isinstance(budget, int) or budget < 1):
+                    errors.append("❌ context_token_budget must be a positive integer or null")
+            
+            if "context_keep_recent" in agent_config:
+                keep_recent = agent_config["context_keep_recent"]
+                if not isinstance(keep_recent, int) or keep_recent < 1:
+                    errors.append("❌ context_keep_recent must be a positive integer")
+            
+            if "max_parallel_tools" in agent_config:
+                max_parallel_tools = agent_config["max_parallel_tools"]
+                if max_parallel_tools is not None and (not isinstance(max_parallel_tools, int) or max_parallel_tools < 1):
+                    errors.append("❌ max_parallel_tools must be a positive integer or null")
+            
+            if "tool_timeout" in agent_config:
+                tool_timeout = agent_config["tool_timeout"]
+                if tool_timeout is not None and (not isinstance(tool_timeout, (int, float)) or tool_timeout <= 0):
+                    errors.append("❌ tool_timeout must be a positive number or null")
+            
+            if "untimed_tools" in agent_config:
+                untimed_tools = agent_config["untimed_tools"]
+                if not isinstance(untimed_tools, list) or not all(isinstance(name, str) for name in untimed_tools):
+                    errors.append("❌ untimed_tools must be a list of tool names")
         
         return len(errors) == 0, errors
     
@@ -233,9 +291,22 @@ class ConfigValidator:
         results["env_file"] = messages
         all_valid = all_valid and valid
         
-        # Validate OKX configuration
-        valid, messages = ConfigValidator.validate_okx_config()
-        results["okx_config"] = messages
+        # Replay mode runs on recorded data and needs no exchange credentials
+        trading_mode = None
+        if config_path:
+            try:
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    trading_mode = json.load(f).get("trading_mode")
+            except Exception:
+                pass  # Reported by validate_config_file
+        
+        if trading_mode == "replay":
+            valid, messages = ConfigValidator.validate_replay_data()
+            results["replay_data"] = messages
+        else:
+            # Validate OKX configuration
+            valid, messages = ConfigValidator.validate_okx_config()
+            results["okx_config"] = messages
         all_valid = all_valid and valid
         
         # Validate configuration file if provided
@@ -0,0 +1,70 @@
+"""
+File Utilities
+Cross-process file locking and atomic writes shared by runtime state and ledgers
+"""
+
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unlocked access
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False):
+    """
+    Hold an advisory lock on ``<path>.lock`` for the duration of the block
+    
+    Args:
+        path: File to protect (the lock lives in a sibling ``.lock`` file)
+        shared: Take a shared (read) lock instead of an exclusive one
+    """
+    lock_path = f"{path}.lock"
+    directory = os.path.dirname(lock_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(lock_path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write_text(path: str, text: str, fsync: bool = False) -> None:
+    """
+    Replace ``path`` with ``text`` via a temp file + rename, so readers never see a partial file
+    
+    Args:
+        path: Destination file
+        text: Full new content
+        fsync: Flush the data to disk before the rename
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: str, data: Any, fsync: bool = False, **dump_kwargs) -> None:
+    """Atomically replace ``path`` with the JSON encoding of ``data``"""
+    atomic_write_text(path, json.dumps(data, **dump_kwargs), fsync=fsync)
@@ -1,47 +1,36 @@
-
 import os
 import json
 from pathlib import Path
 from dotenv import load_dotenv
 load_dotenv()
 
-def _load_runtime_env() -> dict:
-    path = os.environ.get("RUNTIME_ENV_PATH")
-    try:
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, dict):
-                    return data
-    except Exception:
-        pass
-    return {}
+from tools.runtime_context import (
+    RUNTIME_ENV_HEADER,
+    get_runtime_context,
+    get_runtime_env_path,
+    set_runtime_env_path,
+)
 
 
 def get_config_value(key: str, default=None):
-    _RUNTIME_ENV = _load_runtime_env()
-    
-    if key in _RUNTIME_ENV:
-        return _RUNTIME_ENV[key]
-    return os.getenv(key, default)
+    return get_runtime_context().get(key, default)
 
 def write_config_value(key: str, value: any):
-    _RUNTIME_ENV = _load_runtime_env()
-    _RUNTIME_ENV[key] = value
-    path = os.environ.get("RUNTIME_ENV_PATH")
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(_RUNTIME_ENV, f, ensure_ascii=False, indent=4)
+    get_runtime_context().set(key, value)
+
 
-def extract_conversation(conversation: dict, output_type: str):
+def extract_conversation(conversation: dict, output_type: str, start: int = 0):
     """Extract information from a conversation payload.
 
     Args:
         conversation: A mapping that includes 'messages' (list of dicts or objects with attributes).
         output_type: 'final' to return the model's final answer content; 'all' to return the full messages list.
+        start: Cursor into 'messages'; only messages from this index on are considered
+               (e.g. the number of messages sent with the request, to skip the echoed history).
 
     Returns:
         For 'final': the final assistant content string if found, otherwise None.
-        For 'all': the original messages list (or empty list if missing).
+        For 'all': the messages list from 'start' on (or empty list if missing).
     """
 
     def get_field(obj, key, default=None):
@@ -58,6 +47,8 @@ def extract_conversation(conversation: dict, output_type: str):
         return current
 
     messages = get_field(conversation, "messages", []) or []
+    if start:
+        messages = messages[start:]
 
     if output_type == "all":
         return messages
@@ -94,14 +85,15 @@ def extract_conversation(conversation: dict, output_type: str):
     raise ValueError("output_type must be 'final' or 'all'")
 
 
-def extract_tool_messages(conversation: dict):
+def extract_tool_messages(conversation: dict, start: int = 0):
     """Return all ToolMessage-like entries from the conversation.
 
     A ToolMessage is identified heuristically by having either:
       - a non-empty 'tool_call_id', or
       - a string 'name' (tool name) and no 'finish_reason' like normal AI messages
 
-    Supports both dict-based and object-based messages.
+    Supports both dict-based and object-based messages. Only messages from index
+    'start' on are scanned, so a caller can pass a cursor to get just the new ones.
     """
 
     def get_field(obj, key, default=None):
@@ -119,7 +111,7 @@ def extract_tool_messages(conversation: dict):
 
     messages = get_field(conversation, "messages", []) or []
     tool_messages = []
-    for msg in messages:
+    for msg in messages[start:]:
         tool_call_id = get_field(msg, "tool_call_id")
         name = get_field(msg, "name")
         finish_reason = get_nested(msg, ["response_metadata", "finish_reason"])  # present for AIMessage
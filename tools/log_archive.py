@@ -0,0 +1,383 @@
+"""
+Log Archive
+Compresses closed session logs and streams entries back from either format
+
+Session logs live at <log_root>/<signature>/log/<date>/log.jsonl. Every entry
+repeats the position dict and price tables, so the lines of all models and days
+look alike and compress very well with a zstd dictionary trained on our own
+logs. Archiving replaces log.jsonl with log.jsonl.zst (or log.jsonl.gz when the
+optional ``zstandard`` package is missing) after verifying the compressed copy.
+Dictionaries are stored under <log_root>/.log_dicts/<dict_id>.zdict; archived
+frames record the id of the dictionary they need.
+
+A day is closed once the agent has logs for a later date; the latest day of
+each signature may still be written to and is skipped unless requested.
+
+Usage:
+    python -m tools.log_archive archive [--root DIR] [--format zstd|gzip] [--include-latest]
+    python -m tools.log_archive train [--root DIR]
+    python -m tools.log_archive cat <signature> <date>
+    python -m tools.log_archive stats [--root DIR]
+"""
+
+import io
+import os
+import gzip
+import json
+import random
+import hashlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # Optional: fall back to gzip
+    zstandard = None
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_LOG_ROOT = os.path.join(project_root, "data", "agent_data")
+LOG_NAME = "log.jsonl"
+ZSTD_SUFFIX = ".zst"
+GZIP_SUFFIX = ".gz"
+DICT_DIR_NAME = ".log_dicts"
+DICT_SIZE = 112 * 1024
+ZSTD_LEVEL = 10
+_CHUNK = 1024 * 1024
+
+
+def _dict_dir(log_root: str) -> str:
+    return os.path.join(log_root, DICT_DIR_NAME)
+
+
+def _log_root_of(path: str) -> str:
+    # <log_root>/<signature>/log/<date>/log.jsonl[.zst]
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(path)))))
+
+
+def iter_session_logs(log_root: str = DEFAULT_LOG_ROOT, signature: Optional[str] = None) -> Iterator[Tuple[str, str, List[str]]]:
+    """
+    Find session logs in any format
+
+    Args:
+        log_root: Agent data directory
+        signature: Only this agent (None for all)
+
+    Yields:
+        (signature, date, files) sorted by signature and date; files lists the
+        archived file before a plain log.jsonl written after archiving
+    """
+    if not os.path.isdir(log_root):
+        return
+    signatures = [signature] if signature else sorted(os.listdir(log_root))
+    for sig in signatures:
+        sig_log_dir = os.path.join(log_root, sig, "log")
+        if sig.startswith(".") or not os.path.isdir(sig_log_dir):
+            continue
+        for date in sorted(os.listdir(sig_log_dir)):
+            date_dir = os.path.join(sig_log_dir, date)
+            files = [
+                os.path.join(date_dir, LOG_NAME + suffix)
+                for suffix in (ZSTD_SUFFIX, GZIP_SUFFIX, "")
+                if os.path.isfile(os.path.join(date_dir, LOG_NAME + suffix))
+            ]
+            if files:
+                yield sig, date, files
+
+
+class _DictionaryStore:
+    """Loads zstd dictionaries by id, caching them per process"""
+
+    def __init__(self):
+        self._cache: Dict[Tuple[str, int], Any] = {}
+
+    def get(self, log_root: str, dict_id: int):
+        key = (log_root, dict_id)
+        if key not in self._cache:
+            path = os.path.join(_dict_dir(log_root), f"{dict_id}.zdict")
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"zstd dictionary {dict_id} needed by the log archive is missing: {path}")
+            with open(path, "rb") as f:
+                self._cache[key] = zstandard.ZstdCompressionDict(f.read())
+        return self._cache[key]
+
+
+_dictionaries = _DictionaryStore()
+
+
+def _open_binary(path: str, log_root: Optional[str] = None) -> io.BufferedIOBase:
+    """Open a plain, zstd or gzip log file as a streaming binary reader of the raw jsonl"""
+    if path.endswith(ZSTD_SUFFIX):
+        if zstandard is None:
+            raise ImportError("Reading .zst logs requires the zstandard package (pip install zstandard)")
+        raw = open(path, "rb")
+        try:
+            dict_id = zstandard.get_frame_parameters(raw.read(18)).dict_id
+            raw.seek(0)
+            dict_data = _dictionaries.get(log_root or _log_root_of(path), dict_id) if dict_id else None
+            reader = zstandard.ZstdDecompressor(dict_data=dict_data).stream_reader(
+                raw, read_across_frames=True, closefd=True
+            )
+        except Exception:
+            raw.close()
+            raise
+        return io.BufferedReader(reader, buffer_size=_CHUNK)
+    if path.endswith(GZIP_SUFFIX):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_log_entries(path: str, log_root: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the entries of one session log without loading the day into memory
+
+    Args:
+        path: log.jsonl, log.jsonl.zst, log.jsonl.gz, or a <date> directory
+              (archived entries first, then any plain log written afterwards)
+        log_root: Agent data directory holding the zstd dictionaries
+                  (default: derived from the path)
+
+    Yields:
+        Parsed log entries; malformed lines are skipped
+    """
+    if os.path.isdir(path):
+        paths = [
+            os.path.join(path, LOG_NAME + suffix)
+            for suffix in (ZSTD_SUFFIX, GZIP_SUFFIX, "")
+            if os.path.isfile(os.path.join(path, LOG_NAME + suffix))
+        ]
+    else:
+        paths = [path]
+    for file_path in paths:
+        with _open_binary(file_path, log_root) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+
+
+def closed_logs(log_root: str = DEFAULT_LOG_ROOT, include_latest: bool = False) -> List[Tuple[str, str, List[str]]]:
+    """
+    Session logs that are finished and still (partly) uncompressed
+
+    Args:
+        log_root: Agent data directory
+        include_latest: Also return the latest day of each signature
+
+    Returns:
+        [(signature, date, files)] whose files include a plain log.jsonl
+    """
+    by_signature: Dict[str, List[Tuple[str, str, List[str]]]] = {}
+    for sig, date, files in iter_session_logs(log_root):
+        by_signature.setdefault(sig, []).append((sig, date, files))
+    result = []
+    for days in by_signature.values():
+        if not include_latest:
+            days = days[:-1]
+        result.extend(day for day in days if _has_plain(day[2]))
+    return result
+
+
+def _has_plain(files: List[str]) -> bool:
+    return any(f.endswith(LOG_NAME) for f in files)
+
+
+def train_dictionary(log_root: str = DEFAULT_LOG_ROOT, dict_size: int = DICT_SIZE,
+                     max_files: int = 200, max_samples: int = 20000, seed: int = 0) -> Optional[Any]:
+    """
+    Train a zstd dictionary on log lines and store it under <log_root>/.log_dicts
+
+    Args:
+        log_root: Agent data directory
+        dict_size: Dictionary size in bytes
+        max_files: Log files sampled (spread over signatures and dates)
+        max_samples: Log lines used for training
+
+    Returns:
+        The ZstdCompressionDict, or None when zstandard is missing or there is too little data
+    """
+    if zstandard is None:
+        return None
+    files = [files[-1] for _, _, files in iter_session_logs(log_root)]
+    random.Random(seed).shuffle(files)
+    samples: List[bytes] = []
+    for path in files[:max_files]:
+        with _open_binary(path, log_root) as f:
+            for line in f:
+                if line.strip():
+                    samples.append(line)
+                if len(samples) >= max_samples:
+                    break
+        if len(samples) >= max_samples:
+            break
+    if len(samples) < 10:
+        print(f"⚠️ Only {len(samples)} log lines found, compressing without a dictionary")
+        return None
+    try:
+        dictionary = zstandard.train_dictionary(dict_size, samples)
+    except zstandard.ZstdError as e:
+        print(f"⚠️ Dictionary training failed ({e}), compressing without a dictionary")
+        return None
+    os.makedirs(_dict_dir(log_root), exist_ok=True)
+    path = os.path.join(_dict_dir(log_root), f"{dictionary.dict_id()}.zdict")
+    with open(path, "wb") as f:
+        f.write(dictionary.as_bytes())
+    print(f"📚 Trained {len(dictionary.as_bytes())} byte dictionary on {len(samples)} log lines: {path}")
+    return dictionary
+
+
+def latest_dictionary(log_root: str = DEFAULT_LOG_ROOT) -> Optional[Any]:
+    """Most recently trained dictionary of this log root, or None"""
+    if zstandard is None or not os.path.isdir(_dict_dir(log_root)):
+        return None
+    paths = [os.path.join(_dict_dir(log_root), name) for name in os.listdir(_dict_dir(log_root)) if name.endswith(".zdict")]
+    if not paths:
+        return None
+    with open(max(paths, key=os.path.getmtime), "rb") as f:
+        return zstandard.ZstdCompressionDict(f.read())
+
+
+def _sha256_of_stream(f) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(_CHUNK), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def archive_day(files: List[str], fmt: str = "zstd", dictionary: Optional[Any] = None,
+                level: int = ZSTD_LEVEL, log_root: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Compress one day's log into a single archive file and remove the plain log
+
+    Args:
+        files: Files of the day as returned by iter_session_logs
+        fmt: "zstd" or "gzip"
+        dictionary: zstd dictionary (None for plain zstd)
+        level: zstd compression level
+        log_root: Agent data directory holding the dictionaries of existing archives
+
+    Returns:
+        (bytes before, bytes after)
+    """
+    date_dir = os.path.dirname(files[0])
+    before = sum(os.path.getsize(path) for path in files)
+    target = os.path.join(date_dir, LOG_NAME + (ZSTD_SUFFIX if fmt == "zstd" else GZIP_SUFFIX))
+    tmp_path = os.path.join(date_dir, ".tmp-" + os.path.basename(target))
+
+    # Uncompressed content of the day, in order (an existing archive plus lines appended later)
+    def raw_chunks() -> Iterator[bytes]:
+        for path in files:
+            with _open_binary(path, log_root) as f:
+                yield from iter(lambda: f.read(_CHUNK), b"")
+
+    digest = hashlib.sha256()
+    if fmt == "zstd":
+        compressor = zstandard.ZstdCompressor(level=level, dict_data=dictionary, write_checksum=True)
+        with open(tmp_path, "wb") as out, compressor.stream_writer(out, closefd=False) as writer:
+            for chunk in raw_chunks():
+                digest.update(chunk)
+                writer.write(chunk)
+    else:
+        with gzip.open(tmp_path, "wb", compresslevel=9) as writer:
+            for chunk in raw_chunks():
+                digest.update(chunk)
+                writer.write(chunk)
+
+    # Verify the round trip before deleting anything
+    with _open_binary(tmp_path, log_root) as f:
+        if _sha256_of_stream(f) != digest.hexdigest():
+            os.remove(tmp_path)
+            raise IOError(f"Archive verification failed for {date_dir}")
+    os.replace(tmp_path, target)
+    for path in files:
+        if path != target:
+            os.remove(path)
+    return before, os.path.getsize(target)
+
+
+def archive_logs(log_root: str = DEFAULT_LOG_ROOT, fmt: Optional[str] = None, include_latest: bool = False,
+                 retrain: bool = False, level: int = ZSTD_LEVEL) -> Dict[str, Any]:
+    """
+    Compress all closed session logs
+
+    Args:
+        log_root: Agent data directory
+        fmt: "zstd" or "gzip" (default zstd when zstandard is installed)
+        include_latest: Also archive the latest day of each signature
+        retrain: Train a new dictionary even if one exists
+        level: zstd compression level
+
+    Returns:
+        {"days", "bytes_before", "bytes_after", "format", "dict_id"}
+    """
+    fmt = fmt or ("zstd" if zstandard is not None else "gzip")
+    if fmt == "zstd" and zstandard is None:
+        raise ImportError("zstd archives require the zstandard package (pip install zstandard); use --format gzip")
+    days = closed_logs(log_root, include_latest)
+    dictionary = None
+    if fmt == "zstd" and days:
+        dictionary = None if retrain else latest_dictionary(log_root)
+        if dictionary is None:
+            dictionary = train_dictionary(log_root)
+
+    total_before = total_after = 0
+    for sig, date, files in days:
+        before, after = archive_day(files, fmt, dictionary, level, log_root)
+        total_before += before
+        total_after += after
+        print(f"🗜️ {sig}/{date}: {before / 1024:.1f} KB -> {after / 1024:.1f} KB")
+    if days:
+        print(f"✅ Archived {len(days)} day(s): {total_before / 1024:.1f} KB -> {total_after / 1024:.1f} KB "
+              f"({total_after / total_before * 100 if total_before else 0:.1f}%)")
+    else:
+        print("ℹ️ No closed session logs to archive")
+    return {
+        "days": len(days),
+        "bytes_before": total_before,
+        "bytes_after": total_after,
+        "format": fmt,
+        "dict_id": dictionary.dict_id() if dictionary is not None else None,
+    }
+
+
+def archive_stats(log_root: str = DEFAULT_LOG_ROOT) -> Dict[str, Any]:
+    """Number and size of plain and archived session logs"""
+    stats = {"plain_files": 0, "plain_bytes": 0, "archived_files": 0, "archived_bytes": 0}
+    for _, _, files in iter_session_logs(log_root):
+        for path in files:
+            kind = "plain" if path.endswith(LOG_NAME) else "archived"
+            stats[f"{kind}_files"] += 1
+            stats[f"{kind}_bytes"] += os.path.getsize(path)
+    return stats
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archive and read agent session logs")
+    parser.add_argument("command", choices=["archive", "train", "cat", "stats"])
+    parser.add_argument("args", nargs="*", help="cat: <signature> <date>")
+    parser.add_argument("--root", default=DEFAULT_LOG_ROOT, help="Agent data directory (default: data/agent_data)")
+    parser.add_argument("--format", choices=["zstd", "gzip"], help="Archive format (default: zstd if installed)")
+    parser.add_argument("--level", type=int, default=ZSTD_LEVEL, help="zstd compression level")
+    parser.add_argument("--include-latest", action="store_true", help="Also archive the latest day of each agent")
+    parser.add_argument("--retrain", action="store_true", help="Train a new dictionary before archiving")
+    args = parser.parse_args()
+
+    if args.command == "archive":
+        archive_logs(args.root, args.format, args.include_latest, args.retrain, args.level)
+    elif args.command == "train":
+        if train_dictionary(args.root) is None:
+            sys.exit(1)
+    elif args.command == "cat":
+        if len(args.args) != 2:
+            parser.error("cat needs <signature> <date>")
+        date_dir = os.path.join(args.root, args.args[0], "log", args.args[1])
+        for entry in iter_log_entries(date_dir, args.root):
+            print(json.dumps(entry, ensure_ascii=False))
+    else:
+        print(json.dumps(archive_stats(args.root), indent=2))
@@ -0,0 +1,392 @@
+"""
+Log Index
+SQLite index with full-text search over agent session logs
+
+Every message of every session log (plain or archived, see tools.log_archive)
+becomes one row keyed by signature, date, step and role; tool names logged with
+the tool results get their own table. Message content is searchable through an
+FTS5 index. Updates are incremental: a day is re-indexed only when its log files
+changed, and days whose logs were removed are dropped.
+
+Steps follow BaseAgent.run_trading_session: step 0 is the initial user query,
+and every assistant message starts the next step (its tool results belong to it).
+
+Usage:
+    python -m tools.log_index update
+    python -m tools.log_index search "funding rate" --signature gpt-5 --date 2025-10-14
+    python -m tools.log_index tools --signature gemini-2.5-flash --date 2025-10-14
+    python -m tools.log_index steps
+
+Environment:
+    LOG_INDEX_PATH   Index database (default ./data/cache/log_index.db)
+"""
+
+import os
+import re
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from tools.log_archive import DEFAULT_LOG_ROOT, iter_log_entries, iter_session_logs
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Quotes, grouping, prefix/column/initial-token syntax or boolean operators mark a query as FTS5 syntax
+_FTS_SYNTAX = re.compile(r'["*():^+]|\b(?:AND|OR|NOT|NEAR)\b')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS days (
+    signature    TEXT    NOT NULL,
+    date         TEXT    NOT NULL,
+    fingerprint  TEXT    NOT NULL,
+    messages     INTEGER NOT NULL,
+    steps        INTEGER NOT NULL,
+    indexed_at   REAL    NOT NULL,
+    PRIMARY KEY (signature, date)
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id         INTEGER PRIMARY KEY,
+    signature  TEXT    NOT NULL,
+    date       TEXT    NOT NULL,
+    step       INTEGER NOT NULL,
+    seq        INTEGER NOT NULL,
+    role       TEXT    NOT NULL,
+    timestamp  TEXT,
+    content    TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_signature_date
+    ON messages (signature, date, step);
+CREATE INDEX IF NOT EXISTS idx_messages_role
+    ON messages (role, signature, date);
+
+CREATE TABLE IF NOT EXISTS tool_calls (
+    message_id  INTEGER NOT NULL,
+    signature   TEXT    NOT NULL,
+    date        TEXT    NOT NULL,
+    step        INTEGER NOT NULL,
+    tool        TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tool_calls_signature_date
+    ON tool_calls (signature, date, step);
+CREATE INDEX IF NOT EXISTS idx_tool_calls_tool
+    ON tool_calls (tool, signature, date);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id', tokenize='unicode61'
+);
+"""
+
+
+def default_index_path() -> str:
+    return os.getenv("LOG_INDEX_PATH") or os.path.join(project_root, "data", "cache", "log_index.db")
+
+
+def _fingerprint(files: List[str]) -> str:
+    parts = []
+    for path in files:
+        stat = os.stat(path)
+        parts.append(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+def _session_messages(entries: Iterator[Dict[str, Any]]) -> Iterator[Tuple[int, str, Optional[str], Dict[str, Any]]]:
+    """(step, role, timestamp, message) for every message of a session log"""
+    step = 0
+    for entry in entries:
+        new_messages = entry.get("new_messages")
+        if isinstance(new_messages, dict):
+            new_messages = [new_messages]
+        for message in new_messages or []:
+            if not isinstance(message, dict):
+                continue
+            role = str(message.get("role") or "unknown")
+            if role == "assistant":
+                step += 1
+            yield step, role, entry.get("timestamp"), message
+
+
+class LogIndex:
+    """Incrementally updated SQLite/FTS5 index of session logs"""
+
+    def __init__(self, db_path: Optional[str] = None, log_root: str = DEFAULT_LOG_ROOT):
+        """
+        Args:
+            db_path: Index database (created if missing), defaults to LOG_INDEX_PATH
+            log_root: Agent data directory holding <signature>/log/<date>/ logs
+        """
+        self.db_path = str(db_path or default_index_path())
+        self.log_root = log_root
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections must not be shared across threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ----------------------------------------------------------------- update
+
+    def update(self, signature: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Bring the index up to date with the logs on disk
+
+        Args:
+            signature: Only update this agent (None for all)
+
+        Returns:
+            {"days_indexed", "days_removed", "days_unchanged", "messages", "elapsed_s"}
+        """
+        start = time.perf_counter()
+        conn = self._connection()
+        query = "SELECT signature, date, fingerprint FROM days" + (" WHERE signature = ?" if signature else "")
+        known = {(row["signature"], row["date"]): row["fingerprint"]
+                 for row in conn.execute(query, (signature,) if signature else ())}
+
+        indexed = unchanged = messages = 0
+        seen = set()
+        for sig, date, files in iter_session_logs(self.log_root, signature):
+            seen.add((sig, date))
+            fingerprint = _fingerprint(files)
+            if known.get((sig, date)) == fingerprint:
+                unchanged += 1
+                continue
+            messages += self._index_day(sig, date, os.path.dirname(files[0]), fingerprint)
+            indexed += 1
+
+        removed = [key for key in known if key not in seen]
+        if removed:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sig, date in removed:
+                    self._delete_day(conn, sig, date)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        return {
+            "days_indexed": indexed,
+            "days_removed": len(removed),
+            "days_unchanged": unchanged,
+            "messages": messages,
+            "elapsed_s": round(time.perf_counter() - start, 3),
+        }
+
+    def _delete_day(self, conn: sqlite3.Connection, signature: str, date: str) -> None:
+        # External-content FTS rows must be deleted with their old content
+        conn.execute(
+            "INSERT INTO messages_fts (messages_fts, rowid, content) "
+            "SELECT 'delete', id, content FROM messages WHERE signature = ? AND date = ?",
+            (signature, date),
+        )
+        conn.execute("DELETE FROM messages WHERE signature = ? AND date = ?", (signature, date))
+        conn.execute("DELETE FROM tool_calls WHERE signature = ? AND date = ?", (signature, date))
+        conn.execute("DELETE FROM days WHERE signature = ? AND date = ?", (signature, date))
+
+    def _index_day(self, signature: str, date: str, date_dir: str, fingerprint: str) -> int:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete_day(conn, signature, date)
+            count = steps = 0
+            for seq, (step, role, timestamp, message) in enumerate(
+                _session_messages(iter_log_entries(date_dir, self.log_root))
+            ):
+                content = message.get("content")
+                if not isinstance(content, str):
+                    content = json.dumps(content, ensure_ascii=False)
+                message_id = conn.execute(
+                    "INSERT INTO messages (signature, date, step, seq, role, timestamp, content) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (signature, date, step, seq, role, timestamp, content),
+                ).lastrowid
+                conn.execute("INSERT INTO messages_fts (rowid, content) VALUES (?, ?)", (message_id, content))
+                tools = [tool for tool in message.get("tools") or [] if tool]
+                if tools:
+                    conn.executemany(
+                        "INSERT INTO tool_calls (message_id, signature, date, step, tool) VALUES (?, ?, ?, ?, ?)",
+                        [(message_id, signature, date, step, tool) for tool in tools],
+                    )
+                count += 1
+                steps = step
+            conn.execute(
+                "INSERT INTO days (signature, date, fingerprint, messages, steps, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (signature, date, fingerprint, count, steps, time.time()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    # ---------------------------------------------------------------- queries
+
+    @staticmethod
+    def fts_query(query: str) -> str:
+        """
+        Quote the terms of a plain query so punctuation like "BTC/USDT" or "stop-loss" is searchable
+
+        Queries that already use FTS5 syntax (quotes, AND/OR/NOT, prefix*) are passed through.
+        """
+        if _FTS_SYNTAX.search(query):
+            return query
+        return " ".join('"' + term + '"' for term in query.split())
+
+    @staticmethod
+    def _filters(signature: Optional[str], date: Optional[str], prefix: str = "") -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        if signature:
+            clauses.append(f"{prefix}signature = ?")
+            params.append(signature)
+        if date:
+            clauses.append(f"{prefix}date = ?")
+            params.append(date)
+        return clauses, params
+
+    def search(self, query: str, signature: Optional[str] = None, date: Optional[str] = None,
+               role: Optional[str] = None, tool: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Full-text search over message content
+
+        Args:
+            query: Search terms ('BTC/USDT', 'funding rate') or an FTS5 query
+                   ('"stop loss"', 'btc AND sell', 'liquid*')
+            signature: Only this agent
+            date: Only this trading date (YYYY-MM-DD)
+            role: Only "assistant" or "user" messages
+            tool: Only tool results of steps that called this tool
+            limit: Maximum number of results
+
+        Returns:
+            Best matches first: {signature, date, step, role, timestamp, snippet}
+
+        Raises:
+            ValueError: The query is not valid FTS5 syntax
+        """
+        clauses, params = self._filters(signature, date, "m.")
+        if role:
+            clauses.append("m.role = ?")
+            params.append(role)
+        if tool:
+            clauses.append("m.id IN (SELECT message_id FROM tool_calls WHERE tool = ?)")
+            params.append(tool)
+        where = "".join(f" AND {clause}" for clause in clauses)
+        try:
+            rows = self._connection().execute(
+                "SELECT m.signature, m.date, m.step, m.role, m.timestamp, "
+                "snippet(messages_fts, 0, '[', ']', '…', 16) AS snippet "
+                "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                f"WHERE messages_fts MATCH ?{where} ORDER BY bm25(messages_fts) LIMIT ?",
+                [self.fts_query(query), *params, limit],
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            if "fts5" not in str(e):
+                raise
+            raise ValueError(f"Invalid search query {query!r}: {e}") from e
+        return [dict(row) for row in rows]
+
+    def tool_calls(self, signature: Optional[str] = None, date: Optional[str] = None,
+                   tool: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Tool calls in log order
+
+        Returns:
+            [{signature, date, step, tool}]
+        """
+        clauses, params = self._filters(signature, date)
+        if tool:
+            clauses.append("tool = ?")
+            params.append(tool)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        rows = self._connection().execute(
+            f"SELECT signature, date, step, tool FROM tool_calls{where} ORDER BY signature, date, step, message_id, rowid",
+            params,
+        )
+        return [dict(row) for row in rows]
+
+    def tool_counts(self, signature: Optional[str] = None, date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Number of calls per agent and tool: [{signature, tool, calls}]"""
+        clauses, params = self._filters(signature, date)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        rows = self._connection().execute(
+            f"SELECT signature, tool, COUNT(*) AS calls FROM tool_calls{where} "
+            "GROUP BY signature, tool ORDER BY signature, calls DESC",
+            params,
+        )
+        return [dict(row) for row in rows]
+
+    def steps(self, signature: Optional[str] = None, date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Steps and messages per agent and day: [{signature, date, steps, messages}]"""
+        clauses, params = self._filters(signature, date)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        rows = self._connection().execute(
+            f"SELECT signature, date, steps, messages FROM days{where} ORDER BY signature, date", params,
+        )
+        return [dict(row) for row in rows]
+
+    def step_summary(self) -> List[Dict[str, Any]]:
+        """Per agent: days, total and average steps per day: [{signature, days, steps, avg_steps}]"""
+        rows = self._connection().execute(
+            "SELECT signature, COUNT(*) AS days, SUM(steps) AS steps, ROUND(AVG(steps), 2) AS avg_steps "
+            "FROM days GROUP BY signature ORDER BY signature"
+        )
+        return [dict(row) for row in rows]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index and query agent session logs")
+    parser.add_argument("command", choices=["update", "search", "tools", "steps"])
+    parser.add_argument("query", nargs="?", help="search: search terms or FTS5 query")
+    parser.add_argument("--root", default=DEFAULT_LOG_ROOT, help="Agent data directory (default: data/agent_data)")
+    parser.add_argument("--db", help="Index database (default: LOG_INDEX_PATH or data/cache/log_index.db)")
+    parser.add_argument("--signature", help="Only this agent")
+    parser.add_argument("--date", help="Only this trading date (YYYY-MM-DD)")
+    parser.add_argument("--role", choices=["assistant", "user"], help="search: only messages of this role")
+    parser.add_argument("--tool", help="Only this tool")
+    parser.add_argument("--limit", type=int, default=20, help="search: maximum results")
+    parser.add_argument("--no-update", action="store_true", help="Query without updating the index first")
+    args = parser.parse_args()
+
+    index = LogIndex(args.db, args.root)
+    if args.command == "update" or not args.no_update:
+        stats = index.update(args.signature)
+        if args.command == "update":
+            print(json.dumps(stats, indent=2))
+
+    start = time.perf_counter()
+    if args.command == "search":
+        if not args.query:
+            parser.error("search needs a query")
+        try:
+            rows = index.search(args.query, args.signature, args.date, args.role, args.tool, args.limit)
+        except ValueError as e:
+            parser.error(str(e))
+        for row in rows:
+            print(f"{row['signature']} {row['date']} step {row['step']} [{row['role']}] {row['snippet']}")
+    elif args.command == "tools":
+        if args.date or args.tool:
+            for row in index.tool_calls(args.signature, args.date, args.tool):
+                print(f"{row['signature']} {row['date']} step {row['step']}: {row['tool']}")
+        for row in index.tool_counts(args.signature, args.date):
+            print(f"{row['signature']:<30} {row['tool']:<35} {row['calls']:>6}")
+    elif args.command == "steps":
+        if args.signature or args.date:
+            for row in index.steps(args.signature, args.date):
+                print(f"{row['signature']:<30} {row['date']}  {row['steps']:>3} steps  {row['messages']:>4} messages")
+        else:
+            for row in index.step_summary():
+                print(f"{row['signature']:<30} {row['days']:>5} days  {row['steps']:>6} steps  {row['avg_steps']:>6} avg")
+    if args.command != "update":
+        print(f"⏱️ {(time.perf_counter() - start) * 1000:.1f} ms")
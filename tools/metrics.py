@@ -0,0 +1,321 @@
+"""
+Metrics
+Timings of sessions, agent steps, LLM requests and MCP tool calls
+
+Disabled by default: get_metrics() returns a no-op recorder whose methods return
+immediately. ``main.py --metrics`` enables a recorder that appends one JSON line
+per event to a metrics file (data/metrics/metrics-<timestamp>.jsonl by default),
+and ``--metrics-port`` additionally serves the aggregates in Prometheus text
+format on http://127.0.0.1:<port>/metrics.
+
+Event kinds:
+    session  one trading day of an agent        (signature, date, steps)
+    step     one agent invocation               (signature, date, step)
+    llm      one chat model request             (signature, model, input/output tokens)
+    tool     one MCP tool call                  (signature, server, tool, request/response bytes, error)
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Latency histogram buckets in seconds (Prometheus "le" bounds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Labels that identify a Prometheus series; the jsonl file keeps all fields
+_SERIES_LABELS = {
+    "session": ("signature",),
+    "step": ("signature",),
+    "llm": ("signature", "model"),
+    "tool": ("signature", "server", "tool"),
+}
+_TOKEN_FIELDS = ("input_tokens", "output_tokens")
+_BUCKET_LABELS = [f'le="{bound}"' for bound in BUCKETS] + ['le="+Inf"']
+
+
+class NullMetrics:
+    """Recorder used while metrics are disabled: every call is a no-op"""
+
+    enabled = False
+
+    def record(self, kind: str, duration: float, **fields: Any) -> None:
+        pass
+
+    def timer(self, kind: str, **fields: Any):
+        return nullcontext(fields)
+
+    def callback_handler(self, signature: str, model: Optional[str] = None,
+                         tool_servers: Optional[Dict[str, str]] = None) -> None:
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot: above the largest bound
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+
+
+def _escape_label(value: Any) -> str:
+    """Escape a label value for the Prometheus text format (backslash, quote, newline)"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRecorder:
+    """Writes metric events to a jsonl file and keeps Prometheus aggregates"""
+
+    enabled = True
+
+    def __init__(self, path: str, prometheus_port: Optional[int] = None):
+        """
+        Args:
+            path: Metrics jsonl file (appended to)
+            prometheus_port: Serve /metrics on this local port, None to disable
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8", buffering=1024 * 1024)
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Tuple], _Histogram] = defaultdict(_Histogram)
+        self._counters: Dict[Tuple[str, Tuple], float] = defaultdict(float)
+        self._server: Optional[ThreadingHTTPServer] = None
+        if prometheus_port:
+            self._serve(prometheus_port)
+
+    def record(self, kind: str, duration: float, **fields: Any) -> None:
+        """
+        Record one event
+
+        Args:
+            kind: Event kind ("session", "step", "llm", "tool")
+            duration: Duration in seconds
+            **fields: Event details (signature, tool, tokens, ...)
+        """
+        event = {"ts": datetime.now().isoformat(), "kind": kind, "duration_ms": round(duration * 1000, 3), **fields}
+        line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        labels = tuple((name, str(fields.get(name, ""))) for name in _SERIES_LABELS.get(kind, ()))
+        with self._lock:
+            self._file.write(line)
+            self._histograms[(kind, labels)].observe(duration)
+            for name in _TOKEN_FIELDS:
+                if fields.get(name):
+                    self._counters[(f"{kind}_{name}", labels)] += fields[name]
+            if fields.get("error"):
+                self._counters[(f"{kind}_errors", labels)] += 1
+
+    @contextmanager
+    def timer(self, kind: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time a block; fields added to the yielded dict are recorded with the event
+
+        Example:
+            >>> with get_metrics().timer("step", signature="gpt-5", step=1) as event:
+            ...     event["tool_calls"] = 3
+        """
+        start = time.perf_counter()
+        try:
+            yield fields
+        except BaseException as e:
+            fields.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            self.record(kind, time.perf_counter() - start, **fields)
+
+    def callback_handler(self, signature: str, model: Optional[str] = None,
+                         tool_servers: Optional[Dict[str, str]] = None) -> "MetricsCallbackHandler":
+        """LangChain callback handler recording the LLM requests and tool calls of one agent"""
+        return MetricsCallbackHandler(self, signature, model, tool_servers or {})
+
+    # ------------------------------------------------------------- prometheus
+
+    def render_prometheus(self) -> str:
+        """Aggregates in Prometheus text exposition format"""
+        def fmt(labels: Tuple, extra: str = "") -> str:
+            parts = [f'{name}="{_escape_label(value)}"' for name, value in labels]
+            if extra:
+                parts.append(extra)
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        lines: List[str] = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        seen = set()
+        for (kind, labels), hist in histograms:
+            name = f"ai_trader_{kind}_duration_seconds"
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for le, count in zip(_BUCKET_LABELS, hist.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{fmt(labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{fmt(labels)} {hist.sum:.6f}")
+            lines.append(f"{name}_count{fmt(labels)} {hist.count}")
+        for (counter, labels), value in counters:
+            name = f"ai_trader_{counter}_total"
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{fmt(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def _serve(self, port: int) -> None:
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = recorder.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"📈 Prometheus metrics on http://127.0.0.1:{port}/metrics")
+
+    def close(self) -> None:
+        """Flush the metrics file and stop the HTTP endpoint"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._file.close()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class MetricsCallbackHandler(AsyncCallbackHandler):
+    """Times chat model requests (with token usage) and tool calls of one agent"""
+
+    def __init__(self, recorder: MetricsRecorder, signature: str, model: Optional[str],
+                 tool_servers: Dict[str, str]):
+        """
+        Args:
+            recorder: Recorder the events go to
+            signature: Agent signature added to every event
+            model: Model label used when the request does not name its model
+            tool_servers: Tool name -> MCP server name
+        """
+        self.recorder = recorder
+        self.signature = signature
+        self.model = model
+        self.tool_servers = tool_servers
+        self._runs: Dict[UUID, Tuple[float, Dict[str, Any]]] = {}
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or (kwargs.get("metadata") or {}).get("ls_model_name")
+        model = model or self.model
+        self._runs[run_id] = (time.perf_counter(), {"model": model})
+
+    async def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        start, fields = self._runs.pop(run_id, (None, {}))
+        if start is None:
+            return
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if message is not None and getattr(message, "usage_metadata", None):
+                    usage = message.usage_metadata
+        if not usage and response.llm_output:
+            token_usage = response.llm_output.get("token_usage") or {}
+            usage = {"input_tokens": token_usage.get("prompt_tokens"), "output_tokens": token_usage.get("completion_tokens")}
+        self.recorder.record(
+            "llm", time.perf_counter() - start, signature=self.signature, model=fields.get("model"),
+            input_tokens=usage.get("input_tokens"), output_tokens=usage.get("output_tokens"),
+        )
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        start, fields = self._runs.pop(run_id, (None, {}))
+        if start is not None:
+            self.recorder.record("llm", time.perf_counter() - start, signature=self.signature,
+                                 model=fields.get("model"), error=type(error).__name__)
+
+    async def on_tool_start(self, serialized, input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name")
+        self._runs[run_id] = (time.perf_counter(), {
+            "tool": name,
+            "server": self.tool_servers.get(name),
+            "request_bytes": len(str(input_str).encode("utf-8")),
+        })
+
+    async def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        start, fields = self._runs.pop(run_id, (None, {}))
+        if start is None:
+            return
+        content = getattr(output, "content", output)
+        self.recorder.record("tool", time.perf_counter() - start, signature=self.signature,
+                             response_bytes=len(str(content).encode("utf-8")), **fields)
+
+    async def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        start, fields = self._runs.pop(run_id, (None, {}))
+        if start is not None:
+            self.recorder.record("tool", time.perf_counter() - start, signature=self.signature,
+                                 error=type(error).__name__, **fields)
+
+
+_metrics: Any = NullMetrics()
+
+
+def get_metrics():
+    """Process-wide metrics recorder (a no-op NullMetrics unless configure_metrics was called)"""
+    return _metrics
+
+
+def configure_metrics(path: Optional[str] = None, prometheus_port: Optional[int] = None) -> MetricsRecorder:
+    """
+    Enable metrics for this process
+
+    Args:
+        path: Metrics jsonl file, defaults to data/metrics/metrics-<timestamp>.jsonl
+        prometheus_port: Serve /metrics on this local port, None to disable
+
+    Returns:
+        The active recorder (closed automatically at exit)
+    """
+    global _metrics
+    _metrics.close()
+    if path is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(project_root, "data", "metrics", f"metrics-{stamp}.jsonl")
+    _metrics = MetricsRecorder(path, prometheus_port)
+    atexit.register(_metrics.close)
+    print(f"📈 Writing metrics to {path}")
+    return _metrics
@@ -0,0 +1,526 @@
+"""
+NAV Engine
+Vectorized portfolio valuation of agent position histories
+
+Position records are loaded into one dense agents × dates × symbols array: the
+last record of each date wins and is carried forward to the following dates.
+Each agent's history merges, in this order, the registration record
+(data/agent_data/<signature>/position/position.jsonl), the jsonl trade ledger
+(position_okx.jsonl) and, with LEDGER_BACKEND=sqlite, the SQLite trade ledger.
+Joined with a dates × symbols close price matrix this gives daily NAV, returns
+and cash weight of all agents in a single numpy pass.
+
+Position keys are either cash ("CASH", "USDT"), trading pairs ("BTC/USDT") or
+bare assets ("BTC", "NVDA"). Prices come from the local candle store (bare
+crypto assets are priced as <asset>/USDT) and, for symbols without candles, from
+Alpha-Vantage-style daily_prices_<SYMBOL>.json files as used by the dashboard.
+The last close on or before each date is used; held symbols without any price
+are valued at 0 and counted in ``unpriced``.
+
+Usage:
+    python -m tools.nav_engine [--root DIR] [--ledger DB] [--signatures A B] [--start DATE] [--end DATE] [--json PATH]
+"""
+
+import os
+import json
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from tools.candle_store import candle_store_root, get_candle_store, stored_timeframes
+from tools.position_store import PositionStore
+from tools.sqlite_ledger import SQLiteLedger, ledger_db_path, ledger_enabled
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_AGENT_ROOT = os.path.join(project_root, "data", "agent_data")
+DEFAULT_PRICE_DIR = os.path.join(project_root, "data")
+# Merge order: registration record first, trades override it
+POSITION_FILES = ("position.jsonl", "position_okx.jsonl")
+CASH_KEYS = frozenset({"CASH", "USDT"})
+QUOTE = "USDT"
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def find_position_files(agent_dir: str) -> List[str]:
+    """Non-empty position files of one agent directory, in merge order (registration file, then trades)"""
+    paths = [os.path.join(agent_dir, "position", name) for name in POSITION_FILES]
+    return [path for path in paths if os.path.isfile(path) and os.path.getsize(path) > 0]
+
+
+def discover_position_files(agent_root: str = DEFAULT_AGENT_ROOT,
+                            signatures: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+    """
+    Position files of all agents
+
+    Args:
+        agent_root: Agent data directory
+        signatures: Only these agents (None for every directory with a position file)
+
+    Returns:
+        {signature: position file paths in merge order}, sorted by signature
+    """
+    names = list(signatures) if signatures else sorted(os.listdir(agent_root)) if os.path.isdir(agent_root) else []
+    files = {}
+    for name in names:
+        paths = find_position_files(os.path.join(agent_root, name))
+        if paths:
+            files[name] = paths
+    return files
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _to_days(dates: Iterable[str]) -> np.ndarray:
+    return np.asarray(list(dates), dtype="datetime64[D]")
+
+
+class DailyPositions:
+    """Last position of each date of one agent: values[date, column] for position keys ``columns``"""
+
+    def __init__(self, dates: List[str], columns: List[str], values: np.ndarray):
+        self.dates = dates
+        self.columns = columns
+        self.values = values
+
+    @classmethod
+    def from_records(cls, by_date: Dict[str, Dict[str, Any]]) -> "DailyPositions":
+        """Build from {date: positions}; missing keys are 0"""
+        dates = sorted(by_date)
+        columns: Dict[str, int] = defaultdict(lambda: len(columns))
+        sizes, entry_column, entry_value = [], [], []
+        for date in dates:
+            positions = by_date[date]
+            sizes.append(len(positions))
+            entry_column.extend(map(columns.__getitem__, positions))
+            entry_value.extend(positions.values())
+        try:
+            entry_values = np.asarray(entry_value, dtype=np.float64)
+        except (TypeError, ValueError):
+            entry_values = np.asarray([_to_float(value) for value in entry_value], dtype=np.float64)
+        values = np.zeros((len(dates), len(columns)))
+        values[np.repeat(np.arange(len(dates)), sizes), np.asarray(entry_column, dtype=np.int64)] = entry_values
+        return cls(dates, list(columns), values)
+
+    def merge(self, newer: "DailyPositions") -> "DailyPositions":
+        """Dates of ``newer`` replace or extend this table"""
+        columns = list(dict.fromkeys(self.columns + newer.columns))
+        position = {key: i for i, key in enumerate(columns)}
+        replaced = set(newer.dates)
+        keep = [i for i, date in enumerate(self.dates) if date not in replaced]
+        values = np.zeros((len(keep) + len(newer.dates), len(columns)))
+        values[:len(keep), [position[key] for key in self.columns]] = self.values[keep]
+        values[len(keep):, [position[key] for key in newer.columns]] = newer.values
+        dates = [self.dates[i] for i in keep] + newer.dates
+        order = np.argsort(np.asarray(dates), kind="stable")
+        return DailyPositions([dates[i] for i in order], columns, values[order])
+
+
+def load_daily_positions(position_file: str) -> DailyPositions:
+    """
+    Last position of each date of one position file
+
+    Parsed positions are cached next to the file (<file>.nav.npz); when the file
+    has grown only the records appended since are read, using the offsets of the
+    PositionStore index. The cache is validated with the same content fingerprint
+    as that index, so a file rewritten in place is parsed again from scratch.
+
+    Args:
+        position_file: position.jsonl / position_okx.jsonl
+
+    Returns:
+        DailyPositions sorted by date
+    """
+    store = PositionStore(position_file)
+    cache_file = position_file + ".nav.npz"
+    stat = os.stat(position_file)
+    file_id = np.array([stat.st_dev, stat.st_ino], dtype=np.int64)
+
+    cached: Optional[DailyPositions] = None
+    cached_size = 0
+    try:
+        with np.load(cache_file) as cache:
+            size = int(cache["size"])
+            if (
+                np.array_equal(cache["file_id"], file_id)
+                and size <= stat.st_size
+                and str(cache["fingerprint"]) == str(store.fingerprint(size))
+            ):
+                cached = DailyPositions(cache["dates"].tolist(), cache["columns"].tolist(), cache["values"])
+                cached_size = size
+    except (OSError, KeyError, ValueError):
+        pass
+    if cached is not None and cached_size == stat.st_size:
+        return cached
+
+    by_date: Dict[str, Dict[str, Any]] = {}
+    for date, record in store.latest_by_date(since_offset=cached_size).items():
+        positions = record.get("positions")
+        if date and isinstance(positions, dict):
+            by_date[date[:10]] = positions
+    daily = DailyPositions.from_records(by_date)
+    if cached is not None:
+        daily = cached.merge(daily)
+
+    tmp_file = cache_file + ".tmp.npz"
+    try:
+        np.savez(tmp_file, file_id=file_id, size=np.int64(stat.st_size),
+                 fingerprint=np.asarray(str(store.fingerprint(stat.st_size))), dates=np.asarray(daily.dates, dtype=str),
+                 columns=np.asarray(daily.columns, dtype=str), values=daily.values)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"⚠️ Failed to write NAV cache {cache_file}: {e}")
+    return daily
+
+
+def load_ledger_positions(ledger: SQLiteLedger, signature: str) -> DailyPositions:
+    """Last position of each date of one agent in the SQLite trade ledger"""
+    by_date: Dict[str, Dict[str, Any]] = {}
+    for date, record in ledger.latest_by_date(signature).items():
+        positions = record.get("positions")
+        if date and isinstance(positions, dict):
+            by_date[date[:10]] = positions
+    return DailyPositions.from_records(by_date)
+
+
+def load_agent_positions(files: List[str], ledger: Optional[SQLiteLedger] = None,
+                         signature: Optional[str] = None) -> DailyPositions:
+    """
+    Merged daily positions of one agent; later sources replace the dates of earlier ones
+
+    Args:
+        files: Position files in merge order (see find_position_files)
+        ledger: SQLite trade ledger merged last, None to skip
+        signature: Agent signature in the ledger
+
+    Returns:
+        DailyPositions sorted by date
+    """
+    daily = DailyPositions.from_records({})
+    for path in files:
+        daily = daily.merge(load_daily_positions(path))
+    if ledger is not None and signature:
+        daily = daily.merge(load_ledger_positions(ledger, signature))
+    return daily
+
+
+class PositionPanel:
+    """Dense holdings of many agents: quantities[agent, date, symbol] and cash[agent, date]"""
+
+    def __init__(self, signatures: List[str], dates: np.ndarray, symbols: List[str],
+                 quantities: np.ndarray, cash: np.ndarray, started: np.ndarray):
+        """
+        Args:
+            signatures: Agents (axis 0)
+            dates: datetime64[D] dates (axis 1), one per calendar day
+            symbols: Non-cash position keys (axis 2)
+            quantities: (agents, dates, symbols) holdings, forward-filled
+            cash: (agents, dates) cash (CASH + USDT), forward-filled
+            started: (agents, dates) True from an agent's first record on
+        """
+        self.signatures = signatures
+        self.dates = dates
+        self.symbols = symbols
+        self.quantities = quantities
+        self.cash = cash
+        self.started = started
+
+    @classmethod
+    def from_files(cls, files: Dict[str, List[str]], start: Optional[str] = None,
+                   end: Optional[str] = None, ledger: Optional[SQLiteLedger] = None) -> "PositionPanel":
+        """
+        Load position files into a panel
+
+        Args:
+            files: {signature: position files in merge order}
+            start: First date (default: earliest record); earlier records still
+                   provide the opening position
+            end: Last date (default: latest record)
+            ledger: SQLite trade ledger merged after the files of each agent
+
+        Returns:
+            PositionPanel over every calendar day from start to end
+        """
+        return cls.from_daily({sig: load_agent_positions(paths, ledger, sig) for sig, paths in files.items()},
+                              start, end)
+
+    @classmethod
+    def from_records(cls, records: Dict[str, Dict[str, Dict[str, Any]]], start: Optional[str] = None,
+                     end: Optional[str] = None) -> "PositionPanel":
+        """Build a panel from {signature: {date: positions}} (last position of each date)"""
+        return cls.from_daily({sig: DailyPositions.from_records(by_date) for sig, by_date in records.items()},
+                              start, end)
+
+    @classmethod
+    def from_daily(cls, daily: Dict[str, DailyPositions], start: Optional[str] = None,
+                   end: Optional[str] = None) -> "PositionPanel":
+        """Build a panel from per-agent DailyPositions"""
+        signatures = list(daily)
+        n_agents = len(signatures)
+        all_dates = [date for table in daily.values() for date in table.dates]
+        if not all_dates:
+            return cls(signatures, _to_days([]), [], np.zeros((n_agents, 0, 0)), np.zeros((n_agents, 0)),
+                       np.zeros((n_agents, 0), dtype=bool))
+        start_day = np.datetime64(start or min(all_dates), "D")
+        end_day = np.datetime64(end or max(all_dates), "D")
+        dates = np.arange(start_day, end_day + 1, dtype="datetime64[D]")
+        n_dates = len(dates)
+
+        # Rows of every agent inside the range; the last record before the start date opens day 0
+        columns: Dict[str, int] = defaultdict(lambda: len(columns))
+        selected = []
+        for agent, sig in enumerate(signatures):
+            table = daily[sig]
+            days = (_to_days(table.dates) - start_day).astype(np.int64)
+            rows = np.flatnonzero(days < n_dates)
+            before = rows[days[rows] < 0]
+            if len(before):
+                rows = rows[days[rows] >= 0]
+                if not len(rows) or days[rows[0]] > 0:
+                    rows = np.concatenate([before[-1:], rows])
+            table_columns = [columns[key] for key in table.columns]
+            selected.append((agent, np.maximum(days[rows], 0), table.values[rows], table_columns))
+
+        # One extra all-NaN row for dates before an agent's first record
+        n_rows = sum(len(days) for _, days, _, _ in selected)
+        row_values = np.zeros((n_rows + 1, len(columns)))
+        row_values[-1] = np.nan
+        record_row = np.full((n_agents, n_dates), -1, dtype=np.int64)
+        offset = 0
+        for agent, days, values, table_columns in selected:
+            row_values[offset:offset + len(days), table_columns] = values
+            record_row[agent, days] = np.arange(offset, offset + len(days))
+            offset += len(days)
+        cash_columns = [column for key, column in columns.items() if key in CASH_KEYS]
+        symbol_columns = [column for key, column in columns.items() if key not in CASH_KEYS]
+        symbols = [key for key in columns if key not in CASH_KEYS]
+
+        # Forward fill: index of the latest record row at or before each date
+        day_of_row = np.where(record_row >= 0, np.arange(n_dates), -1)
+        last_day = np.maximum.accumulate(day_of_row, axis=1)
+        started = last_day >= 0
+        filled_row = np.where(started, np.take_along_axis(record_row, np.maximum(last_day, 0), axis=1), n_rows)
+
+        cash = row_values[:, cash_columns].sum(axis=1)[filled_row]
+        quantities = row_values[:, symbol_columns][filled_row]
+        return cls(signatures, dates, symbols, quantities, cash, started)
+
+
+def price_symbol(key: str, quote: str = QUOTE) -> str:
+    """Trading pair used to price a position key: "BTC" -> "BTC/USDT", pairs unchanged"""
+    return key if "/" in key else f"{key}/{quote}"
+
+
+def _candle_closes(symbol: str, candle_root: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    timeframes = stored_timeframes(symbol, candle_root)
+    if not timeframes:
+        return None
+    timeframe = "1d" if "1d" in timeframes else timeframes[-1]
+    store = get_candle_store(symbol, timeframe, candle_root)
+    data = store.array()
+    if not len(data):
+        return None
+    # A candle's close belongs to the day in which the candle ends
+    close_time = data[:, 0] + store.timeframe_ms - 1
+    return close_time, np.asarray(data[:, 4])
+
+
+def _daily_price_file_closes(key: str, price_dir: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    path = os.path.join(price_dir, f"daily_prices_{key}.json")
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        series = json.load(f).get("Time Series (Daily)") or {}
+    if not series:
+        return None
+    days = sorted(series)
+    close_time = (_to_days(days).astype(np.int64) + 1) * DAY_MS - 1
+    closes = np.array([float(series[day].get("4. close", "nan")) for day in days])
+    return close_time.astype(np.float64), closes
+
+
+def load_price_matrix(symbols: List[str], dates: np.ndarray, candle_root: Optional[str] = None,
+                      price_dir: str = DEFAULT_PRICE_DIR, quote: str = QUOTE) -> np.ndarray:
+    """
+    Close prices as a dates × symbols matrix
+
+    Args:
+        symbols: Position keys (pairs or bare assets)
+        dates: datetime64[D] dates
+        candle_root: Candle store root (default CANDLE_STORE_PATH or ./data/candles)
+        price_dir: Directory with daily_prices_<SYMBOL>.json files
+        quote: Quote currency of bare crypto assets
+
+    Returns:
+        (dates, symbols) float64 matrix; the last close on or before each date, NaN if none
+    """
+    candle_root = candle_root or candle_store_root()
+    day_end = ((dates.astype(np.int64) + 1) * DAY_MS - 1).astype(np.float64)
+    prices = np.full((len(dates), len(symbols)), np.nan)
+    for column, key in enumerate(symbols):
+        series = _candle_closes(price_symbol(key, quote), candle_root) or _daily_price_file_closes(key, price_dir)
+        if series is None:
+            continue
+        close_time, closes = series
+        last = np.searchsorted(close_time, day_end, side="right") - 1
+        prices[:, column] = np.where(last >= 0, closes[np.maximum(last, 0)], np.nan)
+    return prices
+
+
+class NavResult:
+    """Daily NAV, returns and cash weight per agent (rows follow ``signatures``, columns ``dates``)"""
+
+    def __init__(self, signatures: List[str], dates: np.ndarray, nav: np.ndarray, returns: np.ndarray,
+                 cash: np.ndarray, cash_weight: np.ndarray, unpriced: np.ndarray):
+        self.signatures = signatures
+        self.dates = dates
+        self.nav = nav
+        self.returns = returns
+        self.cash = cash
+        self.cash_weight = cash_weight
+        self.unpriced = unpriced
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per agent: first/last date and NAV, total return, max drawdown, final cash weight"""
+        rows = []
+        for i, sig in enumerate(self.signatures):
+            valid = np.flatnonzero(~np.isnan(self.nav[i]))
+            if not len(valid):
+                rows.append({"signature": sig})
+                continue
+            nav = self.nav[i, valid]
+            drawdown = nav / np.maximum.accumulate(nav) - 1
+            rows.append({
+                "signature": sig,
+                "start": str(self.dates[valid[0]]),
+                "end": str(self.dates[valid[-1]]),
+                "start_nav": round(float(nav[0]), 2),
+                "end_nav": round(float(nav[-1]), 2),
+                "total_return": round(float(nav[-1] / nav[0] - 1), 6) if nav[0] else None,
+                "max_drawdown": round(float(drawdown.min()), 6),
+                "cash_weight": round(float(self.cash_weight[i, valid[-1]]), 6),
+                "unpriced_days": int((self.unpriced[i, valid] > 0).sum()),
+            })
+        return rows
+
+    def to_dict(self) -> Dict[str, List[Dict[str, Any]]]:
+        """{signature: [{date, nav, return, cash_weight}]} for the dates each agent was active"""
+        dates = [str(day) for day in self.dates]
+        result = {}
+        for i, sig in enumerate(self.signatures):
+            result[sig] = [
+                {
+                    "date": dates[j],
+                    "nav": float(self.nav[i, j]),
+                    "return": None if np.isnan(self.returns[i, j]) else float(self.returns[i, j]),
+                    "cash_weight": float(self.cash_weight[i, j]),
+                }
+                for j in np.flatnonzero(~np.isnan(self.nav[i]))
+            ]
+        return result
+
+
+def compute_nav(panel: PositionPanel, prices: np.ndarray) -> NavResult:
+    """
+    Value every agent on every date in one pass
+
+    Args:
+        panel: Holdings of all agents
+        prices: (dates, symbols) close prices aligned with the panel
+
+    Returns:
+        NavResult with NaN before each agent's first record
+    """
+    priced = ~np.isnan(prices)
+    held = np.nan_to_num(panel.quantities)
+    holdings_value = np.einsum("ads,ds->ad", held, np.where(priced, prices, 0.0))
+    nav = np.where(panel.started, panel.cash + holdings_value, np.nan)
+    unpriced = ((held != 0) & ~priced[None, :, :]).sum(axis=2)
+
+    returns = np.full_like(nav, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns[:, 1:] = nav[:, 1:] / nav[:, :-1] - 1
+        cash_weight = panel.cash / nav
+    return NavResult(panel.signatures, panel.dates, nav, returns, panel.cash, cash_weight, unpriced)
+
+
+def compute_agent_nav(agent_root: str = DEFAULT_AGENT_ROOT, signatures: Optional[Iterable[str]] = None,
+                      start: Optional[str] = None, end: Optional[str] = None, candle_root: Optional[str] = None,
+                      price_dir: str = DEFAULT_PRICE_DIR, ledger_path: Optional[str] = None) -> NavResult:
+    """
+    Load all agents' position histories, price them and compute NAV
+
+    Args:
+        agent_root: Agent data directory
+        signatures: Only these agents (None for all)
+        start: First date (default: earliest record)
+        end: Last date (default: latest record)
+        candle_root: Candle store root
+        price_dir: Directory with daily_prices_<SYMBOL>.json files
+        ledger_path: SQLite trade ledger to merge (default: LEDGER_DB_PATH when
+                     LEDGER_BACKEND=sqlite, otherwise none)
+
+    Returns:
+        NavResult
+    """
+    if ledger_path is None and ledger_enabled():
+        ledger_path = ledger_db_path()
+    ledger = None
+    if ledger_path:
+        if os.path.exists(ledger_path):
+            ledger = SQLiteLedger(ledger_path)
+        else:
+            print(f"⚠️ SQLite ledger {ledger_path} not found, using the position files only")
+    elif os.path.exists(ledger_db_path()):
+        print(f"⚠️ Ignoring SQLite ledger {ledger_db_path()} (LEDGER_BACKEND is not sqlite); "
+              f"pass --ledger to include its trades")
+
+    files = discover_position_files(agent_root, signatures)
+    if ledger is not None:
+        for signature in signatures or ledger.signatures():
+            files.setdefault(signature, [])
+        files = dict(sorted(files.items()))
+    panel = PositionPanel.from_files(files, start, end, ledger)
+    prices = load_price_matrix(panel.symbols, panel.dates, candle_root, price_dir)
+    return compute_nav(panel, prices)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Daily NAV of all agents from their position histories")
+    parser.add_argument("--root", default=DEFAULT_AGENT_ROOT, help="Agent data directory (default: data/agent_data)")
+    parser.add_argument("--ledger", help="SQLite trade ledger to merge (default: LEDGER_DB_PATH with LEDGER_BACKEND=sqlite)")
+    parser.add_argument("--signatures", nargs="+", help="Only these agents")
+    parser.add_argument("--start", help="First date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last date (YYYY-MM-DD)")
+    parser.add_argument("--candles", help="Candle store root (default: CANDLE_STORE_PATH or data/candles)")
+    parser.add_argument("--prices", default=DEFAULT_PRICE_DIR, help="Directory with daily_prices_<SYMBOL>.json files")
+    parser.add_argument("--json", help="Write the daily NAV series of every agent to this file")
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    result = compute_agent_nav(args.root, args.signatures, args.start, args.end, args.candles, args.prices, args.ledger)
+    elapsed = time.perf_counter() - started_at
+
+    print(f"{'signature':<28} {'start':>10} {'end':>10} {'end NAV':>12} {'return':>9} {'max DD':>8} {'cash':>6}")
+    for row in result.summary():
+        if "end" not in row:
+            print(f"{row['signature']:<28} (no positions)")
+            continue
+        total_return = f"{row['total_return'] * 100:+.2f}%" if row["total_return"] is not None else "n/a"
+        print(f"{row['signature']:<28} {row['start']:>10} {row['end']:>10} {row['end_nav']:>12.2f} "
+              f"{total_return:>9} {row['max_drawdown'] * 100:>7.2f}% {row['cash_weight'] * 100:>5.1f}%"
+              + (f"  ⚠️ {row['unpriced_days']} day(s) with unpriced holdings" if row["unpriced_days"] else ""))
+    print(f"⏱️ {len(result.signatures)} agents × {len(result.dates)} dates in {elapsed * 1000:.1f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"summary": result.summary(), "nav": result.to_dict()}, f, ensure_ascii=False, indent=2)
+        print(f"✅ NAV series written to {args.json}")
@@ -0,0 +1,281 @@
+"""
+News Index
+In-memory BM25 full-text index over local Alpha-Vantage-style news feeds
+
+Feeds are JSON files with a ``feed`` list (data/news.json, plus any *.json or
+*.jsonl files dropped into data/news/). The index is rebuilt when a feed file
+changes, so appended feeds are picked up without restarting the server.
+Searches only see articles published strictly before the simulated TODAY_DATE.
+
+Environment:
+    NEWS_DATA_PATH   Feed files or directories, separated by os.pathsep
+                     (default ./data/news.json and ./data/news)
+"""
+
+import os
+import re
+import json
+import math
+import bisect
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.runtime_context import get_runtime_context
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+# Titles say more about an article than the same words in its summary
+TITLE_WEIGHT = 2
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric tokens without stopwords"""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def normalize_ticker(ticker: str) -> str:
+    """Bare asset symbol: "BTC/USDT" -> "BTC", "CRYPTO:BTC" -> "BTC" """
+    ticker = ticker.strip().upper()
+    ticker = ticker.split(":", 1)[1] if ":" in ticker else ticker
+    return ticker.split("/", 1)[0]
+
+
+def cutoff_timestamp(today_date: Optional[str]) -> Optional[str]:
+    """
+    TODAY_DATE as a time_published string ("YYYY-MM-DD" -> "YYYYMMDDT000000")
+
+    Returns:
+        Cutoff comparable with time_published, or None if no date is set
+    """
+    if not today_date:
+        return None
+    fmt = "%Y-%m-%d %H:%M:%S" if " " in today_date else "%Y-%m-%d"
+    return datetime.strptime(today_date, fmt).strftime("%Y%m%dT%H%M%S")
+
+
+def _format_time(time_published: str) -> str:
+    try:
+        return datetime.strptime(time_published, "%Y%m%dT%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return time_published
+
+
+class NewsIndex:
+    """BM25 index of news articles, ordered by publication time"""
+
+    def __init__(self, sources: List[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            sources: Feed files or directories of feed files
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        self.sources = sources
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._stamp = None
+        self.articles: List[Dict[str, Any]] = []
+        self._times: List[str] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._doc_lengths: List[int] = []
+        self._avg_length = 0.0
+        self._tickers: Dict[str, List[int]] = {}
+
+    # ---------------------------------------------------------------- loading
+
+    def _files(self) -> List[str]:
+        files = []
+        for source in self.sources:
+            if os.path.isdir(source):
+                files.extend(
+                    os.path.join(source, name) for name in sorted(os.listdir(source))
+                    if name.endswith((".json", ".jsonl"))
+                )
+            elif os.path.isfile(source):
+                files.append(source)
+        return files
+
+    def _files_stamp(self, files: List[str]) -> Tuple:
+        stamp = []
+        for path in files:
+            stat = os.stat(path)
+            stamp.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(stamp)
+
+    @staticmethod
+    def _read_feed(path: str) -> List[Dict[str, Any]]:
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                # One article, or one {"feed": [...]} page, per line
+                articles = []
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        articles.extend(item.get("feed", [item]) if isinstance(item, dict) else item)
+                return articles
+            data = json.load(f)
+        return data.get("feed", []) if isinstance(data, dict) else data
+
+    def refresh(self) -> None:
+        """Rebuild the index if any feed file was added or changed"""
+        files = self._files()
+        stamp = self._files_stamp(files)
+        with self._lock:
+            if stamp == self._stamp:
+                return
+            articles = {}
+            for path in files:
+                try:
+                    for article in self._read_feed(path):
+                        if article.get("time_published"):
+                            # The same article may appear in several feeds
+                            articles[article.get("url") or (article.get("title"), article["time_published"])] = article
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Failed to read news feed {path}: {e}")
+            self._build(sorted(articles.values(), key=lambda a: a["time_published"]))
+            self._stamp = stamp
+
+    def _build(self, articles: List[Dict[str, Any]]) -> None:
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        tickers: Dict[str, List[int]] = defaultdict(list)
+        doc_lengths = []
+        for doc_id, article in enumerate(articles):
+            tokens = tokenize(article.get("title", "")) * TITLE_WEIGHT + tokenize(article.get("summary", ""))
+            counts: Dict[str, int] = defaultdict(int)
+            for token in tokens:
+                counts[token] += 1
+            for token, tf in counts.items():
+                postings[token].append((doc_id, tf))
+            doc_lengths.append(len(tokens))
+            for entry in article.get("ticker_sentiment", []):
+                symbol = normalize_ticker(entry.get("ticker", ""))
+                if symbol and (not tickers[symbol] or tickers[symbol][-1] != doc_id):
+                    tickers[symbol].append(doc_id)
+
+        self.articles = articles
+        self._times = [a["time_published"] for a in articles]
+        self._postings = dict(postings)
+        self._tickers = dict(tickers)
+        self._doc_lengths = doc_lengths
+        self._avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+
+    # ---------------------------------------------------------------- search
+
+    def search(
+        self,
+        query: str,
+        before: Optional[str] = None,
+        ticker: Optional[str] = None,
+        limit: int = 5,
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank articles against a query with BM25
+
+        Args:
+            query: Free-text query; empty returns the latest matching articles
+            before: Only articles with time_published < before ("YYYYMMDDTHHMMSS")
+            ticker: Only articles mentioning this asset (e.g. "BTC", "BTC/USDT", "CRYPTO:BTC")
+            limit: Maximum number of results
+
+        Returns:
+            Article dicts with an added "score", best first
+        """
+        self.refresh()
+        # Documents are sorted by time: the date filter is a prefix of the doc ids
+        end = len(self.articles) if before is None else bisect.bisect_left(self._times, before)
+        allowed = None
+        if ticker:
+            allowed = set(self._tickers.get(normalize_ticker(ticker), []))
+
+        terms = tokenize(query)
+        if not terms:
+            doc_ids = [d for d in range(end - 1, -1, -1) if allowed is None or d in allowed]
+            return [dict(self.articles[d], score=0.0) for d in doc_ids[:limit]]
+
+        n_docs = len(self.articles)
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings:
+                if doc_id >= end or (allowed is not None and doc_id not in allowed):
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / self._avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        # Ties go to the more recent article
+        ranked = sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)[:limit]
+        return [dict(self.articles[doc_id], score=round(score, 4)) for doc_id, score in ranked]
+
+
+def format_articles(articles: List[Dict[str, Any]], ticker: Optional[str] = None) -> str:
+    """Render search results in the text layout of the search tools"""
+    symbol = normalize_ticker(ticker) if ticker else None
+    blocks = []
+    for article in articles:
+        sentiment = f"{article.get('overall_sentiment_label', 'n/a')} ({article.get('overall_sentiment_score', 'n/a')})"
+        if symbol:
+            for entry in article.get("ticker_sentiment", []):
+                if normalize_ticker(entry.get("ticker", "")) == symbol:
+                    sentiment += (f"; {entry['ticker']}: {entry.get('ticker_sentiment_label')} "
+                                  f"(score {entry.get('ticker_sentiment_score')}, relevance {entry.get('relevance_score')})")
+                    break
+        blocks.append(f"""
+URL: {article.get('url', '')}
+Title: {article.get('title', '')}
+Source: {article.get('source', '')}
+Publish Time: {_format_time(article.get('time_published', ''))}
+Sentiment: {sentiment}
+Summary: {article.get('summary', '')}
+""")
+    return "\n".join(blocks)
+
+
+_news_index: Optional[NewsIndex] = None
+_news_index_lock = threading.Lock()
+
+
+def get_news_index() -> NewsIndex:
+    """Process-wide news index over NEWS_DATA_PATH"""
+    global _news_index
+    if _news_index is None:
+        with _news_index_lock:
+            if _news_index is None:
+                configured = os.getenv("NEWS_DATA_PATH")
+                if configured:
+                    sources = [p for p in configured.split(os.pathsep) if p]
+                else:
+                    sources = [
+                        os.path.join(project_root, "data", "news.json"),
+                        os.path.join(project_root, "data", "news"),
+                    ]
+                _news_index = NewsIndex(sources)
+    return _news_index
+
+
+def search_local_news(query: str, ticker: Optional[str] = None, limit: int = 5) -> str:
+    """
+    Search the local news index for articles published before TODAY_DATE
+
+    Args:
+        query: Search terms
+        ticker: Optional asset filter (e.g. "BTC", "ETH/USDT")
+        limit: Maximum number of articles
+
+    Returns:
+        Formatted articles, or a notice if nothing matched
+    """
+    today_date = get_runtime_context().today_date
+    articles = get_news_index().search(query, before=cutoff_timestamp(today_date), ticker=ticker, limit=limit)
+    if not articles:
+        return f"⚠️ No local news found for '{query}'" + (f" about {ticker}" if ticker else "") + (f" before {today_date}" if today_date else "")
+    return format_articles(articles, ticker)
@@ -0,0 +1,242 @@
+"""
+OKX Client Pool
+Process-wide, long-lived ccxt OKX clients shared by the MCP tool servers
+
+Building a ``ccxt.okx`` instance per tool call throws away the loaded markets,
+the rate limiter state and the HTTP keep-alive session. Clients here are created
+once per (trading_type, credentials, sandbox) key, load their markets once, and
+are then reused by every tool invocation in the process.
+
+The MCP tool servers use the async clients (``ccxt.async_support``): all async
+clients of an event loop share one aiohttp session, and are closed by
+``okx_clients_lifespan`` when the server shuts down.
+"""
+
+import os
+import ssl
+import asyncio
+import hashlib
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+import ccxt
+import ccxt.async_support as ccxt_async
+
+_clients: Dict[Tuple[str, str, bool], "ccxt.okx"] = {}
+_pool_lock = threading.Lock()
+
+
+def okx_credentials_from_env() -> Optional[Tuple[str, str, str]]:
+    """
+    Read OKX API credentials from the environment
+
+    Returns:
+        (api_key, api_secret, passphrase), or None if any of them is missing
+    """
+    api_key = os.getenv("OKX_API_KEY")
+    api_secret = os.getenv("OKX_API_SECRET")
+    passphrase = os.getenv("OKX_PASSPHRASE")
+    if not all([api_key, api_secret, passphrase]):
+        return None
+    return api_key, api_secret, passphrase
+
+
+def okx_sandbox_from_env() -> bool:
+    """Whether the OKX testnet is enabled (OKX_TESTNET=true)"""
+    return os.getenv("OKX_TESTNET", "false").lower() == "true"
+
+
+def _credentials_key(credentials: Optional[Tuple[str, str, str]]) -> str:
+    """Pool key for a credential set; hashed so secrets are not kept in the key"""
+    if not credentials:
+        return "public"
+    return hashlib.sha256("\0".join(credentials).encode("utf-8")).hexdigest()
+
+
+def _client_config(trading_type: str, credentials: Optional[Tuple[str, str, str]]) -> Dict:
+    config = {
+        'enableRateLimit': True,
+        'options': {
+            'defaultType': trading_type,  # 支持 spot, swap, future, option
+        }
+    }
+    if credentials:
+        config.update({
+            'apiKey': credentials[0],
+            'secret': credentials[1],
+            'password': credentials[2],
+        })
+    return config
+
+
+def get_pooled_okx_client(
+    trading_type: str = "spot",
+    credentials: Optional[Tuple[str, str, str]] = None,
+    sandbox: Optional[bool] = None,
+    load_markets: bool = True,
+):
+    """
+    Get a shared OKX client, creating it on first use
+
+    Args:
+        trading_type: Default market type - "spot", "swap", "future" or "option"
+        credentials: (api_key, api_secret, passphrase) for private endpoints, None for public data
+        sandbox: Use the OKX testnet, defaults to the OKX_TESTNET environment variable
+        load_markets: Load market metadata when the client is created
+
+    Returns:
+        ccxt.okx: Client shared by all callers with the same key
+    """
+    if sandbox is None:
+        sandbox = okx_sandbox_from_env()
+    key = (trading_type, _credentials_key(credentials), sandbox)
+
+    exchange = _clients.get(key)
+    if exchange is not None:
+        return exchange
+
+    with _pool_lock:
+        exchange = _clients.get(key)
+        if exchange is not None:
+            return exchange
+
+        exchange = ccxt.okx(_client_config(trading_type, credentials))
+        if sandbox:
+            exchange.set_sandbox_mode(True)
+        if load_markets:
+            try:
+                exchange.load_markets()
+            except Exception as e:
+                # Markets are loaded lazily by ccxt on the first call if this fails
+                print(f"⚠️ Failed to preload OKX markets ({trading_type}): {e}")
+        _clients[key] = exchange
+        return exchange
+
+
+def clear_okx_client_pool() -> None:
+    """Drop all pooled clients (e.g. after credentials changed)"""
+    with _pool_lock:
+        _clients.clear()
+
+
+class AsyncOKXClientPool:
+    """Async OKX clients of one event loop, sharing a single aiohttp session"""
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, str, bool], "ccxt_async.okx"] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            try:
+                import certifi
+                context = ssl.create_default_context(cafile=certifi.where())
+            except ImportError:
+                context = ssl.create_default_context()
+            connector = aiohttp.TCPConnector(ssl=context, enable_cleanup_closed=True)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def get(
+        self,
+        trading_type: str = "spot",
+        credentials: Optional[Tuple[str, str, str]] = None,
+        sandbox: Optional[bool] = None,
+        load_markets: bool = True,
+    ):
+        """Get a shared async client, creating it on first use (see get_pooled_async_okx_client)"""
+        if sandbox is None:
+            sandbox = okx_sandbox_from_env()
+        key = (trading_type, _credentials_key(credentials), sandbox)
+
+        exchange = self._clients.get(key)
+        if exchange is not None:
+            return exchange
+
+        async with self._lock:
+            exchange = self._clients.get(key)
+            if exchange is not None:
+                return exchange
+
+            config = _client_config(trading_type, credentials)
+            # The pool owns the session, ccxt must not close it with the client
+            config['session'] = self._get_session()
+            exchange = ccxt_async.okx(config)
+            if sandbox:
+                exchange.set_sandbox_mode(True)
+            if load_markets:
+                try:
+                    await exchange.load_markets()
+                except Exception as e:
+                    # Markets are loaded lazily by ccxt on the first call if this fails
+                    print(f"⚠️ Failed to preload OKX markets ({trading_type}): {e}")
+            self._clients[key] = exchange
+            return exchange
+
+    async def close(self) -> None:
+        """Close all clients and the shared session"""
+        async with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            for exchange in clients:
+                try:
+                    await exchange.close()
+                except Exception as e:
+                    print(f"⚠️ Failed to close OKX client: {e}")
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+
+
+# aiohttp sessions are bound to the loop that created them: one pool per event loop
+_async_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOKXClientPool]" = weakref.WeakKeyDictionary()
+
+
+def get_async_okx_pool() -> AsyncOKXClientPool:
+    """Async client pool of the running event loop"""
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        pool = _async_pools[loop] = AsyncOKXClientPool()
+    return pool
+
+
+async def get_pooled_async_okx_client(
+    trading_type: str = "spot",
+    credentials: Optional[Tuple[str, str, str]] = None,
+    sandbox: Optional[bool] = None,
+    load_markets: bool = True,
+):
+    """
+    Get a shared async OKX client for the running event loop, creating it on first use
+
+    Args:
+        trading_type: Default market type - "spot", "swap", "future" or "option"
+        credentials: (api_key, api_secret, passphrase) for private endpoints, None for public data
+        sandbox: Use the OKX testnet, defaults to the OKX_TESTNET environment variable
+        load_markets: Load market metadata when the client is created
+
+    Returns:
+        ccxt.async_support.okx: Client shared by all callers with the same key
+    """
+    return await get_async_okx_pool().get(trading_type, credentials, sandbox, load_markets)
+
+
+async def close_async_okx_clients() -> None:
+    """Close the async clients and the aiohttp session of the running event loop"""
+    pool = _async_pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
+
+
+@asynccontextmanager
+async def okx_clients_lifespan(server):
+    """FastMCP lifespan: closes the pooled async OKX clients when the server stops"""
+    try:
+        yield
+    finally:
+        await close_async_okx_clients()
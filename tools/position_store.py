@@ -0,0 +1,320 @@
+"""
+Position Store
+Append-only position.jsonl ledger with a sidecar index for constant-time lookups
+
+The index (``<position file>.idx.json``) keeps, for every date, the byte offset of
+the record with the highest action id, plus the overall max id, record count and a
+snapshot of the latest record. Appends update it incrementally; records appended by
+other writers are picked up by scanning only the unindexed tail of the file. A hash
+of the first and last bytes of the indexed part detects files rewritten in place,
+which are then re-indexed from scratch.
+"""
+
+import os
+import copy
+import json
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from tools.file_utils import file_lock, atomic_write_json
+
+INDEX_VERSION = 2
+FINGERPRINT_BYTES = 256
+
+
+class OrderRejected(Exception):
+    """Raised by an order's apply function to abort it; ``payload`` is returned to the caller"""
+
+    def __init__(self, payload: Dict[str, Any]):
+        super().__init__(payload.get("error", "Order rejected"))
+        self.payload = payload
+
+
+class PositionStore:
+    """Indexed access to one agent's position jsonl file"""
+
+    INDEX_SUFFIX = ".idx.json"
+
+    def __init__(self, position_file: str):
+        """
+        Args:
+            position_file: Path of the position jsonl file (need not exist yet)
+        """
+        self.position_file = str(position_file)
+        self.index_file = self.position_file + self.INDEX_SUFFIX
+        self._index: Optional[Dict[str, Any]] = None
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------ index
+
+    @staticmethod
+    def _empty_index(file_id=None) -> Dict[str, Any]:
+        return {
+            "version": INDEX_VERSION,
+            "file_id": file_id,
+            "size": 0,
+            "fingerprint": None,
+            "count": 0,
+            "max_id": -1,
+            "max_date": None,
+            "latest": None,
+            "dates": {},
+        }
+
+    def _file_id(self):
+        try:
+            st = os.stat(self.position_file)
+        except OSError:
+            return None, 0
+        return [st.st_dev, st.st_ino], st.st_size
+
+    def fingerprint(self, size: int) -> Optional[str]:
+        """
+        Hash of the first and last FINGERPRINT_BYTES of the file's first ``size`` bytes
+
+        Args:
+            size: Length of the file prefix to identify (e.g. an indexed size)
+
+        Returns:
+            Hex digest, or None for an empty prefix or an unreadable file
+        """
+        if size <= 0:
+            return None
+        try:
+            with open(self.position_file, "rb") as f:
+                head = f.read(min(size, FINGERPRINT_BYTES))
+                f.seek(max(size - FINGERPRINT_BYTES, 0))
+                tail = f.read(size - f.tell())
+        except OSError:
+            return None
+        return hashlib.sha1(head + b"\0" + tail).hexdigest()
+
+    def _covers(self, index: Optional[Dict[str, Any]], file_id, file_size: int) -> bool:
+        """Whether ``index`` describes a prefix of the current file"""
+        return (
+            index is not None
+            and index["file_id"] == file_id
+            and index["size"] <= file_size
+            and index.get("fingerprint") == self.fingerprint(index["size"])
+        )
+
+    def _read_index_file(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if isinstance(index, dict) and index.get("version") == INDEX_VERSION:
+                return index
+        except Exception:
+            pass
+        return None
+
+    @staticmethod
+    def _apply_record(index: Dict[str, Any], record: Dict[str, Any], offset: int) -> None:
+        """Fold one record into the index"""
+        index["count"] += 1
+        record_id = record.get("id", -1)
+        date = record.get("date")
+
+        if date is not None:
+            entry = index["dates"].get(date)
+            if entry is None or record_id >= entry["id"]:
+                index["dates"][date] = {"id": record_id, "offset": offset}
+            if index["max_date"] is None or date > index["max_date"]:
+                index["max_date"] = date
+
+        if record_id >= index["max_id"]:
+            index["max_id"] = record_id
+            index["latest"] = {"offset": offset, "record": record}
+
+    def _catch_up(self, index: Dict[str, Any], file_size: int) -> bool:
+        """Index complete lines between index["size"] and file_size; returns True if anything changed"""
+        if file_size <= index["size"]:
+            return False
+        offset = index["size"]
+        with open(self.position_file, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                # Stop at a line another writer has not finished yet
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    try:
+                        self._apply_record(index, json.loads(line), offset)
+                    except (ValueError, AttributeError):
+                        pass
+                offset += len(line)
+        changed = offset != index["size"]
+        if changed:
+            index["size"] = offset
+            index["fingerprint"] = self.fingerprint(offset)
+        return changed
+
+    def _save_index(self, index: Dict[str, Any]) -> None:
+        try:
+            atomic_write_json(self.index_file, index)
+        except OSError as e:
+            print(f"⚠️ Failed to write position index {self.index_file}: {e}")
+
+    def _current_index(self) -> Dict[str, Any]:
+        """Return an index that covers the whole position file"""
+        with self._lock:
+            file_id, file_size = self._file_id()
+            index = self._index
+            if not self._covers(index, file_id, file_size):
+                index = self._read_index_file()
+                if not self._covers(index, file_id, file_size):
+                    # Missing, stale or rewritten file: rebuild from scratch
+                    index = self._empty_index(file_id)
+            if self._catch_up(index, file_size):
+                self._save_index(index)
+            self._index = index
+            return index
+
+    def rebuild(self) -> Dict[str, Any]:
+        """Discard the index and rebuild it from the position file"""
+        with self._lock:
+            file_id, file_size = self._file_id()
+            index = self._empty_index(file_id)
+            self._catch_up(index, file_size)
+            self._save_index(index)
+            self._index = index
+            return index
+
+    # ---------------------------------------------------------------- queries
+
+    def exists(self) -> bool:
+        return os.path.exists(self.position_file)
+
+    def _read_at(self, offset: int) -> Optional[Dict[str, Any]]:
+        with open(self.position_file, "rb") as f:
+            f.seek(offset)
+            line = f.readline()
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def count(self) -> int:
+        """Number of records in the file"""
+        return self._current_index()["count"]
+
+    def max_id(self) -> int:
+        """Highest action id, -1 if empty"""
+        return self._current_index()["max_id"]
+
+    def max_date(self) -> Optional[str]:
+        """Latest date with a record, None if empty"""
+        return self._current_index()["max_date"]
+
+    def latest(self, date: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the latest record
+
+        Args:
+            date: If given, the record with the highest id on that date
+
+        Returns:
+            The record dict, or None if there is none
+        """
+        index = self._current_index()
+        if date is None:
+            latest = index["latest"]
+            return copy.deepcopy(latest["record"]) if latest else None
+        entry = index["dates"].get(date)
+        if entry is None:
+            return None
+        return self._read_at(entry["offset"])
+
+    def latest_by_date(self, since_offset: int = 0) -> Dict[str, Dict[str, Any]]:
+        """
+        The record with the highest id of every date, read in one pass over the file
+
+        Args:
+            since_offset: Only dates whose latest record starts at or after this byte
+                          offset (e.g. the file size at a previous call)
+
+        Returns:
+            {date: record}
+        """
+        entries = sorted(
+            ((date, entry) for date, entry in self._current_index()["dates"].items() if entry["offset"] >= since_offset),
+            key=lambda item: item[1]["offset"],
+        )
+        records = {}
+        with open(self.position_file, "rb") as f:
+            for date, entry in entries:
+                f.seek(entry["offset"])
+                try:
+                    records[date] = json.loads(f.readline())
+                except ValueError:
+                    continue
+        return records
+
+    def get_latest_position(self, today_date: Optional[str] = None) -> Optional[Tuple[Dict[str, Any], int]]:
+        """
+        Positions to trade from: today's latest record, else the overall latest record
+
+        Returns:
+            (positions, action_id), or None if the file has no records
+        """
+        record = self.latest(today_date) if today_date else None
+        if record is None:
+            record = self.latest()
+        if record is None:
+            return None
+        return record.get("positions", {}), record.get("id", -1)
+
+    # ----------------------------------------------------------------- writes
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Append one record and update the index"""
+        with self._lock, file_lock(self.position_file):
+            self._append_locked(record)
+
+    def execute(
+        self,
+        today_date: str,
+        apply_fn: Callable[[Dict[str, Any], int], Dict[str, Any]],
+        initial_positions: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """
+        Read the latest position, build a new record from it and append it atomically
+
+        The file lock is held across the read-modify-write, so concurrent orders
+        for the same agent cannot interleave.
+
+        Args:
+            today_date: Trading date used to pick the current position
+            apply_fn: Called with (positions, action_id); returns the record to append
+                      or raises OrderRejected to abort without writing
+            initial_positions: Positions to start from when the file has no records
+
+        Returns:
+            The appended record
+        """
+        with self._lock, file_lock(self.position_file):
+            latest = self.get_latest_position(today_date)
+            if latest is None:
+                latest = (dict(initial_positions), -1)
+            record = apply_fn(*latest)
+            self._append_locked(record)
+            return record
+
+    def _append_locked(self, record: Dict[str, Any]) -> None:
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        directory = os.path.dirname(self.position_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        index = self._current_index()
+        with open(self.position_file, "ab") as f:
+            offset = f.tell()
+            f.write(line)
+        if index["file_id"] is None or offset != index["size"]:
+            # File was created just now, or was modified behind our back
+            self._current_index()
+        else:
+            index["size"] = offset + len(line)
+            index["fingerprint"] = self.fingerprint(index["size"])
+            self._apply_record(index, record, offset)
+            self._save_index(index)
@@ -0,0 +1,539 @@
+"""
+Replay Exchange
+Offline, ccxt-compatible stand-in for the OKX client that serves recorded market
+data as of the simulated clock (TODAY_DATE in the runtime env)
+
+Nothing is fetched from the network: tickers and OHLCV come from the local candle
+store, order books and funding rates from recorded snapshots. Only data that was
+public at the simulated time is returned, so backtests over ``date_range`` are
+point-in-time and reproducible.
+
+Data layout:
+    <CANDLE_STORE_PATH>/<SYMBOL>/<tf>.f64            candles (see tools.candle_store)
+    <REPLAY_DATA_PATH>/orderbooks/<SYMBOL>.jsonl     {"timestamp", "bids", "asks"} per line
+    <REPLAY_DATA_PATH>/funding/<SYMBOL>.jsonl        {"timestamp", "fundingRate", ...} per line
+
+The simulated clock is the start (00:00 UTC) of TODAY_DATE, or the exact time if
+TODAY_DATE is "YYYY-MM-DD HH:MM:SS". Order books without a recent snapshot are
+synthesized around the replayed price.
+
+Enable it with ``"trading_mode": "replay"`` in the config file (or TRADING_MODE=replay).
+Record data with:
+    python -m tools.replay_exchange --symbols BTC/USDT ETH/USDT --timeframes 1d 1h --since 2025-09-01
+
+Environment:
+    REPLAY_DATA_PATH     Order book / funding snapshots (default ./data/replay)
+    REPLAY_SPREAD_BPS    Spread of synthetic order books in basis points (default 2)
+"""
+
+import os
+import json
+import bisect
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import ccxt
+
+from tools.candle_store import (
+    candle_store_root,
+    get_candle_store,
+    stored_symbols,
+    stored_timeframes,
+    symbol_dirname,
+    timeframe_to_ms,
+)
+from tools.runtime_context import get_runtime_context
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DAY_MS = 24 * 60 * 60 * 1000
+FUNDING_INTERVAL_MS = 8 * 60 * 60 * 1000
+
+
+def is_replay_mode() -> bool:
+    """Whether the current run trades against recorded data (TRADING_MODE=replay)"""
+    return str(get_runtime_context().get("TRADING_MODE", "")).lower() == "replay"
+
+
+def is_replay_exchange(exchange) -> bool:
+    """Whether a client is a ReplayExchange (its prices depend on the caller's clock)"""
+    return getattr(exchange, "is_replay", False)
+
+
+def replay_clock_ms() -> int:
+    """
+    Simulated time of the current agent, from TODAY_DATE in the runtime env
+
+    Returns:
+        Epoch milliseconds (UTC)
+
+    Raises:
+        ValueError: If TODAY_DATE is not set
+    """
+    today_date = get_runtime_context().today_date
+    if not today_date:
+        raise ValueError("TODAY_DATE is not set, the replay exchange has no clock")
+    fmt = "%Y-%m-%d %H:%M:%S" if " " in today_date else "%Y-%m-%d"
+    moment = datetime.strptime(today_date, fmt).replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def _iso8601(timestamp_ms: Optional[int]) -> Optional[str]:
+    if timestamp_ms is None:
+        return None
+    moment = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+
+
+class _SnapshotLog:
+    """Timestamp-sorted jsonl snapshots of one symbol, reloaded when the file changes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._stamp = None
+        self._timestamps: List[int] = []
+        self._records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+        if stamp == self._stamp:
+            return
+        records = []
+        if stamp is not None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        records.append(json.loads(line))
+        records.sort(key=lambda r: r["timestamp"])
+        self._timestamps = [int(r["timestamp"]) for r in records]
+        self._records = records
+        self._stamp = stamp
+
+    def at(self, now_ms: int) -> Optional[Dict[str, Any]]:
+        """Latest snapshot taken at or before ``now_ms``"""
+        with self._lock:
+            self._load()
+            index = bisect.bisect_right(self._timestamps, now_ms)
+            return self._records[index - 1] if index else None
+
+    def last_timestamp(self) -> Optional[int]:
+        with self._lock:
+            self._load()
+            return self._timestamps[-1] if self._timestamps else None
+
+
+class ReplayExchange:
+    """ccxt-like exchange serving recorded OKX market data as of the simulated clock"""
+
+    id = "okx-replay"
+    is_replay = True
+
+    def __init__(
+        self,
+        trading_type: str = "spot",
+        candle_root: Optional[str] = None,
+        data_root: Optional[str] = None,
+        spread_bps: Optional[float] = None,
+        max_snapshot_age_ms: int = DAY_MS,
+    ):
+        """
+        Args:
+            trading_type: Default market type, kept for parity with the OKX client
+            candle_root: Candle store root, defaults to CANDLE_STORE_PATH or ./data/candles
+            data_root: Snapshot root, defaults to REPLAY_DATA_PATH or ./data/replay
+            spread_bps: Spread of synthetic order books, defaults to REPLAY_SPREAD_BPS or 2
+            max_snapshot_age_ms: Older order book snapshots are replaced by a synthetic book
+        """
+        self.trading_type = trading_type
+        self.candle_root = candle_root or candle_store_root()
+        self.data_root = data_root or os.getenv("REPLAY_DATA_PATH") or os.path.join(project_root, "data", "replay")
+        self.spread_bps = float(spread_bps if spread_bps is not None else os.getenv("REPLAY_SPREAD_BPS", "2"))
+        self.max_snapshot_age_ms = max_snapshot_age_ms
+        self.markets: Dict[str, Dict[str, Any]] = {}
+        self._logs: Dict[Tuple[str, str], _SnapshotLog] = {}
+        self._logs_lock = threading.Lock()
+
+    # ------------------------------------------------------------------ clock
+
+    def milliseconds(self) -> int:
+        """Simulated current time, like ccxt's Exchange.milliseconds()"""
+        return replay_clock_ms()
+
+    def _snapshot_log(self, kind: str, symbol: str) -> _SnapshotLog:
+        key = (kind, symbol)
+        log = self._logs.get(key)
+        if log is None:
+            with self._logs_lock:
+                path = os.path.join(self.data_root, kind, f"{symbol_dirname(symbol)}.jsonl")
+                log = self._logs.setdefault(key, _SnapshotLog(path))
+        return log
+
+    # ---------------------------------------------------------------- markets
+
+    def load_markets(self, reload: bool = False, params: Optional[Dict] = None) -> Dict[str, Dict[str, Any]]:
+        """Markets with recorded candles"""
+        if self.markets and not reload:
+            return self.markets
+        markets = {}
+        for symbol in stored_symbols(self.candle_root):
+            base, _, rest = symbol.partition("/")
+            quote, _, settle = rest.partition(":")
+            derivative = bool(settle)
+            dated = derivative and "-" in settle
+            markets[symbol] = {
+                "id": symbol_dirname(symbol),
+                "symbol": symbol,
+                "base": base,
+                "quote": quote,
+                "settle": settle.split("-")[0] or None,
+                "type": ("future" if dated else "swap") if derivative else "spot",
+                "spot": not derivative,
+                "swap": derivative and not dated,
+                "future": dated,
+                "option": False,
+                "active": True,
+            }
+        self.markets = markets
+        return markets
+
+    # ----------------------------------------------------------------- candles
+
+    def _ticker_timeframe(self, symbol: str) -> str:
+        timeframes = stored_timeframes(symbol, self.candle_root)
+        if not timeframes:
+            raise ccxt.BadSymbol(f"No recorded candles for {symbol} in {self.candle_root}")
+        return timeframes[0]
+
+    def fetch_ohlcv(
+        self,
+        symbol: str,
+        timeframe: str = "1m",
+        since: Optional[int] = None,
+        limit: Optional[int] = None,
+        params: Optional[Dict] = None,
+    ) -> List[List[float]]:
+        """
+        Candles that had closed by the simulated time
+
+        Args:
+            symbol: Trading pair symbol
+            timeframe: ccxt timeframe
+            since: First candle timestamp in ms; None returns the most recent candles
+            limit: Maximum number of candles
+
+        Returns:
+            ccxt OHLCV rows [timestamp, open, high, low, close, volume], oldest first
+        """
+        if timeframe != self._ticker_timeframe(symbol) and timeframe not in stored_timeframes(symbol, self.candle_root):
+            raise ccxt.ExchangeError(f"No recorded {timeframe} candles for {symbol}")
+        store = get_candle_store(symbol, timeframe, self.candle_root)
+        until = self.milliseconds() - store.timeframe_ms + 1
+        if since is None:
+            rows = store.range(until=until, limit=limit)
+        else:
+            rows = store.range(since=since, until=until)
+            if limit is not None:
+                rows = rows[:limit]
+        return rows.tolist()
+
+    # ----------------------------------------------------------------- tickers
+
+    def fetch_ticker(self, symbol: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Ticker as of the simulated time, built from the finest recorded candles
+
+        ``last`` is the close of the last closed candle; open/high/low/volume cover
+        the preceding 24 hours.
+        """
+        now_ms = self.milliseconds()
+        timeframe = self._ticker_timeframe(symbol)
+        store = get_candle_store(symbol, timeframe, self.candle_root)
+        until = now_ms - store.timeframe_ms + 1
+        candles = store.range(since=now_ms - DAY_MS, until=until)
+        if not len(candles):
+            candles = store.range(until=until, limit=1)
+        if not len(candles):
+            raise ccxt.ExchangeError(f"No recorded price for {symbol} before {_iso8601(now_ms)}")
+
+        last = float(candles[-1, 4])
+        open_ = float(candles[0, 1])
+        timestamp = int(candles[-1, 0]) + store.timeframe_ms
+        bid, ask = self._top_of_book(symbol, now_ms, last)
+        change = last - open_
+        return {
+            "symbol": symbol,
+            "timestamp": timestamp,
+            "datetime": _iso8601(timestamp),
+            "high": float(candles[:, 2].max()),
+            "low": float(candles[:, 3].min()),
+            "bid": bid,
+            "ask": ask,
+            "open": open_,
+            "close": last,
+            "last": last,
+            "previousClose": None,
+            "change": change,
+            "percentage": change / open_ * 100 if open_ else None,
+            "average": (open_ + last) / 2,
+            "baseVolume": float(candles[:, 5].sum()),
+            "quoteVolume": float((candles[:, 4] * candles[:, 5]).sum()),
+            "info": {"replay": True, "timeframe": timeframe},
+        }
+
+    def fetch_tickers(self, symbols: Optional[List[str]] = None, params: Optional[Dict] = None) -> Dict[str, Dict[str, Any]]:
+        """Tickers of several symbols; symbols without recorded data are omitted"""
+        if symbols is None:
+            symbols = list(self.load_markets())
+        tickers = {}
+        for symbol in symbols:
+            try:
+                tickers[symbol] = self.fetch_ticker(symbol)
+            except ccxt.BaseError:
+                continue
+        return tickers
+
+    # -------------------------------------------------------------- order book
+
+    def _recorded_book(self, symbol: str, now_ms: int) -> Optional[Dict[str, Any]]:
+        snapshot = self._snapshot_log("orderbooks", symbol).at(now_ms)
+        if snapshot is None or now_ms - snapshot["timestamp"] > self.max_snapshot_age_ms:
+            return None
+        return snapshot
+
+    def _top_of_book(self, symbol: str, now_ms: int, last: float) -> Tuple[float, float]:
+        snapshot = self._recorded_book(symbol, now_ms)
+        if snapshot and snapshot.get("bids") and snapshot.get("asks"):
+            return snapshot["bids"][0][0], snapshot["asks"][0][0]
+        half_spread = last * self.spread_bps / 2 / 10000
+        return last - half_spread, last + half_spread
+
+    def fetch_order_book(self, symbol: str, limit: Optional[int] = None, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Order book as of the simulated time
+
+        The latest recorded snapshot is used if it is recent enough; otherwise a
+        deterministic book is synthesized around the replayed price, with a constant
+        level size of one minute of the day's average volume.
+        """
+        now_ms = self.milliseconds()
+        limit = limit or 20
+        snapshot = self._recorded_book(symbol, now_ms)
+        if snapshot is not None:
+            timestamp = int(snapshot["timestamp"])
+            return {
+                "symbol": symbol,
+                "bids": snapshot.get("bids", [])[:limit],
+                "asks": snapshot.get("asks", [])[:limit],
+                "timestamp": timestamp,
+                "datetime": _iso8601(timestamp),
+                "nonce": snapshot.get("nonce"),
+            }
+
+        ticker = self.fetch_ticker(symbol)
+        last = ticker["last"]
+        step = last * self.spread_bps / 10000
+        size = ticker["baseVolume"] / (24 * 60) if ticker["baseVolume"] else 1.0
+        return {
+            "symbol": symbol,
+            "bids": [[ticker["bid"] - i * step, size] for i in range(limit)],
+            "asks": [[ticker["ask"] + i * step, size] for i in range(limit)],
+            "timestamp": ticker["timestamp"],
+            "datetime": ticker["datetime"],
+            "nonce": None,
+            "synthetic": True,
+        }
+
+    # ----------------------------------------------------------------- funding
+
+    def fetch_funding_rate(self, symbol: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """Latest recorded funding rate at or before the simulated time"""
+        now_ms = self.milliseconds()
+        record = self._snapshot_log("funding", symbol).at(now_ms)
+        if record is None:
+            raise ccxt.ExchangeError(f"No recorded funding rate for {symbol} before {_iso8601(now_ms)}")
+        timestamp = int(record["timestamp"])
+        next_timestamp = record.get("nextFundingTimestamp") or timestamp + FUNDING_INTERVAL_MS
+        mark_price = record.get("markPrice")
+        if mark_price is None:
+            try:
+                mark_price = self.fetch_ticker(symbol)["last"]
+            except ccxt.BaseError:
+                mark_price = None
+        return {
+            "symbol": symbol,
+            "fundingRate": record.get("fundingRate"),
+            "fundingTimestamp": timestamp,
+            "fundingDatetime": _iso8601(timestamp),
+            "nextFundingTimestamp": next_timestamp,
+            "nextFundingDatetime": _iso8601(next_timestamp),
+            "markPrice": mark_price,
+            "indexPrice": record.get("indexPrice"),
+            "timestamp": now_ms,
+            "datetime": _iso8601(now_ms),
+        }
+
+
+class AsyncReplayExchange:
+    """Awaitable facade over a ReplayExchange, matching the ccxt.async_support interface"""
+
+    id = ReplayExchange.id
+    is_replay = True
+
+    def __init__(self, exchange: ReplayExchange):
+        self.exchange = exchange
+
+    @property
+    def markets(self) -> Dict[str, Dict[str, Any]]:
+        return self.exchange.markets
+
+    def milliseconds(self) -> int:
+        return self.exchange.milliseconds()
+
+    # Recorded data is read from local disk, the calls do not need to yield
+
+    async def load_markets(self, reload: bool = False, params: Optional[Dict] = None) -> Dict[str, Dict[str, Any]]:
+        return self.exchange.load_markets(reload, params)
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str = "1m", since: Optional[int] = None,
+                          limit: Optional[int] = None, params: Optional[Dict] = None) -> List[List[float]]:
+        return self.exchange.fetch_ohlcv(symbol, timeframe, since, limit, params)
+
+    async def fetch_ticker(self, symbol: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        return self.exchange.fetch_ticker(symbol, params)
+
+    async def fetch_tickers(self, symbols: Optional[List[str]] = None, params: Optional[Dict] = None) -> Dict[str, Dict[str, Any]]:
+        return self.exchange.fetch_tickers(symbols, params)
+
+    async def fetch_order_book(self, symbol: str, limit: Optional[int] = None, params: Optional[Dict] = None) -> Dict[str, Any]:
+        return self.exchange.fetch_order_book(symbol, limit, params)
+
+    async def fetch_funding_rate(self, symbol: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        return self.exchange.fetch_funding_rate(symbol, params)
+
+    async def close(self) -> None:
+        pass
+
+
+_replay_exchanges: Dict[Tuple[str, str], ReplayExchange] = {}
+_replay_lock = threading.Lock()
+
+
+def get_replay_exchange(trading_type: str = "spot") -> ReplayExchange:
+    """
+    Shared ReplayExchange of this process
+
+    The clock is read from the caller's runtime env on every request, so one
+    instance serves agents replaying different dates.
+    """
+    key = (trading_type, candle_store_root())
+    exchange = _replay_exchanges.get(key)
+    if exchange is None:
+        with _replay_lock:
+            exchange = _replay_exchanges.setdefault(key, ReplayExchange(trading_type))
+    return exchange
+
+
+def get_async_replay_exchange(trading_type: str = "spot") -> AsyncReplayExchange:
+    """Shared replay exchange behind the async ccxt interface"""
+    return AsyncReplayExchange(get_replay_exchange(trading_type))
+
+
+# ------------------------------------------------------------------ recording
+
+def _append_jsonl(path: str, records: List[Dict[str, Any]]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def record_market_data(
+    exchange,
+    symbols: List[str],
+    timeframes: List[str],
+    since_ms: int,
+    funding: bool = False,
+    orderbook: bool = False,
+    data_root: Optional[str] = None,
+) -> None:
+    """
+    Record live market data for later replay
+
+    Candles are backfilled to ``since_ms`` and synced to the present; funding rate
+    history is appended after the last recorded entry; ``orderbook`` appends one
+    snapshot of the current book (run it periodically to build a history).
+    """
+    data_root = data_root or os.getenv("REPLAY_DATA_PATH") or os.path.join(project_root, "data", "replay")
+    for symbol in symbols:
+        for timeframe in timeframes:
+            store = get_candle_store(symbol, timeframe)
+            added = store.backfill(exchange, since_ms)
+            before = len(store)
+            store.sync(exchange)
+            print(f"✅ {symbol} {timeframe}: {added + len(store) - before} candles recorded ({len(store)} stored)")
+
+        if funding:
+            path = os.path.join(data_root, "funding", f"{symbol_dirname(symbol)}.jsonl")
+            last = _SnapshotLog(path).last_timestamp()
+            cursor = since_ms if last is None else last + 1
+            records = []
+            while True:
+                batch = exchange.fetch_funding_rate_history(symbol, since=cursor, limit=100)
+                batch = [r for r in batch if r["timestamp"] >= cursor]
+                if not batch:
+                    break
+                records.extend({"timestamp": r["timestamp"], "fundingRate": r["fundingRate"]} for r in batch)
+                cursor = batch[-1]["timestamp"] + 1
+            _append_jsonl(path, records)
+            print(f"✅ {symbol} funding: {len(records)} rates recorded")
+
+        if orderbook:
+            book = exchange.fetch_order_book(symbol, 50)
+            path = os.path.join(data_root, "orderbooks", f"{symbol_dirname(symbol)}.jsonl")
+            _append_jsonl(path, [{
+                "timestamp": book.get("timestamp") or exchange.milliseconds(),
+                "bids": book.get("bids", []),
+                "asks": book.get("asks", []),
+            }])
+            print(f"✅ {symbol} order book snapshot recorded")
+
+
+if __name__ == "__main__":
+    """Record live OKX data for replay: python -m tools.replay_exchange --symbols BTC/USDT --since 2025-09-01"""
+    import sys
+    import argparse
+
+    sys.path.insert(0, project_root)
+    from tools.okx_clients import get_pooled_okx_client
+
+    parser = argparse.ArgumentParser(description="Record OKX market data for the replay exchange")
+    parser.add_argument("--symbols", nargs="+", default=None, help="Trading pairs (default: all crypto symbols)")
+    parser.add_argument("--timeframes", nargs="+", default=["1d"], help="Candle timeframes (default: 1d)")
+    parser.add_argument("--since", required=True, help="First date to record (YYYY-MM-DD)")
+    parser.add_argument("--trading-type", default="spot", help="spot, swap or future (default: spot)")
+    parser.add_argument("--funding", action="store_true", help="Also record funding rate history (swaps)")
+    parser.add_argument("--orderbook", action="store_true", help="Also record a snapshot of the current order book")
+    args = parser.parse_args()
+
+    symbols = args.symbols
+    if not symbols:
+        from prompts.agent_prompt import all_crypto_symbols
+        symbols = list(all_crypto_symbols)
+    for timeframe in args.timeframes:
+        timeframe_to_ms(timeframe)
+
+    since = datetime.strptime(args.since, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    record_market_data(
+        get_pooled_okx_client(args.trading_type),
+        symbols,
+        args.timeframes,
+        int(since.timestamp() * 1000),
+        funding=args.funding,
+        orderbook=args.orderbook,
+    )
@@ -0,0 +1,216 @@
+"""
+Runtime Context
+In-memory view of the runtime env file (SIGNATURE, TODAY_DATE, IF_TRADE, ...)
+
+The file is shared between main.py, the agents and the MCP tool servers. Reads are
+served from memory and the file is only re-parsed when its inode, mtime or size
+changes; writes go through a file lock and an atomic rename so no process ever
+sees a half-written file.
+"""
+
+import os
+import json
+import threading
+import contextvars
+from typing import Any, Dict, Optional
+
+from tools.file_utils import file_lock, atomic_write_json
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# HTTP header used by agents to tell the MCP tool servers which runtime env file
+# belongs to the calling agent (see BaseAgent.runtime_env_path)
+RUNTIME_ENV_HEADER = "X-Runtime-Env-Path"
+
+# Per-agent runtime env files live at <RUNTIME_ENV_ROOT>/<signature>/.runtime_env.json
+RUNTIME_ENV_FILE = ".runtime_env.json"
+
+# Per-task override of RUNTIME_ENV_PATH, so concurrent agents in one process
+# each read and write their own runtime state
+_runtime_env_path_override = contextvars.ContextVar("runtime_env_path", default=None)
+
+
+def set_runtime_env_path(path: str):
+    """Bind the runtime env file for the current context (e.g. one asyncio task)"""
+    return _runtime_env_path_override.set(path)
+
+
+def runtime_env_root() -> str:
+    """Directory holding the per-agent runtime env files (RUNTIME_ENV_ROOT, default data/agent_data)"""
+    return os.path.realpath(os.getenv("RUNTIME_ENV_ROOT") or os.path.join(project_root, "data", "agent_data"))
+
+
+def agent_runtime_env_path(signature: str, root: Optional[str] = None) -> str:
+    """
+    Private runtime env file of one agent
+
+    Args:
+        signature: Agent signature
+        root: Agent data directory (default: runtime_env_root())
+
+    Returns:
+        Absolute path <root>/<signature>/.runtime_env.json
+    """
+    return os.path.join(os.path.abspath(root) if root else runtime_env_root(), signature, RUNTIME_ENV_FILE)
+
+
+def _runtime_env_path_from_request():
+    """Return the runtime env path sent by the agent if called inside an MCP HTTP request"""
+    try:
+        from fastmcp.server.dependencies import get_http_headers
+        path = get_http_headers().get(RUNTIME_ENV_HEADER.lower())
+    except Exception:
+        return None
+    if not path:
+        return None
+    # The servers read and rewrite this file, so only accept <root>/<signature>/.runtime_env.json
+    real_path = os.path.realpath(path)
+    if (
+        os.path.basename(real_path) == RUNTIME_ENV_FILE
+        and os.path.dirname(os.path.dirname(real_path)) == runtime_env_root()
+    ):
+        return real_path
+    print(f"⚠️ Ignoring {RUNTIME_ENV_HEADER} outside {runtime_env_root()}: {path}")
+    return None
+
+
+def get_runtime_env_path() -> Optional[str]:
+    """Resolve the runtime env file: task override > request header > RUNTIME_ENV_PATH"""
+    return (
+        _runtime_env_path_override.get()
+        or _runtime_env_path_from_request()
+        or os.environ.get("RUNTIME_ENV_PATH")
+    )
+
+
+class RuntimeContext:
+    """Cached, process-safe accessor for one runtime env file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data: Dict[str, Any] = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        """Identity of the current file version, or None if it does not exist"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _read_file(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
+        except Exception:
+            pass
+        return {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the current runtime state, re-reading the file only if it changed
+
+        Returns:
+            Dict of runtime values (do not mutate; use set()/update())
+        """
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return self._data
+        with self._lock:
+            if stamp != self._stamp:
+                self._data = self._read_file() if stamp is not None else {}
+                self._stamp = stamp
+        return self._data
+
+    def get(self, key: str, default=None):
+        """Get a runtime value, falling back to the process environment"""
+        data = self.snapshot()
+        if key in data:
+            return data[key]
+        return os.getenv(key, default)
+
+    def update(self, **values) -> None:
+        """Atomically merge ``values`` into the runtime env file"""
+        with self._lock, file_lock(self.path):
+            # Merge into the on-disk state, another process may have written since our last read
+            data = self._read_file()
+            data.update(values)
+            atomic_write_json(self.path, data, ensure_ascii=False, indent=4)
+            self._data = data
+            self._stamp = self._file_stamp()
+
+    def set(self, key: str, value: Any) -> None:
+        """Set a single runtime value"""
+        self.update(**{key: value})
+
+    @property
+    def signature(self) -> Optional[str]:
+        """Signature of the agent currently trading"""
+        return self.get("SIGNATURE")
+
+    @signature.setter
+    def signature(self, value: str) -> None:
+        self.set("SIGNATURE", value)
+
+    @property
+    def today_date(self) -> Optional[str]:
+        """Simulated trading date (YYYY-MM-DD)"""
+        return self.get("TODAY_DATE")
+
+    @today_date.setter
+    def today_date(self, value: str) -> None:
+        self.set("TODAY_DATE", value)
+
+    @property
+    def if_trade(self) -> bool:
+        """Whether a trade was executed in the current session"""
+        value = self.get("IF_TRADE", False)
+        if isinstance(value, str):
+            return value.lower() == "true"
+        return bool(value)
+
+    @if_trade.setter
+    def if_trade(self, value: bool) -> None:
+        self.set("IF_TRADE", bool(value))
+
+
+class _EnvOnlyContext(RuntimeContext):
+    """Fallback used when no runtime env file is configured: reads come from os.environ"""
+
+    def __init__(self):
+        super().__init__(path=None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {}
+
+    def update(self, **values) -> None:
+        raise ValueError("RUNTIME_ENV_PATH is not set, cannot write runtime configuration")
+
+
+_contexts: Dict[str, RuntimeContext] = {}
+_contexts_lock = threading.Lock()
+_env_only_context = _EnvOnlyContext()
+
+
+def get_runtime_context(path: Optional[str] = None) -> RuntimeContext:
+    """
+    Get the shared RuntimeContext for a runtime env file
+
+    Args:
+        path: Runtime env file, defaults to get_runtime_env_path()
+
+    Returns:
+        RuntimeContext bound to that file (one instance per path per process)
+    """
+    path = path or get_runtime_env_path()
+    if not path:
+        return _env_only_context
+    context = _contexts.get(path)
+    if context is None:
+        with _contexts_lock:
+            context = _contexts.setdefault(path, RuntimeContext(path))
+    return context
@@ -0,0 +1,230 @@
+"""
+Search Cache
+Persistent, size-bounded cache for Jina search and scrape results
+
+Search hits are keyed by the normalized query and the simulated TODAY_DATE (the
+date filter applied to the hits depends on it); scraped pages are keyed by URL.
+Entries live in a SQLite (WAL) file shared by every search server process, expire
+after a TTL, and are evicted least-recently-used once the cache grows past its
+size limit. Hit/miss/eviction counters are kept in the same file.
+
+Environment:
+    JINA_CACHE_TTL        Seconds a search result stays valid (default 604800, 0 disables the cache)
+    JINA_CACHE_PAGE_TTL   Seconds a scraped page stays valid (default 2592000)
+    JINA_CACHE_MAX_MB     Size limit of cached values in MB (default 256)
+    JINA_CACHE_PATH       SQLite file (default ./data/cache/jina.db)
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind         TEXT    NOT NULL,
+    key          TEXT    NOT NULL,
+    value        TEXT    NOT NULL,
+    size         INTEGER NOT NULL,
+    created_at   REAL    NOT NULL,
+    last_access  REAL    NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access);
+
+CREATE TABLE IF NOT EXISTS counters (
+    kind   TEXT    NOT NULL,
+    event  TEXT    NOT NULL,
+    count  INTEGER NOT NULL,
+    PRIMARY KEY (kind, event)
+);
+"""
+
+SEARCH = "search"
+PAGE = "page"
+
+
+def normalize_query(query: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a search query"""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+class SearchCache:
+    """SQLite-backed TTL + LRU cache of search results and scraped pages"""
+
+    def __init__(self, path: str, search_ttl: float = 7 * 86400, page_ttl: float = 30 * 86400,
+                 max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            path: SQLite file shared between processes
+            search_ttl: Seconds a search result stays valid
+            page_ttl: Seconds a scraped page stays valid
+            max_bytes: Total size of cached values before least recently used entries are evicted
+        """
+        self.path = path
+        self.ttls = {SEARCH: search_ttl, PAGE: page_ttl}
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, kind: str, event: str, n: int = 1) -> None:
+        self._connection().execute(
+            "INSERT INTO counters (kind, event, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (kind, event) DO UPDATE SET count = count + excluded.count",
+            (kind, event, n),
+        )
+
+    def get(self, kind: str, key: str) -> Optional[Any]:
+        """
+        Cached value, or None on a miss or an expired entry
+
+        Args:
+            kind: SEARCH or PAGE
+            key: Entry key (see search_key / page_key)
+        """
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created_at FROM entries WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.ttls[kind]:
+                if row is not None:
+                    conn.execute("DELETE FROM entries WHERE kind = ? AND key = ?", (kind, key))
+                self._count(kind, "miss")
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE kind = ? AND key = ?", (now, kind, key))
+            self._count(kind, "hit")
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            print(f"⚠️ Failed to read search cache: {e}")
+            return None
+
+    def put(self, kind: str, key: str, value: Any) -> None:
+        """Store a value and evict least recently used entries if the cache is over its size limit"""
+        text = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (kind, key, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, key, text, len(text.encode("utf-8")), now, now),
+            )
+            self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"⚠️ Failed to write search cache: {e}")
+
+    async def aget(self, kind: str, key: str) -> Optional[Any]:
+        """get() in a worker thread, so SQLite lock waits do not block the event loop"""
+        return await asyncio.to_thread(self.get, kind, key)
+
+    async def aput(self, kind: str, key: str, value: Any) -> None:
+        """put() in a worker thread, so SQLite lock waits do not block the event loop"""
+        await asyncio.to_thread(self.put, kind, key, value)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% so eviction does not run on every insert
+        target = total - int(self.max_bytes * 0.9)
+        freed, evicted = 0, 0
+        for kind, key, size in conn.execute(
+            "SELECT kind, key, size FROM entries ORDER BY last_access"
+        ).fetchall():
+            if freed >= target:
+                break
+            conn.execute("DELETE FROM entries WHERE kind = ? AND key = ?", (kind, key))
+            freed += size
+            evicted += 1
+        self._count("all", "evicted", evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters, hit rates and current size"""
+        conn = self._connection()
+        stats: Dict[str, Any] = {}
+        for kind, event, count in conn.execute("SELECT kind, event, count FROM counters"):
+            stats.setdefault(kind, {})[event] = count
+        for kind in (SEARCH, PAGE):
+            counters = stats.setdefault(kind, {})
+            lookups = counters.get("hit", 0) + counters.get("miss", 0)
+            counters["hit_rate"] = counters.get("hit", 0) / lookups if lookups else None
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        stats["entries"] = entries
+        stats["size_bytes"] = size
+        return stats
+
+    def clear(self) -> None:
+        """Drop all entries and counters"""
+        conn = self._connection()
+        conn.execute("DELETE FROM entries")
+        conn.execute("DELETE FROM counters")
+
+
+def search_key(query: str, today_date: Optional[str]) -> str:
+    """Cache key of a search: normalized query and the date filter applied to its hits"""
+    return f"{today_date or ''}|{normalize_query(query)}"
+
+
+def page_key(url: str) -> str:
+    """Cache key of a scraped page"""
+    return url.strip()
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """Process-wide search cache configured from the environment, None if disabled"""
+    global _search_cache
+    search_ttl = float(os.getenv("JINA_CACHE_TTL", str(7 * 86400)))
+    if search_ttl <= 0:
+        return None
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                path = os.getenv("JINA_CACHE_PATH") or os.path.join(project_root, "data", "cache", "jina.db")
+                _search_cache = SearchCache(
+                    path,
+                    search_ttl=search_ttl,
+                    page_ttl=float(os.getenv("JINA_CACHE_PAGE_TTL", str(30 * 86400))),
+                    max_bytes=int(float(os.getenv("JINA_CACHE_MAX_MB", "256")) * 1024 * 1024),
+                )
+    return _search_cache
+
+
+if __name__ == "__main__":
+    """Show or clear the search cache: python -m tools.search_cache [stats|clear]"""
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = get_search_cache()
+    if cache is None:
+        print("Search cache is disabled (JINA_CACHE_TTL=0)")
+        sys.exit(0)
+    if command == "clear":
+        cache.clear()
+        print(f"✅ Cleared {cache.path}")
+    elif command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    else:
+        print("Usage: python -m tools.search_cache [stats|clear]")
+        sys.exit(1)
@@ -0,0 +1,274 @@
+"""
+SQLite Trade Ledger
+Optional WAL-mode SQLite backend for trade and position records
+
+Every order is one IMMEDIATE transaction that reads the latest position, inserts
+the trade row and the new position row, and commits, so many agents can trade
+through one trade server without corrupting the ledger. Records can be exported
+back to the position_okx.jsonl format.
+
+Enable it for the trade server with:
+    LEDGER_BACKEND=sqlite
+    LEDGER_DB_PATH=./data/agent_data/ledger.db   (optional)
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tools.file_utils import file_lock, atomic_write_text
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    signature   TEXT    NOT NULL,
+    action_id   INTEGER NOT NULL,
+    date        TEXT    NOT NULL,
+    positions   TEXT    NOT NULL,
+    record      TEXT    NOT NULL,
+    PRIMARY KEY (signature, action_id)
+);
+CREATE INDEX IF NOT EXISTS idx_positions_signature_date
+    ON positions (signature, date, action_id);
+
+CREATE TABLE IF NOT EXISTS trades (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    signature     TEXT    NOT NULL,
+    date          TEXT    NOT NULL,
+    action_id     INTEGER NOT NULL,
+    action        TEXT    NOT NULL,
+    symbol        TEXT    NOT NULL,
+    amount        REAL    NOT NULL,
+    price         REAL,
+    value         REAL,
+    trading_type  TEXT,
+    order_info    TEXT,
+    created_at    TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trades_signature_date
+    ON trades (signature, date);
+"""
+
+
+def ledger_enabled() -> bool:
+    """Whether the trade server writes to the SQLite ledger (LEDGER_BACKEND=sqlite)"""
+    return os.getenv("LEDGER_BACKEND", "jsonl").lower() == "sqlite"
+
+
+def ledger_db_path() -> str:
+    """Ledger database: LEDGER_DB_PATH or ./data/agent_data/ledger.db"""
+    return os.getenv("LEDGER_DB_PATH") or os.path.join(project_root, "data", "agent_data", "ledger.db")
+
+
+class SQLiteLedger:
+    """Transactional trade ledger shared by all agents of a trade server"""
+
+    def __init__(self, db_path: str, busy_timeout_ms: int = 10000):
+        """
+        Args:
+            db_path: SQLite database file (created if missing)
+            busy_timeout_ms: How long a writer waits for the database lock
+        """
+        self.db_path = str(db_path)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections must not be shared across threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """Close this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @staticmethod
+    def _latest(conn: sqlite3.Connection, signature: str, today_date: Optional[str]) -> Optional[Tuple[Dict[str, Any], int]]:
+        row = None
+        if today_date:
+            row = conn.execute(
+                "SELECT positions, action_id FROM positions WHERE signature = ? AND date = ? "
+                "ORDER BY action_id DESC LIMIT 1",
+                (signature, today_date),
+            ).fetchone()
+        if row is None:
+            row = conn.execute(
+                "SELECT positions, action_id FROM positions WHERE signature = ? "
+                "ORDER BY action_id DESC LIMIT 1",
+                (signature,),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def get_latest_position(self, signature: str, today_date: Optional[str] = None) -> Optional[Tuple[Dict[str, Any], int]]:
+        """
+        Positions to trade from: today's latest record, else the overall latest record
+
+        Returns:
+            (positions, action_id), or None if the agent has no records
+        """
+        return self._latest(self._connection(), signature, today_date)
+
+    def execute(
+        self,
+        signature: str,
+        today_date: str,
+        apply_fn: Callable[[Dict[str, Any], int], Dict[str, Any]],
+        initial_positions: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """
+        Run one order as a single read-modify-write transaction
+
+        Args:
+            signature: Agent signature
+            today_date: Trading date used to pick the current position
+            apply_fn: Called with (positions, action_id); returns the new position record
+                      (same shape as a position_okx.jsonl line) or raises OrderRejected
+            initial_positions: Positions to start from when the agent has no records
+
+        Returns:
+            The committed record
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            latest = self._latest(conn, signature, today_date)
+            if latest is None:
+                latest = (dict(initial_positions), -1)
+            record = apply_fn(*latest)
+            self._insert(conn, signature, record)
+            conn.execute("COMMIT")
+            return record
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, signature: str, record: Dict[str, Any]) -> None:
+        action_id = record["id"]
+        date = record["date"]
+        conn.execute(
+            "INSERT INTO positions (signature, action_id, date, positions, record) VALUES (?, ?, ?, ?, ?)",
+            (signature, action_id, date, json.dumps(record.get("positions", {})), json.dumps(record)),
+        )
+        action = record.get("this_action")
+        if action:
+            conn.execute(
+                "INSERT INTO trades (signature, date, action_id, action, symbol, amount, price, value, "
+                "trading_type, order_info, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    signature,
+                    date,
+                    action_id,
+                    action.get("action"),
+                    action.get("symbol"),
+                    action.get("amount"),
+                    action.get("price"),
+                    action.get("cost", action.get("proceeds")),
+                    action.get("trading_type"),
+                    json.dumps(record.get("order_info")),
+                    datetime.now().isoformat(),
+                ),
+            )
+
+    def append(self, signature: str, record: Dict[str, Any]) -> None:
+        """Insert a ready-made record (e.g. when importing a jsonl ledger)"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._insert(conn, signature, record)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def trades(self, signature: str, date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        List trades of an agent, optionally for one date
+
+        Returns:
+            List of trade dicts ordered by action id
+        """
+        query = ("SELECT date, action_id, action, symbol, amount, price, value, trading_type, created_at "
+                 "FROM trades WHERE signature = ?")
+        params: Tuple[Any, ...] = (signature,)
+        if date:
+            query += " AND date = ?"
+            params += (date,)
+        query += " ORDER BY action_id"
+        columns = ["date", "action_id", "action", "symbol", "amount", "price", "value", "trading_type", "created_at"]
+        return [dict(zip(columns, row)) for row in self._connection().execute(query, params)]
+
+    def latest_by_date(self, signature: str) -> Dict[str, Dict[str, Any]]:
+        """
+        The record with the highest action id of every date of an agent
+
+        Returns:
+            {date: record} in action id order
+        """
+        rows = self._connection().execute(
+            "SELECT date, record FROM positions p WHERE signature = ? AND action_id = "
+            "(SELECT MAX(action_id) FROM positions WHERE signature = p.signature AND date = p.date) ORDER BY action_id",
+            (signature,),
+        )
+        return {date: json.loads(record) for date, record in rows}
+
+    def signatures(self) -> List[str]:
+        """All agent signatures with records"""
+        rows = self._connection().execute("SELECT DISTINCT signature FROM positions ORDER BY signature")
+        return [row[0] for row in rows]
+
+    def export_jsonl(self, signature: str, output_path: str) -> int:
+        """
+        Export an agent's records in position_okx.jsonl format
+
+        Args:
+            signature: Agent signature
+            output_path: Destination jsonl file (atomically replaced)
+
+        Returns:
+            Number of records written
+        """
+        rows = self._connection().execute(
+            "SELECT record FROM positions WHERE signature = ? ORDER BY action_id", (signature,)
+        )
+        records = [record + "\n" for (record,) in rows]
+        # Replace the file instead of rewriting it in place, so position indexes and
+        # readers holding the old file never see old offsets over new content
+        with file_lock(output_path):
+            atomic_write_text(output_path, "".join(records), fsync=True)
+        return len(records)
+
+
+if __name__ == "__main__":
+    """Export ledger records to jsonl: python -m tools.sqlite_ledger <db_path> [output_dir]"""
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m tools.sqlite_ledger <db_path> [output_dir]")
+        sys.exit(1)
+
+    ledger = SQLiteLedger(sys.argv[1])
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else "./data/agent_data"
+    for signature in ledger.signatures():
+        output_path = os.path.join(output_dir, signature, "position", "position_okx.jsonl")
+        count = ledger.export_jsonl(signature, output_path)
+        print(f"✅ Exported {count} records for {signature} to {output_path}")
@@ -0,0 +1,209 @@
+"""
+Ticker Cache
+TTL ticker cache shared by the OKX price server and the trade server
+
+Entries live in memory and in a small SQLite (WAL) file, so a ticker fetched by
+``get_current_price_okx`` in the price server is reused by ``buy_okx``/``sell_okx``
+in the trade server. Each entry carries the time it was fetched so callers can
+report how old a price is.
+
+Lookups follow a stale-while-revalidate policy:
+    age <= ttl                 -> cached value
+    ttl < age <= ttl + stale   -> cached value, refreshed in the background
+    older / missing            -> fetched synchronously
+
+Environment:
+    TICKER_CACHE_TTL        Fresh window in seconds (default 10, 0 disables the cache)
+    TICKER_CACHE_STALE_TTL  Extra window in seconds served stale (default 30)
+    TICKER_CACHE_PATH       SQLite file (default ./data/cache/tickers.db)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from tools.okx_clients import okx_sandbox_from_env
+from tools.replay_exchange import is_replay_exchange
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TickerCache:
+    """Memory + SQLite ticker cache with stale-while-revalidate"""
+
+    def __init__(self, path: Optional[str], ttl: float = 10.0, stale_ttl: float = 30.0):
+        """
+        Args:
+            path: SQLite file shared between processes, None for a memory-only cache
+            ttl: Seconds a ticker is served without refreshing
+            stale_ttl: Additional seconds a ticker is served while it is refreshed in the background
+        """
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._memory: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS tickers (key TEXT PRIMARY KEY, fetched_at REAL NOT NULL, ticker TEXT NOT NULL)"
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Newest cached entry for a key, regardless of age
+
+        Returns:
+            (ticker, fetched_at) with fetched_at in epoch seconds, or None
+        """
+        entry = self._memory.get(key)
+        if self.path and (entry is None or time.time() - entry[0] > self.ttl):
+            # Another process may hold a fresher value
+            try:
+                row = self._connection().execute(
+                    "SELECT fetched_at, ticker FROM tickers WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is not None and (entry is None or row[0] > entry[0]):
+                entry = (row[0], json.loads(row[1]))
+                self._memory[key] = entry
+        if entry is None:
+            return None
+        return entry[1], entry[0]
+
+    def put(self, key: str, ticker: Dict[str, Any], fetched_at: Optional[float] = None) -> float:
+        """Store a ticker; returns its fetched_at timestamp"""
+        fetched_at = fetched_at or time.time()
+        self._memory[key] = (fetched_at, ticker)
+        if self.path:
+            try:
+                self._connection().execute(
+                    "INSERT OR REPLACE INTO tickers (key, fetched_at, ticker) VALUES (?, ?, ?)",
+                    (key, fetched_at, json.dumps(ticker)),
+                )
+            except sqlite3.Error as e:
+                print(f"⚠️ Failed to write ticker cache: {e}")
+        return fetched_at
+
+    def get_fresh(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Cached entry only if it is within the fresh window"""
+        if not self.enabled:
+            return None
+        entry = self.lookup(key)
+        if entry is not None and time.time() - entry[1] <= self.ttl:
+            return entry
+        return None
+
+    async def get(self, key: str, fetch_fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], float]:
+        """
+        Get a ticker, fetching it with ``fetch_fn`` when the cache cannot serve it
+
+        Stale entries are refreshed in a task on the running loop.
+
+        Args:
+            key: Cache key (see ticker_cache_key)
+            fetch_fn: Coroutine function fetching a fresh ticker from the exchange
+
+        Returns:
+            (ticker, fetched_at) with fetched_at in epoch seconds
+        """
+        if not self.enabled:
+            ticker = await fetch_fn()
+            return ticker, time.time()
+
+        entry = self.lookup(key)
+        if entry is not None:
+            age = time.time() - entry[1]
+            if age <= self.ttl:
+                return entry
+            if age <= self.ttl + self.stale_ttl:
+                self._refresh_in_task(key, fetch_fn)
+                return entry
+
+        ticker = await fetch_fn()
+        return ticker, self.put(key, ticker)
+
+    def _refresh_in_task(self, key: str, fetch_fn: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                self.put(key, await fetch_fn())
+            except Exception as e:
+                print(f"⚠️ Background ticker refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        # Keep a reference so the task is not garbage collected while running
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+
+def ticker_cache_key(symbol: str, trading_type: str = "spot", sandbox: bool = False) -> str:
+    """Cache key for a symbol; testnet and live prices never mix"""
+    return f"{'testnet' if sandbox else 'live'}:{trading_type}:{symbol}"
+
+
+async def fetch_ticker_cached(exchange, symbol: str, trading_type: str = "spot") -> Tuple[Dict[str, Any], float]:
+    """
+    Ticker for a symbol through the shared cache
+
+    Args:
+        exchange: ccxt.async_support client used when the cache cannot serve the ticker
+        symbol: Trading pair symbol
+        trading_type: Trading type of the client
+
+    Returns:
+        (ticker, fetched_at) with fetched_at in epoch seconds
+    """
+    if is_replay_exchange(exchange):
+        # Replayed prices depend on each agent's simulated date, they are never shared
+        return await exchange.fetch_ticker(symbol), time.time()
+    key = ticker_cache_key(symbol, trading_type, okx_sandbox_from_env())
+    return await get_ticker_cache().get(key, lambda: exchange.fetch_ticker(symbol))
+
+
+_ticker_cache: Optional[TickerCache] = None
+_ticker_cache_lock = threading.Lock()
+
+
+def get_ticker_cache() -> TickerCache:
+    """Process-wide ticker cache configured from the environment"""
+    global _ticker_cache
+    if _ticker_cache is None:
+        with _ticker_cache_lock:
+            if _ticker_cache is None:
+                ttl = float(os.getenv("TICKER_CACHE_TTL", "10"))
+                path = os.getenv("TICKER_CACHE_PATH") or os.path.join(project_root, "data", "cache", "tickers.db")
+                _ticker_cache = TickerCache(
+                    path if ttl > 0 else None,
+                    ttl=ttl,
+                    stale_ttl=float(os.getenv("TICKER_CACHE_STALE_TTL", "30")),
+                )
+    return _ticker_cache